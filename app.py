@@ -3,31 +3,72 @@
 Flask Web Application + API for Scam Detection
 """
 from flask import Flask, render_template, request, redirect, url_for, jsonify, session
+import codecs
 import os
 import traceback
 
-from ml.predict import ScamPredictor
-from google_ai.translate import detect_and_translate
-from utils.url_extractor import extract_urls
-from google_ai.safe_browsing import check_urls_safe_browsing
-from utils.risk_score import compute_risk_score_and_reasons
-from detection_modules.fake_news_detector import detect_fake_news
+from ml.predict import BatchingPredictor
+from ml.registry import ModelRegistry
+from utils.pipeline import analyze_message_async, analyze_messages, rules_option, validate_batch_request
+from utils.cache import cache_from_env
+from utils.rule_pack import RULE_PACKS
+from utils.http_client import get_http_client
+from google_ai.safe_browsing import backend_status, get_threat_database, get_verdict_cache
+from detection_modules.fake_news_detector import detect_fake_news, detect_fake_news_stream, read_text_chunks
 from detection_modules.scam_detector import detect_scam
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
 app.secret_key = 'safeguard-secret-key-2024'
 
-# Initialize predictor
+# Upper bound on messages accepted by /api/detect-scam/batch in one call
+MAX_BATCH_MESSAGES = int(os.environ.get('MAX_BATCH_MESSAGES', 5000))
+
+# Content-addressed caches shared by all analysis routes
+# (sized with PREDICTION_CACHE_SIZE/_TTL and ANALYSIS_CACHE_SIZE/_TTL)
+prediction_cache = cache_from_env("PREDICTION_CACHE")
+analysis_cache = cache_from_env("ANALYSIS_CACHE")
+
+# Initialize predictor: the registry serves models/versions/<CURRENT>
+# (or the files directly under models/) and hot-swaps on activation
+model_registry = ModelRegistry(root="models", cache=prediction_cache)
 try:
-    predictor = ScamPredictor(
-        model_path=os.path.join("models", "scam_model.pkl"),
-        vectorizer_path=os.path.join("models", "vectorizer.pkl")
-    )
+    model_registry.current()
 except FileNotFoundError as e:
     print(f"ERROR: {str(e)}")
     print("Please run: python -m ml.train_model")
     exit(1)
 
+# Poll models/CURRENT so every worker picks up a newly activated version
+MODEL_WATCH_INTERVAL = float(os.environ.get('MODEL_WATCH_INTERVAL', 0))
+if MODEL_WATCH_INTERVAL > 0:
+    model_registry.start_watcher(MODEL_WATCH_INTERVAL)
+
+# Detector rules: rules/rule_pack.json (or RULE_PACK_PATH), reloaded when the
+# file changes if RULES_WATCH_INTERVAL is set
+RULE_PACKS.current()
+RULES_WATCH_INTERVAL = float(os.environ.get('RULES_WATCH_INTERVAL', 0))
+if RULES_WATCH_INTERVAL > 0:
+    RULE_PACKS.start_watcher(RULES_WATCH_INTERVAL)
+
+# With SAFE_BROWSING_BACKEND=local, start syncing the threat lists now
+get_threat_database(os.environ.get('SAFE_BROWSING_API_KEY'))
+
+# Admin model endpoints are disabled unless ADMIN_TOKEN is set
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+predictor = model_registry
+
+# Coalesce concurrent single-message predictions into small batches
+# (PREDICT_BATCH_WINDOW_MS=0 disables micro-batching)
+PREDICT_BATCH_WINDOW_MS = float(os.environ.get('PREDICT_BATCH_WINDOW_MS', 2))
+PREDICT_BATCH_MAX_SIZE = int(os.environ.get('PREDICT_BATCH_MAX_SIZE', 64))
+if PREDICT_BATCH_WINDOW_MS > 0:
+    predictor = BatchingPredictor(
+        predictor,
+        max_batch_size=PREDICT_BATCH_MAX_SIZE,
+        max_wait=PREDICT_BATCH_WINDOW_MS / 1000.0
+    )
+
 
 # ============ WEB UI ROUTES ============
 
@@ -88,7 +129,7 @@ def scam_detection():
 
 
 @app.route('/analyze', methods=['POST'])
-def analyze():
+async def analyze():
     """Analyze message - Web form"""
     try:
         message = request.form.get('message', '').strip()
@@ -99,42 +140,7 @@ def analyze():
         if len(message) < 5:
             return redirect(url_for('home'))
 
-        # Extract URLs
-        urls = extract_urls(message)
-
-        # Detect language & translate
-        detected_language, translated_text, translation_performed = detect_and_translate(message)
-
-        # Predict
-        prediction_result = predictor.predict(translated_text)
-
-        # Check URLs
-        url_checks = check_urls_safe_browsing(urls)
-
-        # Calculate risk score
-        risk_score, reasons = compute_risk_score_and_reasons(
-            prediction_result=prediction_result,
-            urls_check=url_checks,
-            original_text=message
-        )
-
-        # Map verdict
-        label_map = {0: "Safe", 1: "Spam", 2: "Scam"}
-        verdict = label_map.get(prediction_result["predicted_label"], "Unknown")
-
-        # Get confidence
-        confidence = prediction_result.get("confidence", 0)
-
-        result = {
-            "verdict": verdict,
-            "risk_score": int(risk_score),
-            "confidence": round(float(confidence), 4),
-            "reasons": reasons,
-            "detected_language": detected_language,
-            "message": message,
-            "translated_text": translated_text if (translation_performed and translated_text != message) else None,
-            "translation_available": translation_performed
-        }
+        result = await analyze_message_async(message, predictor, cache=analysis_cache)
 
         return render_template('analyze.html', result=result)
 
@@ -147,7 +153,7 @@ def analyze():
 # ============ API ROUTES ============
 
 @app.route('/api/detect-scam', methods=['POST'])
-def api_detect_scam():
+async def api_detect_scam():
     """API endpoint - returns JSON for programmatic access"""
     try:
         data = request.get_json()
@@ -162,45 +168,10 @@ def api_detect_scam():
         if len(message) < 5:
             return jsonify({"error": "Message too short"}), 400
 
-        # Extract URLs
-        urls = extract_urls(message)
-
-        # Detect language & translate
-        detected_language, translated_text, translation_performed = detect_and_translate(message)
-
-        # Predict
-        prediction_result = predictor.predict(translated_text)
-
-        # Check URLs
-        url_checks = check_urls_safe_browsing(urls)
-
-        # Calculate risk score
-        risk_score, reasons = compute_risk_score_and_reasons(
-            prediction_result=prediction_result,
-            urls_check=url_checks,
-            original_text=message
-        )
-
-        # Map verdict
-        label_map = {0: "Safe", 1: "Spam", 2: "Scam"}
-        verdict = label_map.get(prediction_result["predicted_label"], "Unknown")
-
-        # Get confidence
-        confidence = prediction_result.get("confidence", 0)
-
-        result = {
-            "verdict": verdict,
-            "risk_score": int(risk_score),
-            "confidence": round(float(confidence), 4),
-            "reasons": reasons,
-            "detected_language": detected_language,
-            "message": message,
-            "translated_text": translated_text if (translation_performed and translated_text != message) else None,
-            "translation_available": translation_performed
-        }
-        
-        print(f"DEBUG API: translation_performed={translation_performed}, translated_text={translated_text}")
-        print(f"DEBUG API: Final result keys: {list(result.keys())}")
+        result = await analyze_message_async(message, predictor, cache=analysis_cache,
+                                             rules=rules_option(data.get("rules")), timings=True)
+        app.logger.debug("API: translation_available=%s, result keys=%s",
+                         result['translation_available'], list(result.keys()))
 
         return jsonify(result), 200
 
@@ -208,6 +179,30 @@ def api_detect_scam():
         return jsonify({"error": "Internal server error", "detail": str(e)}), 500
 
 
+@app.route('/api/detect-scam/batch', methods=['POST'])
+def api_detect_scam_batch():
+    """API endpoint - analyze many messages in one call"""
+    try:
+        data = request.get_json()
+        error, results = validate_batch_request(data, MAX_BATCH_MESSAGES)
+        if error:
+            return jsonify({"error": error}), 400
+
+        # Invalid messages keep their error entry instead of failing the batch
+        valid_indices = [i for i, message in enumerate(results) if isinstance(message, str)]
+        valid_messages = [results[i] for i in valid_indices]
+        if valid_messages:
+            batch_results = analyze_messages(valid_messages, predictor, cache=analysis_cache,
+                                             rules=rules_option(data.get("rules")))
+            for i, result in zip(valid_indices, batch_results):
+                results[i] = result
+
+        return jsonify({"count": len(results), "results": results}), 200
+
+    except Exception as e:
+        return jsonify({"error": "Internal server error", "detail": str(e)}), 500
+
+
 @app.route('/analyze-scam', methods=['POST'])
 def analyze_scam():
     """Web endpoint for scam detection"""
@@ -231,6 +226,9 @@ def analyze_scam():
 def analyze_news():
     """Web endpoint for fake news detection"""
     try:
+        if request.mimetype == 'text/plain':
+            return _fake_news_stream_response()
+
         data = request.get_json()
         if not data or "content" not in data:
             return jsonify({"error": "Missing 'content' in request body"}), 400
@@ -250,6 +248,9 @@ def analyze_news():
 def api_fake_news():
     """API endpoint for fake news detection"""
     try:
+        if request.mimetype == 'text/plain':
+            return _fake_news_stream_response()
+
         data = request.get_json()
         if not data or "content" not in data:
             return jsonify({"error": "Missing 'content' in request body"}), 400
@@ -265,6 +266,87 @@ def api_fake_news():
         return jsonify({"error": "Internal server error", "detail": str(e)}), 500
 
 
+def _fake_news_stream_response():
+    """Analyse a text/plain request body as it is read, in bounded memory"""
+    charset = request.mimetype_params.get('charset', 'utf-8')
+    try:
+        codecs.lookup(charset)
+    except LookupError:
+        return jsonify({"error": f"Unsupported charset: {charset}"}), 400
+    result = detect_fake_news_stream(read_text_chunks(request.stream, charset))
+    if result is None:
+        return jsonify({"error": "Content cannot be empty"}), 400
+    return jsonify(result), 200
+
+
+def _admin_authorized():
+    return bool(ADMIN_TOKEN) and request.headers.get('X-Admin-Token') == ADMIN_TOKEN
+
+
+@app.route('/api/admin/models', methods=['GET'])
+def admin_models():
+    """List model versions and the one being served"""
+    if not _admin_authorized():
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify(model_registry.status()), 200
+
+
+@app.route('/api/admin/models/activate', methods=['POST'])
+def admin_activate_model():
+    """Load a model version and atomically swap it in"""
+    if not _admin_authorized():
+        return jsonify({"error": "Forbidden"}), 403
+    try:
+        data = request.get_json(silent=True) or {}
+        version = data.get("version")
+        if not version:
+            return jsonify({"error": "Missing 'version' in request body"}), 400
+
+        # Requests keep using the current model while the new one loads
+        model_registry.activate(version)
+        return jsonify(model_registry.status()), 200
+
+    except (FileNotFoundError, ValueError) as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": "Failed to load model", "detail": str(e)}), 500
+
+
+@app.route('/api/admin/models/rollback', methods=['POST'])
+def admin_rollback_model():
+    """Swap back to the previously served model version"""
+    if not _admin_authorized():
+        return jsonify({"error": "Forbidden"}), 403
+    try:
+        model_registry.rollback()
+        return jsonify(model_registry.status()), 200
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+
+
+@app.route('/api/admin/rules', methods=['GET'])
+def admin_rules():
+    """Show the rule pack being served"""
+    if not _admin_authorized():
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify(RULE_PACKS.status()), 200
+
+
+@app.route('/api/admin/rules/reload', methods=['POST'])
+def admin_reload_rules():
+    """Compile the rule pack file and atomically swap it in"""
+    if not _admin_authorized():
+        return jsonify({"error": "Forbidden"}), 403
+    try:
+        # Requests keep using the current rules while the new pack compiles
+        RULE_PACKS.reload()
+        return jsonify(RULE_PACKS.status()), 200
+    except (FileNotFoundError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": "Failed to load rule pack", "detail": str(e)}), 500
+
+
 @app.route('/api/docs')
 def api_docs():
     """API Documentation page"""
@@ -274,7 +356,20 @@ def api_docs():
 @app.route('/api/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return jsonify({"status": "ok", "service": "SafeGuard"}), 200
+    return jsonify({
+        "status": "ok",
+        "service": "SafeGuard",
+        "model_version": model_registry.active_version,
+        "model_hash": predictor.version,
+        "rules_version": RULE_PACKS.current().version,
+        "cache": {
+            "prediction": prediction_cache.stats(),
+            "analysis": analysis_cache.stats(),
+            "safe_browsing": get_verdict_cache().stats()
+        },
+        "safe_browsing": backend_status(),
+        "http": get_http_client().stats()
+    }), 200
 
 
 if __name__ == '__main__': 
@@ -287,6 +382,7 @@ if __name__ == '__main__':
     
     print(f"\nWeb UI:    http://0.0.0.0:{port}")
     print(f"API:     http://0.0.0.0:{port}/api/detect-scam (POST)")
+    print(f"Batch:   http://0.0.0.0:{port}/api/detect-scam/batch (POST)")
     print("\n" + "="*60 + "\n")
     
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
@@ -3,189 +3,260 @@ Advanced Fake News Detection Module
 Replace this with your sophisticated fake news detection algorithm
 """
 
+import codecs
 import re
 import string
 from datetime import datetime
 from collections import Counter
+from functools import cached_property
 
-def detect_fake_news(content):
+from utils.keywords import (NEWS_BIAS, NEWS_CLICKBAIT, NEWS_EMOTIONAL, NEWS_EXTRAORDINARY_CLAIMS,
+                            NEWS_SCAM, NEWS_SENSATIONAL, NEWS_SOURCE_ATTRIBUTION, NEWS_URGENCY,
+                            NEWS_VAGUE_SOURCES, scan_keywords)
+from utils.rule_pack import get_rule_pack, match_level, match_tier
+
+# Statistics and writing quality checks
+NUMBER_REGEX = re.compile(r'\b\d{1,3}(?:,\d{3})*(?:\.\d+)?\b')
+EXCESSIVE_PUNCTUATION_REGEX = re.compile(r'[!?]{2,}')
+CAPS_WORD_REGEX = re.compile(r'\b[A-Z]{4,}\b')
+SENTENCE_SPLIT_REGEX = re.compile(r'[.!?]+')
+
+# Streaming analysis (detect_fake_news_stream): text is analysed in chunks of
+# about STREAM_CHUNK_SIZE characters, cut after a whitespace character
+STREAM_CHUNK_SIZE = 64 * 1024
+_LAST_WHITESPACE = re.compile(r'.*\s', re.DOTALL)
+_WHITESPACE = re.compile(r'\s')
+
+
+class DocumentContext:
+    """
+    One analysis of a document, shared by all analyzers
+    
+    The keyword scan (lowercased text, keyword and pattern hits), the rule
+    pack settings and the sentence, word, number and all-caps word counts are
+    each computed at most once per document, the first time an analyzer asks
+    for them. Analyzers should use these rather than content, which a
+    StreamingDocument does not keep.
+    """
+    
+    def __init__(self, content, keyword_hits=None):
+        self.content = content
+        # Keyword and pattern lists (sensational, clickbait, bias, emotional,
+        # scam...), weights and thresholds: the rule pack (utils/rule_pack.py),
+        # matched against the lowercased content
+        self.keyword_hits = keyword_hits if keyword_hits is not None else scan_keywords(content)
+        self.rules = self.keyword_hits.rules.news
+    
+    @classmethod
+    def of(cls, content, keyword_hits=None):
+        """content itself if it is already a DocumentContext, else a new one"""
+        if isinstance(content, cls):
+            return content
+        return cls(content, keyword_hits)
+    
+    @cached_property
+    def length(self):
+        return len(self.content)
+    
+    @cached_property
+    def sentence_count(self):
+        # Pieces of SENTENCE_SPLIT_REGEX.split(content), empty ones included
+        return len(SENTENCE_SPLIT_REGEX.findall(self.content)) + 1
+    
+    @cached_property
+    def word_count(self):
+        return _count_words(self.content)
+    
+    @cached_property
+    def number_count(self):
+        return len(NUMBER_REGEX.findall(self.content))
+    
+    @cached_property
+    def caps_word_count(self):
+        return len(CAPS_WORD_REGEX.findall(self.content))
+    
+    @cached_property
+    def has_excessive_punctuation(self):
+        return EXCESSIVE_PUNCTUATION_REGEX.search(self.content) is not None
+    
+    def tier(self, rule_name, count):
+        """The tier of rules[rule_name] that count reaches, as a score/factors result."""
+        tier = match_tier(self.rules[rule_name], count)
+        if tier is None:
+            return {'score': 0, 'factors': []}
+        return {'score': tier['points'], 'factors': [tier['factor'].format(count=count)]}
+
+
+class StreamingDocument(DocumentContext):
+    """
+    A DocumentContext built from chunks of text: feed() each chunk, then
+    finish(). Only counters and the keyword scan state are kept, never the
+    text (content is None). As with content.strip(), leading and trailing
+    whitespace is not analysed.
+    
+    Chunks must be cut next to whitespace (iter_text_chunks does), so that no
+    word, number, punctuation run or final sigma spans two chunks.
+    """
+    
+    def __init__(self, pack=None):
+        self.content = None
+        self._keywords = (pack or get_rule_pack()).stream()
+        self._started = False
+        self._pending = ''  # whitespace not analysed yet: trailing unless more text follows
+        self.length = 0
+        self.sentence_count = 1
+        self.word_count = 0
+        self.number_count = 0
+        self.caps_word_count = 0
+        self.has_excessive_punctuation = False
+    
+    def feed(self, chunk):
+        if not self._started:
+            chunk = chunk.lstrip()
+            if not chunk:
+                return
+            self._started = True
+        text = chunk.rstrip()
+        if not text:
+            self._pending += chunk
+            return
+        text = self._pending + text
+        self._pending = chunk[len(chunk.rstrip()):]
+        
+        self._keywords.feed(text)
+        self.length += len(text)
+        self.sentence_count += len(SENTENCE_SPLIT_REGEX.findall(text))
+        self.word_count += _count_words(text)
+        self.number_count += len(NUMBER_REGEX.findall(text))
+        self.caps_word_count += len(CAPS_WORD_REGEX.findall(text))
+        if not self.has_excessive_punctuation:
+            self.has_excessive_punctuation = EXCESSIVE_PUNCTUATION_REGEX.search(text) is not None
+    
+    def finish(self):
+        self.keyword_hits = self._keywords.hits()
+        self.rules = self.keyword_hits.rules.news
+        return self
+
+
+def _count_words(text):
+    # The words str.split() finds in each sentence of SENTENCE_SPLIT_REGEX.split(text)
+    return len(text.replace('.', ' ').replace('!', ' ').replace('?', ' ').split())
+
+
+def iter_text_chunks(pieces, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Regroup pieces of text into chunks of about chunk_size characters that
+    end right after a whitespace character (the last chunk excepted). Where
+    4 * chunk_size characters contain no whitespace they are cut anyway, so
+    memory stays bounded; a word cut that way counts as two.
+    """
+    buffer = ''
+    for piece in pieces:
+        buffer += piece
+        start = 0
+        while len(buffer) - start >= chunk_size:
+            match = (_LAST_WHITESPACE.match(buffer, start, start + chunk_size)
+                     or _WHITESPACE.search(buffer, start + chunk_size, start + 4 * chunk_size))
+            if match:
+                cut = match.end()
+            elif len(buffer) - start >= 4 * chunk_size:
+                cut = start + chunk_size
+            else:
+                break
+            yield buffer[start:cut]
+            start = cut
+        buffer = buffer[start:]
+    if buffer:
+        yield buffer
+
+
+def read_text_chunks(stream, encoding='utf-8', block_size=STREAM_CHUNK_SIZE):
+    """Decode a binary stream (file, request body) into pieces of text, block by block."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        text = decoder.decode(block)
+        if text:
+            yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+# Analyzers run by detect_fake_news, in order. Each takes a DocumentContext
+# (or content and keyword_hits) and returns {'score': int, 'factors': [...]},
+# plus 'indicators' to report in detected_indicators.
+FAKE_NEWS_ANALYZERS = []
+
+
+def register_analyzer(analyzer):
+    """Add an analyzer to detect_fake_news (usable as a decorator)."""
+    FAKE_NEWS_ANALYZERS.append(analyzer)
+    return analyzer
+
+
+def detect_fake_news(content, keyword_hits=None):
     """
     Advanced fake news detection function
     
     Args:
         content (str): News content to analyze
+        keyword_hits: result of utils.keywords.scan_keywords(content), if the
+            caller already scanned it
         
     Returns:
         dict: Detection results with credibility score and analysis
     """
     
+    return _score_document(DocumentContext(content, keyword_hits))
+
+
+def detect_fake_news_stream(pieces, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    detect_fake_news over text that arrives in pieces, in bounded memory
+    
+    The text is analysed chunk by chunk (see iter_text_chunks) and never
+    held in full; counts and keyword scan state carry over from one chunk to
+    the next, so the result equals detect_fake_news(''.join(pieces).strip()).
+    
+    Args:
+        pieces: iterable of str (e.g. read_text_chunks(file))
+        chunk_size (int): characters analysed at a time
+        
+    Returns:
+        dict: as detect_fake_news, or None if the text is empty/whitespace
+    """
+    doc = StreamingDocument()
+    for chunk in iter_text_chunks(pieces, chunk_size):
+        doc.feed(chunk)
+    doc.finish()
+    if not doc.length:
+        return None
+    return _score_document(doc)
+
+
+def _score_document(doc):
     # Initialize analysis
     fake_score = 0
     detected_indicators = []
     credibility_factors = []
+    rules = doc.rules
     
-    # Sensational language indicators
-    sensational_words = [
-        'shocking', 'unbelievable', 'incredible', 'amazing', 'stunning',
-        'mind-blowing', 'explosive', 'bombshell', 'devastating', 'outrageous',
-        'miracle', 'breakthrough', 'revolutionary', 'insane', 'crazy',
-        'unreal', 'jaw-dropping', 'epic', 'massive', 'huge revelation',
-        'exclusive', 'leaked', 'exposed', 'secret', 'hidden truth',
-        'conspiracy', 'cover-up', 'they don\'t want you to know',
-        'mainstream media won\'t tell you', 'wake up', 'sheeple'
-    ]
-    
-    # Clickbait patterns
-    clickbait_patterns = [
-        r"you won't believe",
-        r"doctors hate",
-        r"this will shock you",
-        r"what happened next",
-        r"the truth about",
-        r"they don't want you to know",
-        r"secret that",
-        r"exposed",
-        r"leaked",
-        r"everything you know is wrong",
-        r"this changes everything",
-        r"nobody is talking about",
-        r"mainstream media won't tell you",
-        r"wake up",
-        r"must see",
-        r"gone viral",
-        r"breaking:",
-        r"urgent:",
-        r"alert:",
-        r"warning:"
-    ]
-    
-    # Bias indicators
-    bias_words = [
-        'always', 'never', 'all', 'none', 'every', 'completely',
-        'totally', 'absolutely', 'definitely', 'certainly', 'obviously',
-        'clearly', 'undeniably', 'without a doubt', 'everyone knows'
-    ]
-    
-    # Emotional manipulation words
-    emotional_words = [
-        'outraged', 'furious', 'disgusted', 'terrified', 'panicked',
-        'devastated', 'heartbroken', 'enraged', 'horrified', 'scared',
-        'angry', 'betrayed', 'shocked', 'appalled', 'stunned'
-    ]
-    
-    # Scam-related keywords that should raise flags
-    scam_keywords = [
-        'money from bill gates', 'free iphone', 'free money', 'get rich quick',
-        'make money fast', 'work from home', 'easy money', 'guaranteed income',
-        'click here to win', 'you have won', 'congratulations winner',
-        'limited time offer', 'act now', 'urgent response required'
-    ]
-    
-    # Convert to lowercase for analysis
-    content_lower = content.lower()
-    
-    # Check for scam keywords
-    scam_count = sum(1 for keyword in scam_keywords if keyword in content_lower)
-    if scam_count >= 2:
-        fake_score += 40
-        credibility_factors.append(f"Multiple scam-related keywords detected ({scam_count} instances)")
-        detected_indicators.extend([kw for kw in scam_keywords if kw in content_lower])
-    elif scam_count >= 1:
-        fake_score += 20
-        credibility_factors.append("Contains scam-related keywords")
-        detected_indicators.extend([kw for kw in scam_keywords if kw in content_lower])
-    
-    # 1. Sensational Language Analysis
-    sensational_count = 0
-    for word in sensational_words:
-        if word in content_lower:
-            sensational_count += 1
-            detected_indicators.append(word)
-    
-    if sensational_count >= 3:
-        fake_score += 35
-        credibility_factors.append(f"Excessive sensational language ({sensational_count} instances)")
-    elif sensational_count >= 2:
-        fake_score += 25
-        credibility_factors.append(f"Multiple sensational words ({sensational_count} instances)")
-    elif sensational_count >= 1:
-        fake_score += 15
-        credibility_factors.append("Contains sensational language")
-    
-    # 2. Clickbait Pattern Analysis
-    clickbait_matches = 0
-    for pattern in clickbait_patterns:
-        if re.search(pattern, content_lower):
-            clickbait_matches += 1
-            detected_indicators.append(pattern.replace(r'\b', '').replace(r'.*', ''))
-    
-    if clickbait_matches >= 2:
-        fake_score += 40
-        credibility_factors.append("Multiple clickbait patterns detected")
-    elif clickbait_matches >= 1:
-        fake_score += 25
-        credibility_factors.append("Clickbait pattern detected")
-    
-    # 3. Source and Attribution Analysis
-    source_indicators = analyze_source_quality(content)
-    fake_score += source_indicators['score']
-    credibility_factors.extend(source_indicators['factors'])
-    
-    # 4. Bias Language Analysis
-    bias_count = sum(1 for word in bias_words if word in content_lower)
-    if bias_count >= 5:
-        fake_score += 25
-        credibility_factors.append(f"Excessive absolute language ({bias_count} instances)")
-    elif bias_count >= 3:
-        fake_score += 15
-        credibility_factors.append("Contains biased language")
-    elif bias_count >= 1:
-        fake_score += 8
-        credibility_factors.append("Some absolute language detected")
-    
-    # 5. Emotional Manipulation Analysis
-    emotional_count = sum(1 for word in emotional_words if word in content_lower)
-    if emotional_count >= 3:
-        fake_score += 30
-        credibility_factors.append("High emotional manipulation")
-    elif emotional_count >= 1:
-        fake_score += 15
-        credibility_factors.append("Contains emotional manipulation")
-    
-    # 6. Factual Claims Analysis
-    fact_analysis = analyze_factual_claims(content)
-    fake_score += fact_analysis['score']
-    credibility_factors.extend(fact_analysis['factors'])
-    
-    # 7. Writing Quality Analysis
-    quality_analysis = analyze_writing_quality(content)
-    fake_score += quality_analysis['score']
-    credibility_factors.extend(quality_analysis['factors'])
-    
-    # 8. Urgency and Time Pressure
-    urgency_analysis = analyze_urgency(content)
-    fake_score += urgency_analysis['score']
-    credibility_factors.extend(urgency_analysis['factors'])
+    for analyzer in FAKE_NEWS_ANALYZERS:
+        analysis = analyzer(doc)
+        fake_score += analysis['score']
+        credibility_factors.extend(analysis['factors'])
+        detected_indicators.extend(analysis.get('indicators', ()))
     
     # Determine credibility - more aggressive scoring
-    is_fake = fake_score >= 20  # Even lower threshold for fake detection
+    is_fake = fake_score >= rules['fake_from']  # Even lower threshold for fake detection
     
     # Credibility classification
-    if fake_score >= 50:
-        credibility_level = "HIGHLY UNRELIABLE"
-        message = "This content shows STRONG indicators of fake news or misinformation"
-    elif fake_score >= 35:
-        credibility_level = "UNRELIABLE"
-        message = "This content has MULTIPLE red flags suggesting fake news"
-    elif fake_score >= 20:
-        credibility_level = "QUESTIONABLE"
-        message = "This content has QUESTIONABLE credibility - verify before trusting"
-    elif fake_score >= 10:
-        credibility_level = "MOSTLY RELIABLE"
-        message = "This content appears mostly reliable with minor concerns"
-    else:
-        credibility_level = "RELIABLE"
-        message = "This content appears credible with good journalistic standards"
+    level = match_level(rules['credibility_levels'], fake_score)
+    credibility_level = level['level']
+    message = level['message']
     
     # Generate recommendations
     recommendations = generate_news_recommendations(fake_score, credibility_factors)
@@ -194,132 +265,128 @@ def detect_fake_news(content):
         'is_fake': is_fake,
         'fake_score': min(fake_score, 100),
         'credibility_level': credibility_level,
-        'detected_indicators': detected_indicators[:10],  # Limit to top 10
+        'detected_indicators': detected_indicators[:rules['max_indicators_reported']],
         'credibility_factors': credibility_factors,
         'recommendations': recommendations,
         'message': message
     }
 
 
-def analyze_source_quality(content):
+@register_analyzer
+def analyze_scam_keywords(content, keyword_hits=None):
+    """Check for scam keywords"""
+    doc = DocumentContext.of(content, keyword_hits)
+    scam_hits = doc.keyword_hits.keywords(NEWS_SCAM)
+    analysis = doc.tier('scam_keywords', len(scam_hits))
+    if analysis['factors']:
+        analysis['indicators'] = scam_hits
+    return analysis
+
+
+@register_analyzer
+def analyze_sensational_language(content, keyword_hits=None):
+    """Sensational language analysis"""
+    doc = DocumentContext.of(content, keyword_hits)
+    sensational_hits = doc.keyword_hits.keywords(NEWS_SENSATIONAL)
+    analysis = doc.tier('sensational', len(sensational_hits))
+    analysis['indicators'] = sensational_hits
+    return analysis
+
+
+@register_analyzer
+def analyze_clickbait(content, keyword_hits=None):
+    """Clickbait pattern analysis"""
+    doc = DocumentContext.of(content, keyword_hits)
+    clickbait_hits = doc.keyword_hits.patterns(NEWS_CLICKBAIT)
+    analysis = doc.tier('clickbait', len(clickbait_hits))
+    analysis['indicators'] = [pattern.replace(r'\b', '').replace(r'.*', '') for pattern in clickbait_hits]
+    return analysis
+
+
+@register_analyzer
+def analyze_source_quality(content, keyword_hits=None):
     """Analyze source attribution and quality indicators"""
+    doc = DocumentContext.of(content, keyword_hits)
     score = 0
     factors = []
     
     # Check for source attribution
-    source_patterns = [
-        r'according to',
-        r'sources say',
-        r'reported by',
-        r'study shows',
-        r'research indicates'
-    ]
-    
-    has_sources = any(re.search(pattern, content.lower()) for pattern in source_patterns)
+    has_sources = doc.keyword_hits.any(NEWS_SOURCE_ATTRIBUTION)
     
-    if not has_sources and len(content) > 200:
-        score += 15
-        factors.append("Lacks proper source attribution")
+    rule = doc.rules['missing_sources']
+    if not has_sources and doc.length > rule['above_length']:
+        score += rule['points']
+        factors.append(rule['factor'])
     
     # Check for vague sources
-    vague_sources = [
-        'anonymous sources', 'sources close to', 'insiders say',
-        'experts believe', 'many people say'
-    ]
-    
-    vague_count = sum(1 for source in vague_sources if source in content.lower())
-    if vague_count >= 2:
-        score += 20
-        factors.append("Multiple vague source references")
-    elif vague_count >= 1:
-        score += 10
-        factors.append("Contains vague source references")
+    vague = doc.tier('vague_sources', doc.keyword_hits.count(NEWS_VAGUE_SOURCES))
     
-    return {'score': score, 'factors': factors}
+    return {'score': score + vague['score'], 'factors': factors + vague['factors']}
+
+
+@register_analyzer
+def analyze_bias_language(content, keyword_hits=None):
+    """Bias (absolute) language analysis"""
+    doc = DocumentContext.of(content, keyword_hits)
+    return doc.tier('bias', doc.keyword_hits.count(NEWS_BIAS))
+
 
+@register_analyzer
+def analyze_emotional_manipulation(content, keyword_hits=None):
+    """Emotional manipulation analysis"""
+    doc = DocumentContext.of(content, keyword_hits)
+    return doc.tier('emotional', doc.keyword_hits.count(NEWS_EMOTIONAL))
 
-def analyze_factual_claims(content):
+
+@register_analyzer
+def analyze_factual_claims(content, keyword_hits=None):
     """Analyze the nature of factual claims made"""
-    score = 0
-    factors = []
+    doc = DocumentContext.of(content, keyword_hits)
     
     # Look for extraordinary claims
-    extraordinary_patterns = [
-        r'\d+% of (people|doctors|experts)',
-        r'scientists discovered',
-        r'breakthrough study',
-        r'miracle cure',
-        r'secret government'
-    ]
-    
-    extraordinary_count = sum(1 for pattern in extraordinary_patterns 
-                            if re.search(pattern, content.lower()))
-    
-    if extraordinary_count >= 2:
-        score += 25
-        factors.append("Multiple extraordinary claims")
-    elif extraordinary_count >= 1:
-        score += 12
-        factors.append("Contains extraordinary claims")
+    claims = doc.tier('extraordinary_claims', doc.keyword_hits.count(NEWS_EXTRAORDINARY_CLAIMS))
     
     # Check for specific numbers without context
-    number_pattern = r'\b\d{1,3}(?:,\d{3})*(?:\.\d+)?\b'
-    numbers = re.findall(number_pattern, content)
-    
-    if len(numbers) >= 5:
-        score += 15
-        factors.append("Heavy use of statistics without context")
+    statistics = doc.tier('statistics', doc.number_count)
     
-    return {'score': score, 'factors': factors}
+    return {'score': claims['score'] + statistics['score'],
+            'factors': claims['factors'] + statistics['factors']}
 
 
-def analyze_writing_quality(content):
+@register_analyzer
+def analyze_writing_quality(content, keyword_hits=None):
     """Analyze writing quality indicators"""
+    doc = DocumentContext.of(content, keyword_hits)
+    rules = doc.rules
     score = 0
     factors = []
     
     # Check for excessive punctuation
-    if re.search(r'[!?]{2,}', content):
-        score += 10
-        factors.append("Excessive punctuation usage")
+    if doc.has_excessive_punctuation:
+        rule = rules['excessive_punctuation']
+        score += rule['points']
+        factors.append(rule['factor'])
     
     # Check for all caps sections
-    caps_sections = re.findall(r'\b[A-Z]{4,}\b', content)
-    if len(caps_sections) >= 3:
-        score += 15
-        factors.append("Excessive capitalization")
+    caps = doc.tier('caps_words', doc.caps_word_count)
+    score += caps['score']
+    factors.extend(caps['factors'])
     
     # Check sentence length variation (poor quality often has very short or very long sentences)
-    sentences = re.split(r'[.!?]+', content)
-    if sentences:
-        avg_length = sum(len(s.split()) for s in sentences) / len(sentences)
-        if avg_length < 5 or avg_length > 40:
-            score += 10
-            factors.append("Poor sentence structure")
+    rule = rules['sentence_length']
+    avg_length = doc.word_count / doc.sentence_count
+    if avg_length < rule['below'] or avg_length > rule['above']:
+        score += rule['points']
+        factors.append(rule['factor'])
     
     return {'score': score, 'factors': factors}
 
 
-def analyze_urgency(content):
+@register_analyzer
+def analyze_urgency(content, keyword_hits=None):
     """Analyze urgency and time pressure indicators"""
-    score = 0
-    factors = []
-    
-    urgency_words = [
-        'breaking', 'urgent', 'immediate', 'emergency', 'crisis',
-        'must read', 'act now', 'before it\'s too late'
-    ]
-    
-    urgency_count = sum(1 for word in urgency_words if word in content.lower())
-    
-    if urgency_count >= 3:
-        score += 20
-        factors.append("Excessive urgency language")
-    elif urgency_count >= 1:
-        score += 8
-        factors.append("Contains urgency indicators")
-    
-    return {'score': score, 'factors': factors}
+    doc = DocumentContext.of(content, keyword_hits)
+    return doc.tier('urgency', doc.keyword_hits.count(NEWS_URGENCY))
 
 
 def generate_news_recommendations(score, factors):
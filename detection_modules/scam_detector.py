@@ -7,119 +7,118 @@ import re
 import string
 from collections import Counter
 
-def detect_scam(content):
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from utils.keywords import (COMMON_MISSPELLINGS, SCAM_HIGH_RISK, SCAM_MEDIUM_RISK, SCAM_PERSONAL_INFO,
+                            SCAM_SUSPICIOUS_PATTERNS, SCAM_URGENCY, scan_keywords)
+from utils.rule_pack import get_rule_pack, match_level, match_tier
+
+# Writing quality checks
+REPEATED_CHARACTERS_REGEX = re.compile(r'(.)\1{2,}')
+MISSING_SPACE_REGEX = re.compile(r'[.!?][a-zA-Z]')
+EXCESSIVE_PUNCTUATION_REGEX = re.compile(r'[!?]{2,}')
+
+def detect_scam(content, keyword_hits=None, explain=True, stop_at=None):
     """
     Advanced scam detection function
     
     Args:
         content (str): Text content to analyze
+        keyword_hits: result of utils.keywords.scan_keywords(content), if the
+            caller already scanned it
+        explain (bool): False for the fast mode: only is_scam, scam_score,
+            risk_level and message are returned, and no keyword, factor or
+            recommendation strings are built (call again with explain=True
+            for them)
+        stop_at (int): fast mode only; stop evaluating checks (cheapest
+            first) once the score reaches stop_at, e.g. 70 when only CRITICAL
+            matters. scam_score is then a lower bound, and is_scam/risk_level
+            are exact for every threshold up to stop_at
         
     Returns:
         dict: Detection results with score, keywords, and recommendations
     """
     
+    # Advanced scam indicators (keyword and pattern lists, weights and
+    # thresholds: the rule pack, see utils/rule_pack.py), matched against the
+    # lowercased content
+    if keyword_hits is None:
+        keyword_hits = scan_keywords(content)
+    rules = keyword_hits.rules.scam
+    
+    if not explain:
+        scam_score = 0
+        for points in _score_contributions(content, keyword_hits, rules):
+            scam_score += points
+            if stop_at is not None and scam_score >= stop_at:
+                break
+        level = match_level(rules['risk_levels'], scam_score)
+        return {
+            'is_scam': scam_score > rules['scam_above'],
+            'scam_score': min(scam_score, 100),
+            'risk_level': level['level'],
+            'message': level['message']
+        }
+    if stop_at is not None:
+        raise ValueError("stop_at requires explain=False")
+    
     # Initialize analysis
     scam_score = 0
     detected_keywords = []
     risk_factors = []
     
-    # Advanced scam indicators
-    high_risk_keywords = [
-        'urgent', 'winner', 'lottery', 'prize', 'congratulations',
-        'inheritance', 'prince', 'bank transfer', 'wire transfer',
-        'western union', 'moneygram', 'bitcoin', 'cryptocurrency',
-        'tax refund', 'irs', 'government', 'legal action',
-        'suspended account', 'verify account', 'click here',
-        'limited time', 'act now', 'expires today'
-    ]
-    
-    medium_risk_keywords = [
-        'free money', 'easy money', 'work from home', 'make money fast',
-        'no experience required', 'guaranteed', 'risk free',
-        'investment opportunity', 'double your money'
-    ]
-    
-    # URL and link patterns (suspicious)
-    suspicious_patterns = [
-        r'bit\.ly',
-        r'tinyurl',
-        r'[a-z0-9]{10,}\.com',  # Random domain names
-        r'click.*here',
-        r'verify.*account',
-        r'\$\d+',  # Money amounts
-        r'\d{4}-\d{4}-\d{4}-\d{4}',  # Credit card patterns
-    ]
-    
-    # Convert to lowercase for analysis
-    content_lower = content.lower()
-    
     # 1. Keyword Analysis
-    for keyword in high_risk_keywords:
-        if keyword in content_lower:
-            scam_score += 15
-            detected_keywords.append(keyword)
-            risk_factors.append(f"High-risk keyword: '{keyword}'")
-    
-    for keyword in medium_risk_keywords:
-        if keyword in content_lower:
-            scam_score += 8
-            detected_keywords.append(keyword)
-            risk_factors.append(f"Medium-risk keyword: '{keyword}'")
+    rule = rules['high_risk_keyword']
+    for keyword in keyword_hits.keywords(SCAM_HIGH_RISK):
+        scam_score += rule['points']
+        detected_keywords.append(keyword)
+        risk_factors.append(rule['factor'].format(keyword=keyword))
+    
+    rule = rules['medium_risk_keyword']
+    for keyword in keyword_hits.keywords(SCAM_MEDIUM_RISK):
+        scam_score += rule['points']
+        detected_keywords.append(keyword)
+        risk_factors.append(rule['factor'].format(keyword=keyword))
     
     # 2. Pattern Analysis
-    for pattern in suspicious_patterns:
-        matches = re.findall(pattern, content_lower)
-        if matches:
-            scam_score += 12
-            risk_factors.append(f"Suspicious pattern detected: {pattern}")
+    rule = rules['suspicious_pattern']
+    for pattern in keyword_hits.patterns(SCAM_SUSPICIOUS_PATTERNS):
+        scam_score += rule['points']
+        risk_factors.append(rule['factor'].format(pattern=pattern))
     
     # 3. Urgency Analysis
-    urgency_words = ['urgent', 'immediately', 'asap', 'expires', 'limited time', 'act now']
-    urgency_count = sum(1 for word in urgency_words if word in content_lower)
-    if urgency_count >= 2:
-        scam_score += 20
-        risk_factors.append("Multiple urgency indicators")
+    tier = match_tier(rules['urgency'], keyword_hits.count(SCAM_URGENCY))
+    if tier:
+        scam_score += tier['points']
+        risk_factors.append(tier['factor'])
     
     # 4. Grammar and Spelling Analysis
-    spelling_errors = analyze_spelling_quality(content)
-    if spelling_errors > 3:
-        scam_score += 10
-        risk_factors.append(f"Poor spelling/grammar ({spelling_errors} errors)")
+    spelling_errors = analyze_spelling_quality(content, keyword_hits)
+    tier = match_tier(rules['spelling_errors'], spelling_errors)
+    if tier:
+        scam_score += tier['points']
+        risk_factors.append(tier['factor'].format(count=spelling_errors))
     
     # 5. Excessive Capitalization
-    caps_ratio = sum(1 for c in content if c.isupper()) / max(len(content), 1)
-    if caps_ratio > 0.3:
-        scam_score += 15
-        risk_factors.append("Excessive capitalization")
+    rule = rules['capitalization']
+    if _caps_ratio(content) > rule['above_ratio']:
+        scam_score += rule['points']
+        risk_factors.append(rule['factor'])
     
     # 6. Personal Information Requests
-    personal_info_patterns = [
-        r'social security', r'ssn', r'credit card', r'bank account',
-        r'routing number', r'password', r'pin number'
-    ]
-    
-    for pattern in personal_info_patterns:
-        if re.search(pattern, content_lower):
-            scam_score += 25
-            risk_factors.append("Requests personal/financial information")
-            break
+    if keyword_hits.any(SCAM_PERSONAL_INFO):
+        rule = rules['personal_info']
+        scam_score += rule['points']
+        risk_factors.append(rule['factor'])
     
     # Determine risk level
-    is_scam = scam_score > 30
+    is_scam = scam_score > rules['scam_above']
     
     # Risk level classification
-    if scam_score >= 70:
-        risk_level = "CRITICAL"
-        message = "CRITICAL: High probability scam detected!"
-    elif scam_score >= 40:
-        risk_level = "HIGH"
-        message = "HIGH RISK: Likely scam detected!"
-    elif scam_score >= 20:
-        risk_level = "MEDIUM"
-        message = "MEDIUM RISK: Suspicious content detected"
-    else:
-        risk_level = "LOW"
-        message = "LOW RISK: Content appears safe"
+    level = match_level(rules['risk_levels'], scam_score)
+    risk_level = level['level']
+    message = level['message']
     
     # Generate recommendations
     recommendations = generate_scam_recommendations(scam_score, risk_factors)
@@ -128,35 +127,234 @@ def detect_scam(content):
         'is_scam': is_scam,
         'scam_score': min(scam_score, 100),
         'risk_level': risk_level,
-        'detected_keywords': detected_keywords[:10],  # Limit to top 10
+        'detected_keywords': detected_keywords[:rules['max_keywords_reported']],
         'risk_factors': risk_factors,
         'recommendations': recommendations,
         'message': message
     }
 
 
-def analyze_spelling_quality(text):
+def _score_contributions(content, keyword_hits, rules):
+    """The points of each detect_scam check, cheapest checks first."""
+    yield from _hit_contributions(keyword_hits, rules)
+    tier = match_tier(rules['spelling_errors'], analyze_spelling_quality(content, keyword_hits))
+    if tier:
+        yield tier['points']
+    # A pass over every character
+    rule = rules['capitalization']
+    if _caps_ratio(content) > rule['above_ratio']:
+        yield rule['points']
+
+
+def _hit_contributions(keyword_hits, rules):
+    """The points of the checks decided by the keyword scan alone, in _score_contributions order."""
+    # Keyword automaton hits
+    yield keyword_hits.count(SCAM_HIGH_RISK) * rules['high_risk_keyword']['points']
+    yield keyword_hits.count(SCAM_MEDIUM_RISK) * rules['medium_risk_keyword']['points']
+    if keyword_hits.any(SCAM_PERSONAL_INFO):
+        yield rules['personal_info']['points']
+    tier = match_tier(rules['urgency'], keyword_hits.count(SCAM_URGENCY))
+    if tier:
+        yield tier['points']
+    # Regexes
+    yield keyword_hits.count(SCAM_SUSPICIOUS_PATTERNS) * rules['suspicious_pattern']['points']
+
+
+def _caps_ratio(content):
+    return sum(map(str.isupper, content)) / max(len(content), 1)
+
+
+def detect_scam_batch(messages, explain=True, stop_at=None):
+    """
+    detect_scam over many messages, scored together
+    
+    Each message is scanned once; its keyword, pattern and threshold hits
+    become one row of a sparse message x rule matrix, and all scores are one
+    product with the rule weights. Tiers and risk levels are applied to the
+    whole batch at once. Results are those of detect_scam, in order.
+    
+    Args:
+        messages (list of str): Text contents to analyze
+        explain (bool): False for detect_scam's fast mode (no keyword, factor
+            or recommendation strings)
+        stop_at (int): fast mode only; as for detect_scam, scores are those
+            at the first check reaching stop_at, and the spelling check is
+            skipped for messages the keyword scan alone takes there
+        
+    Returns:
+        list of dict: one detect_scam result per message
+    """
+    if explain and stop_at is not None:
+        raise ValueError("stop_at requires explain=False")
+    pack = get_rule_pack()
+    rules = pack.scam
+    
+    # Rule columns: one per keyword/pattern, then the threshold rules
+    weights = []
+    keyword_columns = {}
+    list_columns = {}  # list id -> (first, end) column
+    for lists, list_id, rule_name in ((pack.keyword_lists, SCAM_HIGH_RISK, 'high_risk_keyword'),
+                                      (pack.keyword_lists, SCAM_MEDIUM_RISK, 'medium_risk_keyword'),
+                                      (pack.pattern_lists, SCAM_SUSPICIOUS_PATTERNS, 'suspicious_pattern')):
+        columns = keyword_columns[list_id] = {}
+        first = len(weights)
+        for keyword in lists[list_id]:
+            columns.setdefault(keyword, len(weights))
+            weights.append(rules[rule_name]['points'])
+        list_columns[list_id] = (first, len(weights))
+    urgency_column = len(weights)
+    weights.extend(tier['points'] for tier in rules['urgency'])
+    spelling_column = len(weights)
+    weights.extend(tier['points'] for tier in rules['spelling_errors'])
+    caps_column = len(weights)
+    weights.append(rules['capitalization']['points'])
+    personal_column = len(weights)
+    weights.append(rules['personal_info']['points'])
+    
+    rows, cols = [], []
+    detected_keywords = []
+    risk_factors = []
+    urgency_counts, spelling_counts, personal = [], [], []
+    for i, content in enumerate(messages):
+        keyword_hits = pack.scan(content)
+        keywords, factors = [], []
+        for list_id, rule_name, field in ((SCAM_HIGH_RISK, 'high_risk_keyword', 'keyword'),
+                                          (SCAM_MEDIUM_RISK, 'medium_risk_keyword', 'keyword'),
+                                          (SCAM_SUSPICIOUS_PATTERNS, 'suspicious_pattern', 'pattern')):
+            template = rules[rule_name]['factor']
+            for keyword in keyword_hits.keywords(list_id):
+                rows.append(i)
+                cols.append(keyword_columns[list_id][keyword])
+                if not explain:
+                    continue
+                if field == 'keyword':
+                    keywords.append(keyword)
+                factors.append(template.format(**{field: keyword}))
+        detected_keywords.append(keywords)
+        risk_factors.append(factors)
+        urgency_counts.append(keyword_hits.count(SCAM_URGENCY))
+        if stop_at is not None and sum(_hit_contributions(keyword_hits, rules)) >= stop_at:
+            spelling_counts.append(-1)  # reaches no tier; the score stops before this check
+        else:
+            spelling_counts.append(analyze_spelling_quality(content, keyword_hits))
+        personal.append(keyword_hits.any(SCAM_PERSONAL_INFO))
+    
+    # Threshold rules, for the whole batch
+    n = len(messages)
+    urgency_tiers = _tier_index(urgency_counts, rules['urgency'])
+    spelling_tiers = _tier_index(spelling_counts, rules['spelling_errors'])
+    lengths = np.array([len(content) for content in messages], dtype=np.int64)
+    caps_ratio = _uppercase_counts(messages, lengths) / np.maximum(lengths, 1)
+    caps_hits = caps_ratio > rules['capitalization']['above_ratio']
+    personal_hits = np.asarray(personal, dtype=bool)
+    for column, tiers in ((urgency_column, urgency_tiers), (spelling_column, spelling_tiers)):
+        matched = np.flatnonzero(tiers >= 0)
+        rows.extend(matched.tolist())
+        cols.extend((column + tiers[matched]).tolist())
+    for column, hits in ((caps_column, caps_hits), (personal_column, personal_hits)):
+        matched = np.flatnonzero(hits)
+        rows.extend(matched.tolist())
+        cols.extend([column] * len(matched))
+    
+    hit_matrix = csr_matrix((np.ones(len(rows), dtype=np.int64), (rows, cols)),
+                            shape=(n, len(weights)))
+    scores = hit_matrix @ np.asarray(weights)
+    if stop_at is not None and n:
+        # Points per check in _score_contributions order; the score is the
+        # running total at the first check that reaches stop_at
+        points = csr_matrix(hit_matrix.multiply(np.asarray(weights))).tocsc()
+        checks = [list_columns[SCAM_HIGH_RISK], list_columns[SCAM_MEDIUM_RISK],
+                  (personal_column, personal_column + 1), (urgency_column, spelling_column),
+                  list_columns[SCAM_SUSPICIOUS_PATTERNS], (spelling_column, caps_column),
+                  (caps_column, personal_column)]
+        running = np.cumsum(np.column_stack([np.asarray(points[:, first:end].sum(axis=1)).ravel()
+                                             for first, end in checks]), axis=1)
+        reached = running >= stop_at
+        scores = np.where(reached.any(axis=1), running[np.arange(n), reached.argmax(axis=1)], scores)
+    is_scam = scores > rules['scam_above']
+    levels = rules['risk_levels']
+    level_index = np.select([scores >= level['min_score'] for level in levels],
+                            np.arange(len(levels)), default=len(levels) - 1) if n else np.zeros(0, dtype=int)
+    
+    results = []
+    max_keywords = rules['max_keywords_reported']
+    for i, score in enumerate(scores.tolist()):
+        level = levels[level_index[i]]
+        if not explain:
+            results.append({
+                'is_scam': bool(is_scam[i]),
+                'scam_score': min(score, 100),
+                'risk_level': level['level'],
+                'message': level['message']
+            })
+            continue
+        factors = risk_factors[i]
+        if urgency_tiers[i] >= 0:
+            factors.append(rules['urgency'][urgency_tiers[i]]['factor'])
+        if spelling_tiers[i] >= 0:
+            factors.append(rules['spelling_errors'][spelling_tiers[i]]['factor'].format(count=spelling_counts[i]))
+        if caps_hits[i]:
+            factors.append(rules['capitalization']['factor'])
+        if personal_hits[i]:
+            factors.append(rules['personal_info']['factor'])
+        results.append({
+            'is_scam': bool(is_scam[i]),
+            'scam_score': min(score, 100),
+            'risk_level': level['level'],
+            'detected_keywords': detected_keywords[i][:max_keywords],
+            'risk_factors': factors,
+            'recommendations': generate_scam_recommendations(score, factors),
+            'message': level['message']
+        })
+    return results
+
+
+_BMP_UPPERCASE = None  # str.isupper of every code point below 0x10000, built on first use
+
+
+def _uppercase_counts(messages, lengths):
+    """Uppercase characters (str.isupper) per message, counted over the joined batch."""
+    global _BMP_UPPERCASE
+    if _BMP_UPPERCASE is None:
+        _BMP_UPPERCASE = np.array([chr(code).isupper() for code in range(0x10000)], dtype=bool)
+    codes = np.frombuffer(''.join(messages).encode('utf-32-le', 'surrogatepass'), dtype='<u4')
+    is_upper = _BMP_UPPERCASE[codes & 0xFFFF]
+    for i in np.flatnonzero(codes > 0xFFFF).tolist():
+        is_upper[i] = chr(codes[i]).isupper()
+    positions = np.flatnonzero(is_upper)
+    ends = np.cumsum(lengths)
+    return np.searchsorted(positions, ends) - np.searchsorted(positions, ends - lengths)
+
+
+def _tier_index(counts, tiers):
+    """Index of the tier each count reaches (see match_tier), -1 for none."""
+    counts = np.asarray(counts)
+    if not len(counts):
+        return np.zeros(0, dtype=int)
+    return np.select([counts >= tier['min_count'] for tier in tiers], np.arange(len(tiers)), default=-1)
+
+
+def analyze_spelling_quality(text, keyword_hits=None):
     """Basic spelling/grammar quality analysis"""
     # Simple heuristics for poor quality text
     errors = 0
     
     # Check for repeated characters (like "hellooo")
-    if re.search(r'(.)\1{2,}', text):
+    if REPEATED_CHARACTERS_REGEX.search(text):
         errors += 1
     
     # Check for missing spaces after punctuation
-    if re.search(r'[.!?][a-zA-Z]', text):
+    if MISSING_SPACE_REGEX.search(text):
         errors += 1
     
     # Check for excessive punctuation
-    if re.search(r'[!?]{2,}', text):
+    if EXCESSIVE_PUNCTUATION_REGEX.search(text):
         errors += 1
     
     # Check for common misspellings
-    common_errors = ['recieve', 'seperate', 'occured', 'definately', 'goverment']
-    for error in common_errors:
-        if error in text.lower():
-            errors += 1
+    if keyword_hits is None:
+        keyword_hits = scan_keywords(text)
+    errors += keyword_hits.count(COMMON_MISSPELLINGS)
     
     return errors
 
@@ -11,12 +11,12 @@ from firebase_functions import https_fn, options
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 try:
-    from ml.predict import ScamPredictor
-    from google_ai.translate import detect_and_translate
-    from utils.url_extractor import extract_urls
-    from google_ai.safe_browsing import check_urls_safe_browsing
-    from utils.risk_score import compute_risk_score_and_reasons
-    from detection_modules.fake_news_detector import detect_fake_news
+    from ml.registry import ModelRegistry
+    from utils.pipeline import analyze_message, analyze_messages, rules_option, validate_batch_request
+    from utils.cache import cache_from_env
+    from utils.http_client import get_http_client
+    from google_ai.safe_browsing import backend_status, get_verdict_cache
+    from detection_modules.fake_news_detector import detect_fake_news, detect_fake_news_stream, read_text_chunks
     from detection_modules.scam_detector import detect_scam
 except ImportError as e:
     print(f"Import error: {e}")
@@ -25,6 +25,13 @@ except ImportError as e:
 # Initialize Flask app for Cloud Functions
 app = Flask(__name__)
 
+# Upper bound on messages accepted by /api/detect-scam/batch in one call
+MAX_BATCH_MESSAGES = int(os.environ.get('MAX_BATCH_MESSAGES', 5000))
+
+# Content-addressed caches, kept for the lifetime of a warm instance
+prediction_cache = cache_from_env("PREDICTION_CACHE")
+analysis_cache = cache_from_env("ANALYSIS_CACHE")
+
 # Initialize predictor (will be loaded when first called)
 predictor = None
 
@@ -32,10 +39,10 @@ def get_predictor():
     global predictor
     if predictor is None:
         try:
-            predictor = ScamPredictor(
-                model_path=os.path.join("..", "models", "scam_model.pkl"),
-                vectorizer_path=os.path.join("..", "models", "vectorizer.pkl")
-            )
+            # Serves models/versions/<CURRENT>, or the files directly under models/
+            registry = ModelRegistry(root=os.path.join("..", "models"), cache=prediction_cache)
+            registry.current()
+            predictor = registry
         except Exception as e:
             print(f"Error loading predictor: {e}")
             return None
@@ -68,6 +75,8 @@ def api(req: https_fn.Request) -> https_fn.Response:
     
     if path == 'detect-scam' and req.method == 'POST':
         return detect_scam_api(req)
+    elif path == 'detect-scam/batch' and req.method == 'POST':
+        return detect_scam_batch_api(req)
     elif path == 'analyze-news' and req.method == 'POST':
         return analyze_news_api(req)
     elif path == 'analyze-scam' and req.method == 'POST':
@@ -109,42 +118,54 @@ def detect_scam_api(req):
                 headers={'Content-Type': 'application/json'}
             )
 
-        # Extract URLs
-        urls = extract_urls(message)
+        result = analyze_message(message, pred, cache=analysis_cache,
+                                 rules=rules_option(data.get("rules")), timings=True)
 
-        # Detect language & translate
-        detected_language, translated_text, translation_performed = detect_and_translate(message)
+        return https_fn.Response(
+            json.dumps(result),
+            status=200,
+            headers={'Content-Type': 'application/json'}
+        )
 
-        # Predict
-        prediction_result = pred.predict(translated_text)
+    except Exception as e:
+        return https_fn.Response(
+            json.dumps({"error": "Internal server error", "detail": str(e)}),
+            status=500,
+            headers={'Content-Type': 'application/json'}
+        )
 
-        # Check URLs
-        url_checks = check_urls_safe_browsing(urls)
+def detect_scam_batch_api(req):
+    """Batch scam detection API endpoint"""
+    try:
+        data = req.get_json()
+        error, results = validate_batch_request(data, MAX_BATCH_MESSAGES)
+        if error:
+            return https_fn.Response(
+                json.dumps({"error": error}),
+                status=400,
+                headers={'Content-Type': 'application/json'}
+            )
 
-        # Calculate risk score
-        risk_score, reasons = compute_risk_score_and_reasons(
-            prediction_result=prediction_result,
-            urls_check=url_checks,
-            original_text=message
-        )
+        # Get predictor
+        pred = get_predictor()
+        if not pred:
+            return https_fn.Response(
+                json.dumps({"error": "ML model not available"}),
+                status=500,
+                headers={'Content-Type': 'application/json'}
+            )
 
-        # Map verdict
-        label_map = {0: "Safe", 1: "Spam", 2: "Scam"}
-        verdict = label_map.get(prediction_result["predicted_label"], "Unknown")
-
-        result = {
-            "verdict": verdict,
-            "risk_score": int(risk_score),
-            "confidence": round(float(prediction_result.get("confidence", 0)), 4),
-            "reasons": reasons,
-            "detected_language": detected_language,
-            "message": message,
-            "translated_text": translated_text if (translation_performed and translated_text != message) else None,
-            "translation_available": translation_performed
-        }
+        # Invalid messages keep their error entry instead of failing the batch
+        valid_indices = [i for i, message in enumerate(results) if isinstance(message, str)]
+        valid_messages = [results[i] for i in valid_indices]
+        if valid_messages:
+            batch_results = analyze_messages(valid_messages, pred, cache=analysis_cache,
+                                             rules=rules_option(data.get("rules")))
+            for i, result in zip(valid_indices, batch_results):
+                results[i] = result
 
         return https_fn.Response(
-            json.dumps(result),
+            json.dumps({"count": len(results), "results": results}),
             status=200,
             headers={'Content-Type': 'application/json'}
         )
@@ -159,6 +180,22 @@ def detect_scam_api(req):
 def analyze_news_api(req):
     """Fake news detection API endpoint"""
     try:
+        if req.mimetype == 'text/plain':
+            # Raw page text, analysed as it is read (bounded memory)
+            result = detect_fake_news_stream(
+                read_text_chunks(req.stream, req.mimetype_params.get('charset', 'utf-8')))
+            if result is None:
+                return https_fn.Response(
+                    json.dumps({"error": "Content cannot be empty"}),
+                    status=400,
+                    headers={'Content-Type': 'application/json'}
+                )
+            return https_fn.Response(
+                json.dumps(result),
+                status=200,
+                headers={'Content-Type': 'application/json'}
+            )
+
         data = req.get_json()
         if not data or "content" not in data:
             return https_fn.Response(
@@ -225,7 +262,17 @@ def analyze_scam_api(req):
 def health_check(req):
     """Health check endpoint"""
     return https_fn.Response(
-        json.dumps({"status": "ok", "service": "SafeGuard Firebase"}),
+        json.dumps({
+            "status": "ok",
+            "service": "SafeGuard Firebase",
+            "cache": {
+                "prediction": prediction_cache.stats(),
+                "analysis": analysis_cache.stats(),
+                "safe_browsing": get_verdict_cache().stats()
+            },
+            "safe_browsing": backend_status(),
+            "http": get_http_client().stats()
+        }),
         status=200,
         headers={'Content-Type': 'application/json'}
     )
\ No newline at end of file
@@ -14,12 +14,117 @@ Response format:
   },
   "error": "..." optional
 }
+
+check_urls_safe_browsing_batch(url_lists) returns one such structure per list,
+but sends the de-duplicated union of all URLs upstream in as few calls as
+the API allows (MAX_URLS_PER_REQUEST threat entries per call).
+
+Verdicts are cached per URL (google_ai/verdict_cache.py: an in-memory LRU in
+front of a SQLite file, SAFE_BROWSING_CACHE_PATH): unsafe ones for the
+cacheDuration of the match, safe ones for SAFE_BROWSING_NEGATIVE_TTL seconds.
+Only URLs without a cached verdict are sent upstream.
+
+With SAFE_BROWSING_BACKEND=local, URLs are checked against a local copy of
+the threat lists instead (google_ai/safe_browsing_db.py, kept in sync with
+the Update API in the background); only URLs whose hash prefix is listed are
+confirmed upstream. Until the first sync completes, the Lookup API is used.
+
+API calls go through the shared pooled client (utils/http_client.py), which
+keeps connections alive and retries transient failures.
+check_urls_safe_browsing_async is the same check for coroutines: lookups are
+awaited on the client's event loop instead of blocking a thread.
+
+Lookups from concurrent requests are coalesced (utils/micro_batcher.py):
+uncached URLs are queued for up to SAFE_BROWSING_BATCH_WINDOW_MS (default 5,
+0 disables) and sent together, de-duplicated, in one call of at most
+MAX_URLS_PER_REQUEST URLs; each caller gets the verdicts of its own URLs.
+Batches run in a small pool of their own (SAFE_BROWSING_BATCH_WORKERS,
+default 4), so a slow upstream call does not hold up the next batch. A caller
+waits at most lookup_timeout() for its verdicts (the longest a batch can take:
+every attempt the HTTP client may make, each with the upstream timeout, their
+backoff delays and the batch window), then gets the usual unchecked result
+with an error.
 """
+import asyncio
 import os
-import requests
-import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from google_ai.verdict_cache import parse_duration, verdict_cache_from_env
+from utils.http_client import MAX_RETRY_DELAY, get_http_client
+from utils.micro_batcher import MicroBatcher
+from utils.stages import get_executor
 
 SAFE_BROWSING_URL = "https://safebrowsing.googleapis.com/v4/threatMatches:find"
+MAX_URLS_PER_REQUEST = 500
+CLIENT = {"clientId": "scam_detection_system", "clientVersion": "1.0"}
+THREAT_TYPES = ["MALWARE", "SOCIAL_ENGINEERING", "POTENTIALLY_HARMFUL_APPLICATION", "UNWANTED_SOFTWARE"]
+BATCH_WINDOW_MS = float(os.environ.get("SAFE_BROWSING_BATCH_WINDOW_MS", 5))
+BATCH_WORKERS = int(os.environ.get("SAFE_BROWSING_BATCH_WORKERS", 4))
+UPSTREAM_TIMEOUT = 10
+
+_verdict_cache = None
+_verdict_cache_lock = threading.Lock()
+_threat_database = None
+_url_batchers = {}  # api key -> MicroBatcher
+
+
+def get_verdict_cache():
+    global _verdict_cache
+    if _verdict_cache is None:
+        with _verdict_cache_lock:
+            if _verdict_cache is None:
+                _verdict_cache = verdict_cache_from_env()
+    return _verdict_cache
+
+
+def get_threat_database(api_key):
+    """The local threat list database (syncing in the background), or None with the Lookup API backend."""
+    global _threat_database
+    if os.environ.get("SAFE_BROWSING_BACKEND", "lookup") != "local" or not api_key:
+        return None
+    if _threat_database is None:
+        with _verdict_cache_lock:
+            if _threat_database is None:
+                from google_ai.safe_browsing_db import threat_database_from_env
+                database = threat_database_from_env(api_key)
+                database.start_updater()
+                _threat_database = database
+    return _threat_database
+
+
+def get_url_batcher(api_key):
+    """The batcher coalescing URL lookups across requests, or None if SAFE_BROWSING_BATCH_WINDOW_MS is 0."""
+    if BATCH_WINDOW_MS <= 0 or not api_key:
+        return None
+    batcher = _url_batchers.get(api_key)
+    if batcher is None:
+        with _verdict_cache_lock:
+            batcher = _url_batchers.get(api_key)
+            if batcher is None:
+                executor = ThreadPoolExecutor(max_workers=max(BATCH_WORKERS, 1),
+                                              thread_name_prefix="safe-browsing-batch")
+                batcher = MicroBatcher(lambda urls: _check_urls(urls, api_key),
+                                       max_batch_size=MAX_URLS_PER_REQUEST, max_wait=BATCH_WINDOW_MS / 1000.0,
+                                       name="safe-browsing-batcher", executor=executor)
+                _url_batchers[api_key] = batcher
+    return batcher
+
+
+def lookup_timeout():
+    """Seconds a caller waits for coalesced verdicts: the retry budget of one upstream call plus the batch window."""
+    retries = get_http_client().retries
+    return (retries + 1) * UPSTREAM_TIMEOUT + retries * MAX_RETRY_DELAY + BATCH_WINDOW_MS / 1000.0
+
+
+def backend_status():
+    api_key = os.environ.get("SAFE_BROWSING_API_KEY")
+    database = get_threat_database(api_key)
+    status = {"backend": "lookup"} if database is None else {"backend": "local", **database.status()}
+    batcher = get_url_batcher(api_key)
+    if batcher is not None:
+        status["coalescing"] = batcher.stats()
+    return status
 
 def check_urls_safe_browsing(urls):
     if not urls:
@@ -29,41 +134,167 @@ def check_urls_safe_browsing(urls):
         # Gracefully skip URL checking
         return {"checked": False, "api_key_present": False, "matches": {}}
 
-    body = {
-        "client": {
-            "clientId": "scam_detection_system",
-            "clientVersion": "1.0"
-        },
+    try:
+        matches = _lookup(urls, api_key)
+        return {"checked": True, "api_key_present": True, "matches": matches}
+    except Exception as e:
+        return {"checked": False, "api_key_present": True, "matches": {}, "error": str(e)}
+
+async def check_urls_safe_browsing_async(urls):
+    if not urls:
+        return {"checked": True, "api_key_present": False, "matches": {}}
+    api_key = os.environ.get("SAFE_BROWSING_API_KEY")
+    if not api_key:
+        return {"checked": False, "api_key_present": False, "matches": {}}
+
+    try:
+        matches = await _lookup_async(urls, api_key)
+        return {"checked": True, "api_key_present": True, "matches": matches}
+    except Exception as e:
+        return {"checked": False, "api_key_present": True, "matches": {}, "error": str(e)}
+
+def check_urls_safe_browsing_batch(url_lists):
+    """
+    Check several URL lists at once. Returns a list of results in the same
+    format (and order) as calling check_urls_safe_browsing on each list.
+    """
+    url_lists = [list(urls or []) for urls in url_lists]
+    api_key = os.environ.get("SAFE_BROWSING_API_KEY")
+    unique_urls = list(dict.fromkeys(u for urls in url_lists for u in urls))
+
+    all_matches = {}
+    error = None
+    if api_key and unique_urls:
+        try:
+            all_matches = _lookup(unique_urls, api_key)
+        except Exception as e:
+            error = str(e)
+
+    results = []
+    for urls in url_lists:
+        if not urls:
+            results.append({"checked": True, "api_key_present": False, "matches": {}})
+        elif not api_key:
+            results.append({"checked": False, "api_key_present": False, "matches": {}})
+        elif error is not None:
+            results.append({"checked": False, "api_key_present": True, "matches": {}, "error": error})
+        else:
+            matches = {u: all_matches[u] for u in urls}
+            results.append({"checked": True, "api_key_present": True, "matches": matches})
+    return results
+
+def _lookup(urls, api_key):
+    """{url: verdict} for every url; only the ones without a cached verdict are sent upstream."""
+    verdicts = get_verdict_cache().get_many(urls)
+    missing = [u for u in dict.fromkeys(urls) if u not in verdicts]
+    batcher = get_url_batcher(api_key)
+    if batcher is not None:
+        futures = [batcher.submit(u) for u in missing]
+        timeout = lookup_timeout()
+        if wait(futures, timeout=timeout).not_done:
+            for future in futures:
+                future.cancel()
+            raise TimeoutError(f"Safe Browsing lookup timed out after {timeout:g}s")
+        verdicts.update(zip(missing, (future.result() for future in futures)))
+    else:
+        for start in range(0, len(missing), MAX_URLS_PER_REQUEST):
+            chunk = missing[start:start + MAX_URLS_PER_REQUEST]
+            verdicts.update(zip(chunk, _check_urls(chunk, api_key)))
+    return {u: verdicts[u] for u in urls}
+
+async def _lookup_async(urls, api_key):
+    """_lookup with the upstream requests (one per chunk) awaited concurrently."""
+    cache = get_verdict_cache()
+    verdicts = cache.get_many(urls)
+    missing = [u for u in dict.fromkeys(urls) if u not in verdicts]
+    batcher = get_url_batcher(api_key)
+    if batcher is not None:
+        timeout = lookup_timeout()
+        try:
+            results = await asyncio.wait_for(
+                asyncio.gather(*(asyncio.wrap_future(batcher.submit(u)) for u in missing)), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Safe Browsing lookup timed out after {timeout:g}s") from None
+        verdicts.update(zip(missing, results))
+        return {u: verdicts[u] for u in urls}
+
+    database = get_threat_database(api_key)
+
+    async def check(chunk):
+        if database is not None and database.ready:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(get_executor(), database.find_threat_matches, chunk)
+        return await _find_threat_matches_async(chunk, api_key)
+
+    chunks = [missing[start:start + MAX_URLS_PER_REQUEST] for start in range(0, len(missing), MAX_URLS_PER_REQUEST)]
+    for matches, ttls in await asyncio.gather(*(check(chunk) for chunk in chunks)):
+        cache.put_many(matches, ttls)
+        verdicts.update(matches)
+    return {u: verdicts[u] for u in urls}
+
+def _check_urls(urls, api_key):
+    """
+    Verdicts for urls (at most MAX_URLS_PER_REQUEST, duplicates allowed) in
+    order, from one upstream call (or the local database); caches them.
+    """
+    unique_urls = list(dict.fromkeys(urls))
+    database = get_threat_database(api_key)
+    if database is not None and database.ready:
+        matches, ttls = database.find_threat_matches(unique_urls)
+    else:
+        matches, ttls = _find_threat_matches(unique_urls, api_key)
+    get_verdict_cache().put_many(matches, ttls)
+    return [matches[u] for u in urls]
+
+def _find_threat_matches(urls, api_key):
+    """
+    POST one threatMatches:find request. Returns ({url: verdict} for every
+    url, {url: cacheDuration in seconds} for the unsafe ones that have one).
+    """
+    resp = get_http_client().post(SAFE_BROWSING_URL, params={"key": api_key}, json=_threat_matches_body(urls),
+                                  timeout=UPSTREAM_TIMEOUT)
+    resp.raise_for_status()
+    return _parse_threat_matches(resp.json(), urls)
+
+async def _find_threat_matches_async(urls, api_key):
+    resp = await get_http_client().post_async(SAFE_BROWSING_URL, params={"key": api_key},
+                                              json=_threat_matches_body(urls), timeout=UPSTREAM_TIMEOUT)
+    resp.raise_for_status()
+    return _parse_threat_matches(resp.json(), urls)
+
+def _threat_matches_body(urls):
+    return {
+        "client": CLIENT,
         "threatInfo": {
-            "threatTypes": ["MALWARE", "SOCIAL_ENGINEERING", "POTENTIALLY_HARMFUL_APPLICATION", "UNWANTED_SOFTWARE"],
+            "threatTypes": THREAT_TYPES,
             "platformTypes": ["ANY_PLATFORM"],
             "threatEntryTypes": ["URL"],
             "threatEntries": [{"url": u} for u in urls]
         }
     }
-    params = {"key": api_key}
-    try:
-        resp = requests.post(SAFE_BROWSING_URL, params=params, json=body, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-        matches_raw = data.get("matches", [])
-        matches = {u: {"unsafe": False, "threat_types": []} for u in urls}
-        # matches_raw contains entries with 'threat' field having 'url' and 'threatType'
-        for m in matches_raw:
-            threat = m.get("threat", {})
-            url = threat.get("url")
-            ttype = m.get("threatType") or m.get("threatTypes") or []
-            # mark as unsafe
-            if url in matches:
-                matches[url]["unsafe"] = True
-                # threatType may be a single string
-                if isinstance(ttype, str):
-                    matches[url]["threat_types"].append(ttype)
-                elif isinstance(ttype, list):
-                    matches[url]["threat_types"].extend(ttype)
-                else:
-                    # fallback
-                    matches[url]["threat_types"].append(str(m.get("threatType", "")))
-        return {"checked": True, "api_key_present": True, "matches": matches}
-    except Exception as e:
-        return {"checked": False, "api_key_present": True, "matches": {}, "error": str(e)}
\ No newline at end of file
+
+def _parse_threat_matches(data, urls):
+    matches_raw = data.get("matches", [])
+    matches = {u: {"unsafe": False, "threat_types": []} for u in urls}
+    ttls = {}
+    # matches_raw contains entries with 'threat' field having 'url' and 'threatType'
+    for m in matches_raw:
+        threat = m.get("threat", {})
+        url = threat.get("url")
+        ttype = m.get("threatType") or m.get("threatTypes") or []
+        # mark as unsafe
+        if url in matches:
+            matches[url]["unsafe"] = True
+            # Keep the verdict for the shortest cacheDuration of its matches
+            duration = parse_duration(m.get("cacheDuration"))
+            if duration is not None:
+                ttls[url] = min(duration, ttls.get(url, duration))
+            # threatType may be a single string
+            if isinstance(ttype, str):
+                matches[url]["threat_types"].append(ttype)
+            elif isinstance(ttype, list):
+                matches[url]["threat_types"].extend(ttype)
+            else:
+                # fallback
+                matches[url]["threat_types"].append(str(m.get("threatType", "")))
+    return matches, ttls
@@ -0,0 +1,477 @@
+"""
+Local Safe Browsing v4 database: threat lists synced with the Update API and
+checked on-box, so most lookups never leave the machine.
+
+    db = LocalThreatDatabase(api_key, path="data/safe_browsing_db.pkl")
+    db.update()                            # threatListUpdates:fetch, once
+    db.start_updater()                     # or keep syncing in the background
+    matches, ttls = db.find_threat_matches(urls)
+
+Every threat list (THREAT_TYPES x ANY_PLATFORM x URL) is kept as a PrefixSet:
+for each prefix length, one bytes object of the sorted prefixes, searched by
+bisection (a million 4-byte prefixes take 4 MB; 4-byte ones are searched as
+an array of integers). update() applies the RAW
+additions and removals of each list response, checks the SHA-256 checksum of
+the resulting prefixes (a list that does not match is dropped and fetched
+whole next time) and writes the lists to path atomically, so a restart
+starts from the stored state. The updater waits minimumWaitDuration between
+updates and backs off after errors.
+
+A URL is looked up through the SHA-256 hashes of its host suffix / path
+prefix expressions (url_expressions, after canonicalize_url). Only when one
+of them starts with a stored prefix is the full hash confirmed with
+fullHashes:find; full hash answers are cached for their cacheDuration, and
+prefixes found clean for the negativeCacheDuration. find_threat_matches
+returns what check_urls_safe_browsing's _find_threat_matches does, so the
+per-URL verdict cache (google_ai/verdict_cache.py) works the same way on
+top of it.
+
+api_root points at the v4 API; tests point it at a local stand-in server.
+"""
+import base64
+import bisect
+import hashlib
+import heapq
+import ipaddress
+import os
+import pickle
+import random
+import re
+import sys
+import threading
+import time
+from array import array
+from urllib.parse import unquote_to_bytes
+
+from google_ai.safe_browsing import CLIENT, THREAT_TYPES
+from google_ai.verdict_cache import parse_duration
+from utils.http_client import get_http_client
+
+API_ROOT = "https://safebrowsing.googleapis.com/v4"
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               "data", "safe_browsing_db.pkl")
+PLATFORM_TYPE = "ANY_PLATFORM"
+THREAT_ENTRY_TYPE = "URL"
+DEFAULT_UPDATE_INTERVAL = 1800
+MAX_BACKOFF = 24 * 3600
+
+_ESCAPE_BYTES = frozenset(range(0, 33)) | frozenset(range(127, 256)) | {ord("#"), ord("%")}
+_CONSECUTIVE_DOTS = re.compile(r"\.{2,}")
+_CONSECUTIVE_SLASHES = re.compile(r"/{2,}")
+
+
+# ============ URL CANONICALIZATION ============
+
+def _escape(data):
+    return "".join(f"%{b:02X}" if b in _ESCAPE_BYTES else chr(b) for b in data)
+
+
+def _unescape(text):
+    data = text.encode("utf-8", "surrogatepass")
+    while True:
+        unescaped = unquote_to_bytes(data)
+        if unescaped == data:
+            return data
+        data = unescaped
+
+
+def _parse_ipv4(host):
+    """inet_aton-style dotted (decimal, octal or hex) IPv4 address, normalized; None if host is not one."""
+    parts = host.split(".")
+    if not 1 <= len(parts) <= 4:
+        return None
+    values = []
+    for part in parts:
+        try:
+            if part.lower().startswith("0x"):
+                values.append(int(part[2:] or "0", 16))
+            elif len(part) > 1 and part.startswith("0"):
+                values.append(int(part, 8))
+            else:
+                values.append(int(part, 10))
+        except ValueError:
+            return None
+    *head, last = values
+    if any(v > 255 for v in head) or last >= 256 ** (5 - len(values)):
+        return None
+    address = 0
+    for v in head:
+        address = address << 8 | v
+    address = address << 8 * (5 - len(values)) | last
+    return str(ipaddress.IPv4Address(address))
+
+
+def canonicalize_url(url):
+    """
+    (host, path, query) of url, canonicalized as the Safe Browsing v4 API
+    specifies: control characters and fragment dropped, percent-escapes
+    resolved repeatedly, host lowercased without extra dots (IPv4 in dotted
+    decimal), path with ./ and ../ resolved, then re-escaped. query is None
+    if the URL has none. The scheme, user info and port are not part of it.
+    """
+    url = url.strip().replace("\t", "").replace("\r", "").replace("\n", "")
+    url = url.split("#", 1)[0]
+    text = _unescape(url).decode("latin-1")
+    if "://" not in text:
+        text = "http://" + text
+    text = text.split("://", 1)[1]
+
+    split = min((i for i in (text.find("/"), text.find("?")) if i >= 0), default=len(text))
+    authority, rest = text[:split], text[split:]
+    host = authority.rsplit("@", 1)[-1]
+    if host.startswith("["):
+        host = host[:host.find("]") + 1] or host
+    else:
+        host = host.split(":", 1)[0]
+    host = _CONSECUTIVE_DOTS.sub(".", host.strip(".")).lower()
+    host = _parse_ipv4(host) or host
+
+    path, has_query, query = rest.partition("?")
+    query = query if has_query else None
+    path = _CONSECUTIVE_SLASHES.sub("/", path or "/")
+    segments = []
+    for segment in path.split("/")[1:]:
+        if segment == "..":
+            if segments:
+                segments.pop()
+        elif segment != ".":
+            segments.append(segment)
+    if path.endswith(("/.", "/..")):
+        segments.append("")
+    path = "/" + "/".join(segments)
+
+    encode = lambda part: _escape(part.encode("latin-1"))
+    return encode(host), encode(path), None if query is None else encode(query)
+
+
+def url_expressions(url):
+    """The host suffix / path prefix expressions of url, e.g. "a.b.c/1/" (at most 30)."""
+    host, path, query = canonicalize_url(url)
+    hosts = [host]
+    if _parse_ipv4(host) is None:
+        components = host.split(".")
+        for i in range(max(1, len(components) - 5), len(components) - 1):
+            hosts.append(".".join(components[i:]))
+
+    paths = [path if query is None else f"{path}?{query}", path]
+    prefix = "/"
+    paths.append(prefix)
+    for directory in path.split("/")[1:-1][:3]:
+        prefix += directory + "/"
+        paths.append(prefix)
+
+    return list(dict.fromkeys(h + p for h in dict.fromkeys(hosts) for p in dict.fromkeys(paths)))
+
+
+def url_hashes(url):
+    """SHA-256 of each of url's expressions."""
+    return [hashlib.sha256(expression.encode("ascii")).digest() for expression in url_expressions(url)]
+
+
+# ============ PREFIX STORE ============
+
+class _Slots:
+    """The fixed-size items of one bytes object, as a sequence for bisect."""
+
+    def __init__(self, blob, size):
+        self.blob = blob
+        self.size = size
+
+    def __len__(self):
+        return len(self.blob) // self.size
+
+    def __getitem__(self, i):
+        return self.blob[i * self.size:(i + 1) * self.size]
+
+    def __iter__(self):
+        size = self.size
+        return (self.blob[i:i + size] for i in range(0, len(self.blob), size))
+
+
+def _index(blob, size):
+    """A sorted sequence to bisect for the size-byte prefixes in blob."""
+    if size == 4:
+        # As big-endian integers, so bisect runs in C
+        values = array("I", blob)
+        if sys.byteorder == "little":
+            values.byteswap()
+        return values
+    return _Slots(blob, size)
+
+
+class PrefixSet:
+    def __init__(self, prefixes=()):
+        by_size = {}
+        for prefix in prefixes:
+            by_size.setdefault(len(prefix), []).append(prefix)
+        self.blobs = {size: b"".join(sorted(items)) for size, items in by_size.items()}
+        self._indexes = {size: _index(blob, size) for size, blob in self.blobs.items()}
+
+    @classmethod
+    def from_blobs(cls, blobs):
+        prefixes = cls()
+        prefixes.blobs = blobs
+        prefixes._indexes = {size: _index(blob, size) for size, blob in blobs.items()}
+        return prefixes
+
+    def __len__(self):
+        return sum(len(blob) // size for size, blob in self.blobs.items())
+
+    def sorted_prefixes(self):
+        """Every prefix, in the lexicographic order removal indices and checksums refer to."""
+        return list(heapq.merge(*(_Slots(blob, size) for size, blob in self.blobs.items())))
+
+    def match(self, full_hash):
+        """The stored prefix full_hash starts with, or None."""
+        for size, index in self._indexes.items():
+            prefix = full_hash[:size]
+            key = int.from_bytes(prefix, "big") if size == 4 else prefix
+            i = bisect.bisect_left(index, key)
+            if i < len(index) and index[i] == key:
+                return prefix
+        return None
+
+
+class ThreatList:
+    def __init__(self, threat_type, state=None, prefixes=None):
+        self.threat_type = threat_type
+        self.state = state
+        self.prefixes = prefixes or PrefixSet()
+
+    def descriptor(self):
+        return {"threatType": self.threat_type, "platformType": PLATFORM_TYPE,
+                "threatEntryType": THREAT_ENTRY_TYPE}
+
+    def apply(self, response):
+        """The list after one listUpdateResponse; raises ValueError if its checksum does not match."""
+        prefixes = [] if response.get("responseType") == "FULL_UPDATE" else self.prefixes.sorted_prefixes()
+
+        removed = set()
+        for removal in response.get("removals", []):
+            if removal.get("compressionType", "RAW") != "RAW":
+                raise ValueError(f"unsupported compression {removal.get('compressionType')}")
+            removed.update(removal.get("rawIndices", {}).get("indices", []))
+        if removed:
+            prefixes = [p for i, p in enumerate(prefixes) if i not in removed]
+
+        for addition in response.get("additions", []):
+            if addition.get("compressionType", "RAW") != "RAW":
+                raise ValueError(f"unsupported compression {addition.get('compressionType')}")
+            raw = addition["rawHashes"]
+            size = raw["prefixSize"]
+            data = base64.b64decode(raw["rawHashes"])
+            prefixes += [data[i:i + size] for i in range(0, len(data), size)]
+
+        updated = PrefixSet(prefixes)
+        expected = response.get("checksum", {}).get("sha256")
+        if expected is not None:
+            digest = hashlib.sha256(b"".join(updated.sorted_prefixes())).digest()
+            if digest != base64.b64decode(expected):
+                raise ValueError(f"checksum mismatch for {self.threat_type}")
+        return ThreatList(self.threat_type, response.get("newClientState"), updated)
+
+
+# ============ DATABASE ============
+
+class LocalThreatDatabase:
+    def __init__(self, api_key, path=None, api_root=API_ROOT, threat_types=THREAT_TYPES, timeout=10,
+                 clock=time.time):
+        self.api_key = api_key
+        self.path = path
+        self.api_root = api_root.rstrip("/")
+        self.timeout = timeout
+        self.clock = clock
+        self._lists = {t: ThreatList(t) for t in threat_types}
+        self._full_hashes = {}  # prefix -> (negative expiry, {full hash: [(threat type, expiry)]})
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self._updater = None
+        self._stop = threading.Event()
+        self.next_update_at = 0
+        self.last_update = None
+        self.last_error = None
+        self.errors_in_row = 0
+        if path and os.path.exists(path):
+            self._load(path)
+
+    @property
+    def ready(self):
+        """True once every list has been synced (from the API or from path)."""
+        return all(lst.state for lst in self._lists.values())
+
+    def _load(self, path):
+        with open(path, "rb") as f:
+            stored = pickle.load(f)
+        for threat_type, (state, blobs) in stored.items():
+            if threat_type in self._lists:
+                self._lists[threat_type] = ThreatList(threat_type, state, PrefixSet.from_blobs(blobs))
+
+    def _save(self):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(tmp, "wb") as f:
+            pickle.dump({t: (lst.state, lst.prefixes.blobs) for t, lst in self._lists.items()}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+    def _post(self, method, body):
+        resp = get_http_client().post(f"{self.api_root}/{method}", params={"key": self.api_key}, json=body,
+                                      timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.json()
+
+    def update(self):
+        """Fetch and apply one round of list updates; returns the seconds to wait before the next."""
+        with self._update_lock:
+            lists = dict(self._lists)
+            data = self._post("threatListUpdates:fetch", {
+                "client": CLIENT,
+                "listUpdateRequests": [
+                    {**lst.descriptor(), "state": lst.state or "", "constraints": {"supportedCompressions": ["RAW"]}}
+                    for lst in lists.values()
+                ],
+            })
+            errors = []
+            for response in data.get("listUpdateResponses", []):
+                threat_type = response.get("threatType")
+                if threat_type not in lists:
+                    continue
+                try:
+                    lists[threat_type] = lists[threat_type].apply(response)
+                except (ValueError, KeyError) as e:
+                    # Start this list over with a full update
+                    lists[threat_type] = ThreatList(threat_type)
+                    errors.append(str(e))
+
+            with self._lock:
+                self._lists = lists
+                self._full_hashes.clear()
+            if self.path:
+                self._save()
+
+            wait = parse_duration(data.get("minimumWaitDuration")) or DEFAULT_UPDATE_INTERVAL
+            self.next_update_at = self.clock() + wait
+            self.last_update = self.clock()
+            self.last_error = "; ".join(errors) or None
+            return wait
+
+    def find_threat_matches(self, urls):
+        """({url: verdict} for every url, {url: cacheDuration seconds} for unsafe ones)."""
+        lists = self._lists
+        hashes = {url: url_hashes(url) for url in dict.fromkeys(urls)}
+        candidates = {}  # prefix -> (threat types whose list holds it, full hashes that start with it)
+        for full_hashes in hashes.values():
+            for full_hash in full_hashes:
+                for lst in lists.values():
+                    prefix = lst.prefixes.match(full_hash)
+                    if prefix is not None:
+                        threat_types, wanted = candidates.setdefault(prefix, (set(), set()))
+                        threat_types.add(lst.threat_type)
+                        wanted.add(full_hash)
+
+        confirmed = self._confirm(candidates, lists) if candidates else {}
+        now = self.clock()
+        matches = {url: {"unsafe": False, "threat_types": []} for url in urls}
+        ttls = {}
+        for url, full_hashes in hashes.items():
+            for full_hash in full_hashes:
+                for threat_type, expires_at in confirmed.get(full_hash, ()):
+                    matches[url]["unsafe"] = True
+                    if threat_type not in matches[url]["threat_types"]:
+                        matches[url]["threat_types"].append(threat_type)
+                    ttl = max(expires_at - now, 0)
+                    ttls[url] = min(ttl, ttls.get(url, ttl))
+        return matches, ttls
+
+    def _confirm(self, candidates, lists):
+        """
+        {full hash: [(threat type, expiry)]} for the wanted full hashes of
+        each prefix: from the cache while a positive answer or the prefix's
+        negative answer is fresh, else from fullHashes:find.
+        """
+        now = self.clock()
+        confirmed = {}
+        unknown = []
+        with self._lock:
+            for prefix, (_, wanted) in candidates.items():
+                negative_until, entries = self._full_hashes.get(prefix, (0, {}))
+                for full_hash in wanted:
+                    fresh = [(t, e) for t, e in entries.get(full_hash, ()) if e > now]
+                    if fresh:
+                        confirmed[full_hash] = fresh
+                    elif now >= negative_until:
+                        unknown.append(prefix)
+                        break
+        if not unknown:
+            return confirmed
+
+        threat_types = sorted({t for prefix in unknown for t in candidates[prefix][0]})
+        data = self._post("fullHashes:find", {
+            "client": CLIENT,
+            "clientStates": [lists[t].state for t in threat_types if lists[t].state],
+            "threatInfo": {
+                "threatTypes": threat_types,
+                "platformTypes": [PLATFORM_TYPE],
+                "threatEntryTypes": [THREAT_ENTRY_TYPE],
+                "threatEntries": [{"hash": base64.b64encode(p).decode("ascii")} for p in unknown],
+            },
+        })
+        negative_until = now + (parse_duration(data.get("negativeCacheDuration")) or 0)
+        found = {prefix: {} for prefix in unknown}
+        for match in data.get("matches", []):
+            full_hash = base64.b64decode(match.get("threat", {}).get("hash", ""))
+            entry = (match.get("threatType"), now + (parse_duration(match.get("cacheDuration")) or 0))
+            for prefix in unknown:
+                if full_hash.startswith(prefix):
+                    found[prefix].setdefault(full_hash, []).append(entry)
+        with self._lock:
+            for prefix, entries in found.items():
+                self._full_hashes[prefix] = (negative_until, entries)
+                for full_hash in candidates[prefix][1]:
+                    if full_hash in entries:
+                        confirmed[full_hash] = entries[full_hash]
+        return confirmed
+
+    def status(self):
+        return {
+            "ready": self.ready,
+            "lists": {t: {"prefixes": len(lst.prefixes), "state": bool(lst.state)} for t, lst in self._lists.items()},
+            "last_update": self.last_update,
+            "next_update_at": self.next_update_at,
+            "updating": self._updater is not None and self._updater.is_alive(),
+            "last_error": self.last_error,
+        }
+
+    def start_updater(self):
+        """Keep the lists in sync in a background thread."""
+        if self._updater is not None and self._updater.is_alive():
+            return self._updater
+
+        def run():
+            while not self._stop.wait(max(self.next_update_at - self.clock(), 0)):
+                try:
+                    self.update()
+                    self.errors_in_row = 0
+                except Exception as e:
+                    # Back off: 15 min * 2^(n-1) * (1 + random), at most a day
+                    self.errors_in_row += 1
+                    self.last_error = f"update: {e}".replace(self.api_key, "<key>")
+                    delay = 900 * 2 ** (self.errors_in_row - 1) * (1 + random.random())
+                    self.next_update_at = self.clock() + min(delay, MAX_BACKOFF)
+
+        self._stop.clear()
+        self._updater = threading.Thread(target=run, name="safe-browsing-updater", daemon=True)
+        self._updater.start()
+        return self._updater
+
+    def stop_updater(self):
+        self._stop.set()
+
+
+def threat_database_from_env(api_key):
+    """LocalThreatDatabase stored at SAFE_BROWSING_DB_PATH, talking to SAFE_BROWSING_API_ROOT."""
+    return LocalThreatDatabase(
+        api_key,
+        path=os.environ.get("SAFE_BROWSING_DB_PATH", DEFAULT_DB_PATH) or None,
+        api_root=os.environ.get("SAFE_BROWSING_API_ROOT", API_ROOT),
+    )
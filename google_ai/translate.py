@@ -7,13 +7,34 @@ Language detection and translation helper.
 
 Returns:
 (detected_language, text_to_use, translation_performed_bool)
+
+detect_and_translate_async is the same for coroutines: the MyMemory call is
+awaited on the shared async HTTP client and the Google client runs in the
+pipeline pool, so no thread waits on the network.
+
+detect_and_translate_batch(texts) detects every language in the calling
+thread and translates the non-English texts concurrently, in a pool of
+TRANSLATE_BATCH_WORKERS threads (default 16) of its own, so a batch costs
+about as many upstream round-trips as its slowest texts rather than one per
+text. (Its own pool, not the pipeline's: the batch waits for these calls
+from a pipeline pool thread.)
 """
 from langdetect import detect, DetectorFactory, LangDetectException
 DetectorFactory.seed = 0
 
+import asyncio
 import os
-import requests
-import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.http_client import get_http_client
+from utils.stages import get_executor
+
+MYMEMORY_URL = "https://api.mymemory.translated.net/get"
+TRANSLATE_BATCH_WORKERS = int(os.environ.get("TRANSLATE_BATCH_WORKERS", 16))
+
+_batch_executor = None
+_batch_executor_lock = threading.Lock()
 
 def detect_language(text: str) -> str:
     try:
@@ -43,19 +64,15 @@ def translate_text_free(text: str, source_lang: str, target_lang: str = "en"):
     """
     try:
         # MyMemory API - free translation service
-        url = "https://api.mymemory.translated.net/get"
         params = {
             'q': text,
             'langpair': f"{source_lang}|{target_lang}"
         }
         
-        response = requests.get(url, params=params, timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            if data.get('responseStatus') == 200:
-                translated = data.get('responseData', {}).get('translatedText', '')
-                if translated and translated.lower() != text.lower():
-                    return translated
+        response = get_http_client().get(MYMEMORY_URL, params=params, timeout=5)
+        translated = _mymemory_translation(response, text)
+        if translated:
+            return translated
         
         # If MyMemory fails, try basic dictionary translations for common phrases
         return translate_basic_phrases(text, source_lang)
@@ -64,6 +81,35 @@ def translate_text_free(text: str, source_lang: str, target_lang: str = "en"):
         print(f"Translation error: {e}")
         return translate_basic_phrases(text, source_lang)
 
+async def translate_text_free_async(text: str, source_lang: str, target_lang: str = "en"):
+    """
+    translate_text_free without blocking the event loop
+    """
+    try:
+        params = {
+            'q': text,
+            'langpair': f"{source_lang}|{target_lang}"
+        }
+        response = await get_http_client().get_async(MYMEMORY_URL, params=params, timeout=5)
+        translated = _mymemory_translation(response, text)
+        if translated:
+            return translated
+        return translate_basic_phrases(text, source_lang)
+
+    except Exception as e:
+        print(f"Translation error: {e}")
+        return translate_basic_phrases(text, source_lang)
+
+def _mymemory_translation(response, text):
+    """The translation in a MyMemory response, or None if it has none"""
+    if response.status_code == 200:
+        data = response.json()
+        if data.get('responseStatus') == 200:
+            translated = data.get('responseData', {}).get('translatedText', '')
+            if translated and translated.lower() != text.lower():
+                return translated
+    return None
+
 def translate_basic_phrases(text: str, source_lang: str):
     """
     Basic translation for common phrases and scam-related terms
@@ -146,11 +192,21 @@ def translate_basic_phrases(text: str, source_lang: str):
     # Fallback: return with language indicator
     return f"[{source_lang.upper()} Text - Translation not available] {text}"
 
+def is_fallback_translation(text: str) -> bool:
+    """
+    Whether text is one of the placeholders above (or a phrase-table partial
+    translation) rather than a translation from a service
+    """
+    return text.startswith("[Partial Translation] ") or (
+        text.startswith("[") and ("Translation not available] " in text or "No translation available] " in text))
+
 def detect_and_translate(text: str):
     detected = detect_language(text)
     if detected == "en":
         return detected, text, False
-    
+    return _translate(text, detected)
+
+def _translate(text: str, detected: str):
     # Attempt Google translation first
     try:
         translated = translate_text_google(text, target_language="en")
@@ -168,4 +224,60 @@ def detect_and_translate(text: str):
         pass
     
     # Final fallback
-    return detected, f"[{detected.upper()} Text - No translation available] {text}", True
\ No newline at end of file
+    return detected, f"[{detected.upper()} Text - No translation available] {text}", True
+
+def detect_and_translate_batch(texts):
+    """detect_and_translate over many texts, in order; the translations run concurrently"""
+    texts = list(texts)
+    results = []
+    pending = []
+    for text in texts:
+        detected = detect_language(text)
+        if detected == "en":
+            results.append((detected, text, False))
+        else:
+            results.append(None)
+            pending.append((len(results) - 1, detected))
+    pending_texts = [texts[i] for i, _ in pending]
+    pending_languages = [detected for _, detected in pending]
+    if len(pending) > 1 and TRANSLATE_BATCH_WORKERS > 1:
+        translated = _get_batch_executor().map(_translate, pending_texts, pending_languages)
+    else:
+        translated = map(_translate, pending_texts, pending_languages)
+    for (i, _), result in zip(pending, translated):
+        results[i] = result
+    return results
+
+def _get_batch_executor():
+    global _batch_executor
+    if _batch_executor is None:
+        with _batch_executor_lock:
+            if _batch_executor is None:
+                _batch_executor = ThreadPoolExecutor(max_workers=TRANSLATE_BATCH_WORKERS,
+                                                     thread_name_prefix="translate-batch")
+    return _batch_executor
+
+async def detect_and_translate_async(text: str):
+    detected = detect_language(text)
+    if detected == "en":
+        return detected, text, False
+
+    # Attempt Google translation first (a blocking client, so in the pool)
+    try:
+        loop = asyncio.get_running_loop()
+        translated = await loop.run_in_executor(get_executor(), translate_text_google, text, "en")
+        if translated != text:
+            return detected, translated, True
+    except Exception:
+        pass
+
+    # Try free translation service
+    try:
+        translated = await translate_text_free_async(text, detected, "en")
+        if translated and translated != text:
+            return detected, translated, True
+    except Exception:
+        pass
+
+    # Final fallback
+    return detected, f"[{detected.upper()} Text - No translation available] {text}", True
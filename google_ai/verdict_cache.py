@@ -0,0 +1,163 @@
+"""
+Cache of Safe Browsing URL verdicts: an in-memory LRU (utils/cache.py
+TTLCache) in front of a SQLite file shared by every worker process.
+
+    cache = UrlVerdictCache("data/safe_browsing_cache.sqlite3")
+    known = cache.get_many(urls)                 # {url: verdict} still fresh
+    cache.put_many({url: verdict}, {url: ttl})   # ttl in seconds per url
+
+A verdict is the {"unsafe": bool, "threat_types": [...]} dict of one URL.
+Unsafe verdicts are kept for the cacheDuration the API returned with the
+match; safe ones for negative_ttl seconds (SAFE_BROWSING_NEGATIVE_TTL,
+default 1800), since the Lookup API gives no duration for them.
+
+The database runs in WAL mode, so workers read while another one writes,
+and expiry uses wall-clock time so entries survive a restart. If the file
+cannot be opened (e.g. a read-only deployment), only the in-memory LRU is
+used. Cached verdicts are shared and must be treated as read-only.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from utils.cache import TTLCache
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  "data", "safe_browsing_cache.sqlite3")
+PURGE_EVERY = 1000  # writes between deletions of expired rows
+
+
+def parse_duration(value):
+    """Seconds in a protobuf Duration string such as "300s" or "1.5s"; None if unparseable."""
+    if isinstance(value, str) and value.endswith("s"):
+        try:
+            return float(value[:-1])
+        except ValueError:
+            return None
+    return None
+
+
+class UrlVerdictCache:
+    def __init__(self, path=None, max_size=10000, negative_ttl=1800, clock=time.time):
+        self.path = path
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self.memory = TTLCache(max_size=max_size, ttl=negative_ttl, clock=clock)
+        self._lock = threading.Lock()
+        self._db = None
+        self._writes = 0
+        self.disk_hits = 0
+        self.error = None
+        if path:
+            try:
+                self._db = self._open(path)
+            except (sqlite3.Error, OSError) as e:
+                self.error = f"verdict cache disabled on disk: {e}"
+                print(f"Safe Browsing {self.error}")
+
+    @staticmethod
+    def _open(path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("CREATE TABLE IF NOT EXISTS verdicts ("
+                   "url TEXT PRIMARY KEY, verdict TEXT NOT NULL, expires_at REAL NOT NULL)")
+        db.execute("CREATE INDEX IF NOT EXISTS verdicts_expires_at ON verdicts (expires_at)")
+        return db
+
+    def get_many(self, urls):
+        """{url: verdict} for the urls with a fresh cached verdict."""
+        found = {}
+        missing = []
+        for url in dict.fromkeys(urls):
+            verdict = self.memory.get(url)
+            if verdict is None:
+                missing.append(url)
+            else:
+                found[url] = verdict
+        if not missing or self._db is None:
+            return found
+
+        now = self.clock()
+        rows = []
+        try:
+            with self._lock:
+                for start in range(0, len(missing), 500):
+                    chunk = missing[start:start + 500]
+                    rows += self._db.execute(
+                        f"SELECT url, verdict, expires_at FROM verdicts "
+                        f"WHERE expires_at > ? AND url IN ({','.join('?' * len(chunk))})",
+                        [now, *chunk]).fetchall()
+        except sqlite3.Error as e:
+            self.error = str(e)
+        for url, verdict, expires_at in rows:
+            verdict = json.loads(verdict)
+            found[url] = verdict
+            self.memory.put(url, verdict, ttl=expires_at - now)
+        self.disk_hits += len(rows)
+        return found
+
+    def put_many(self, verdicts, ttls=None):
+        """Store {url: verdict}; ttls {url: seconds} overrides negative_ttl (e.g. for unsafe URLs)."""
+        ttls = ttls or {}
+        now = self.clock()
+        rows = []
+        for url, verdict in verdicts.items():
+            ttl = ttls.get(url, self.negative_ttl)
+            if ttl <= 0:
+                continue
+            self.memory.put(url, verdict, ttl=ttl)
+            rows.append((url, json.dumps(verdict), now + ttl))
+        if not rows or self._db is None:
+            return
+
+        try:
+            with self._lock:
+                self._db.execute("BEGIN")
+                try:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO verdicts (url, verdict, expires_at) VALUES (?, ?, ?)", rows)
+                    self._writes += len(rows)
+                    if self._writes >= PURGE_EVERY:
+                        self._db.execute("DELETE FROM verdicts WHERE expires_at <= ?", (now,))
+                        self._writes = 0
+                    self._db.execute("COMMIT")
+                except BaseException:
+                    self._db.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            self.error = str(e)
+
+    def clear(self):
+        self.memory.clear()
+        if self._db is not None:
+            with self._lock:
+                self._db.execute("DELETE FROM verdicts")
+
+    def stats(self):
+        stats = self.memory.stats()
+        stats["disk_hits"] = self.disk_hits
+        stats["path"] = self.path if self._db is not None else None
+        if self._db is not None:
+            try:
+                with self._lock:
+                    stats["disk_size"] = self._db.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+            except sqlite3.Error as e:
+                self.error = str(e)
+        stats["error"] = self.error
+        return stats
+
+
+def verdict_cache_from_env():
+    """UrlVerdictCache configured by SAFE_BROWSING_CACHE_PATH ("" keeps it in memory),
+    SAFE_BROWSING_CACHE_SIZE and SAFE_BROWSING_NEGATIVE_TTL."""
+    return UrlVerdictCache(
+        path=os.environ.get("SAFE_BROWSING_CACHE_PATH", DEFAULT_CACHE_PATH),
+        max_size=int(os.environ.get("SAFE_BROWSING_CACHE_SIZE", 10000)),
+        negative_ttl=float(os.environ.get("SAFE_BROWSING_NEGATIVE_TTL", 1800)),
+    )
@@ -0,0 +1,291 @@
+"""
+Memory-mappable model artifact.
+
+A trained TfidfVectorizer + linear classifier exported as flat NumPy arrays,
+so serving processes can open the model with np.load(mmap_mode="r") instead
+of unpickling it. Loading takes near-zero time and the pages are shared by
+every worker on the machine.
+
+Layout of an artifact directory (default: models/artifact/):
+  meta.json        format version, tokenizer and tf-idf settings, class labels
+  vocab.npy        sorted n-gram terms, fixed-width utf-8 bytes (S<n>)
+  vocab_index.npy  feature column of each term in vocab.npy (int32)
+  idf.npy          idf weight per feature column (float64)
+  coef.npy         classifier coefficients, (n_classes or 1, n_features)
+  intercept.npy    classifier intercepts
+
+Models trained with the hashing vectorizer ("featurizer": "hashing" in
+meta.json) have no vocab.npy / vocab_index.npy: n-grams are mapped to columns
+with MurmurHash3 (ml/hashing.py), so only the dense idf and coefficient
+arrays are stored.
+
+ArtifactVectorizer and ArtifactModel expose the transform / predict_proba
+subset of the sklearn API used by ScamPredictor, so serving from an artifact
+does not import scikit-learn.
+
+Export from existing pickles: python -m ml.artifact
+"""
+import json
+import os
+import re
+from collections import Counter
+
+import numpy as np
+import scipy.sparse as sp
+
+from ml.hashing import feature_index
+
+ARTIFACT_FORMAT_VERSION = 1
+META_FILENAME = "meta.json"
+
+
+def get_artifact_dir():
+    return os.path.join("models", "artifact")
+
+
+def artifact_exists(artifact_dir):
+    return bool(artifact_dir) and os.path.exists(os.path.join(artifact_dir, META_FILENAME))
+
+
+def _probability_mode(model, n_classes):
+    if n_classes == 2:
+        return "logistic"
+    multi_class = getattr(model, "multi_class", "auto")
+    if multi_class == "ovr" or getattr(model, "solver", None) == "liblinear" or not hasattr(model, "solver"):
+        # One-vs-rest: per-class sigmoids normalised to sum to one
+        # (also what SGDClassifier(loss="log_loss") does)
+        return "ovr"
+    return "softmax"
+
+
+def _split_vectorizer(vectorizer):
+    """Return (hasher_or_vectorizer, tfidf_transformer_or_None) for a fitted vectorizer."""
+    steps = getattr(vectorizer, "steps", None)
+    if steps is None:
+        return vectorizer, None
+    if len(steps) != 2:
+        raise ValueError("Only (HashingVectorizer, TfidfTransformer) pipelines can be exported")
+    return steps[0][1], steps[1][1]
+
+
+def export_artifact(vectorizer, model, artifact_dir=None):
+    """
+    Write a fitted vectorizer and linear classifier as an artifact directory.
+
+    vectorizer is a TfidfVectorizer, a HashingVectorizer, or a
+    Pipeline(HashingVectorizer, TfidfTransformer) as built by
+    ml.train_model.build_vectorizer.
+    """
+    if artifact_dir is None:
+        artifact_dir = get_artifact_dir()
+    os.makedirs(artifact_dir, exist_ok=True)
+
+    analyzer, transformer = _split_vectorizer(vectorizer)
+    if analyzer.analyzer != "word" or analyzer.tokenizer is not None or analyzer.preprocessor is not None:
+        raise ValueError("Only word analyzers with the default tokenizer can be exported")
+
+    hashing = not hasattr(analyzer, "vocabulary_")
+    # TfidfVectorizer carries its own idf; a hashing pipeline gets it from the TfidfTransformer
+    weighting = transformer if transformer is not None else analyzer
+    if hashing:
+        n_features = int(analyzer.n_features)
+        for stale in ("vocab.npy", "vocab_index.npy"):
+            if os.path.exists(os.path.join(artifact_dir, stale)):
+                os.remove(os.path.join(artifact_dir, stale))
+    else:
+        terms = sorted(analyzer.vocabulary_)
+        n_features = len(terms)
+        np.save(os.path.join(artifact_dir, "vocab.npy"), np.array([t.encode("utf-8") for t in terms]))
+        np.save(os.path.join(artifact_dir, "vocab_index.npy"),
+                np.array([analyzer.vocabulary_[t] for t in terms], dtype=np.int32))
+
+    if getattr(weighting, "use_idf", False):
+        idf = np.asarray(weighting.idf_, dtype=np.float64)
+    else:
+        idf = np.ones(n_features, dtype=np.float64)
+
+    classes = [int(c) for c in model.classes_]
+    meta = {
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "featurizer": "hashing" if hashing else "vocabulary",
+        "n_features": n_features,
+        "alternate_sign": bool(getattr(analyzer, "alternate_sign", False)),
+        "token_pattern": analyzer.token_pattern,
+        "lowercase": bool(analyzer.lowercase),
+        "ngram_range": list(analyzer.ngram_range),
+        "binary": bool(analyzer.binary),
+        "sublinear_tf": bool(getattr(weighting, "sublinear_tf", False)),
+        "norm": weighting.norm,
+        "classes": classes,
+        "probability": _probability_mode(model, len(classes)),
+    }
+
+    np.save(os.path.join(artifact_dir, "idf.npy"), idf)
+    np.save(os.path.join(artifact_dir, "coef.npy"), np.asarray(model.coef_, dtype=np.float64))
+    np.save(os.path.join(artifact_dir, "intercept.npy"), np.asarray(model.intercept_, dtype=np.float64))
+    # meta.json is written last so a half-written directory is never loaded
+    with open(os.path.join(artifact_dir, META_FILENAME), "w") as f:
+        json.dump(meta, f, indent=2)
+    return artifact_dir
+
+
+class ModelArtifact:
+    """Read-only view over an artifact directory; arrays are memory-mapped."""
+
+    def __init__(self, artifact_dir):
+        if not artifact_exists(artifact_dir):
+            raise FileNotFoundError(f"Model artifact not found in {artifact_dir}")
+        self.artifact_dir = artifact_dir
+        with open(os.path.join(artifact_dir, META_FILENAME)) as f:
+            self.meta = json.load(f)
+        if self.meta.get("format_version") != ARTIFACT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported artifact format version: {self.meta.get('format_version')}")
+        self.hashing = self.meta.get("featurizer") == "hashing"
+        if self.hashing:
+            self.vocab = None
+            self.vocab_index = None
+        else:
+            self.vocab = self._array("vocab.npy")
+            self.vocab_index = self._array("vocab_index.npy")
+        self.idf = self._array("idf.npy")
+        self.coef = self._array("coef.npy")
+        self.intercept = self._array("intercept.npy")
+
+    def _array(self, name):
+        return np.load(os.path.join(self.artifact_dir, name), mmap_mode="r")
+
+
+def load_artifact(artifact_dir=None):
+    if artifact_dir is None:
+        artifact_dir = get_artifact_dir()
+    return ModelArtifact(artifact_dir)
+
+
+class ArtifactVectorizer:
+    """TfidfVectorizer.transform equivalent backed by a ModelArtifact."""
+
+    def __init__(self, artifact):
+        meta = artifact.meta
+        self.artifact = artifact
+        self.n_features = meta["n_features"]
+        self.hashing = artifact.hashing
+        self.alternate_sign = meta.get("alternate_sign", False)
+        self.token_regex = re.compile(meta["token_pattern"])
+        self.lowercase = meta["lowercase"]
+        self.ngram_range = tuple(meta["ngram_range"])
+        self.binary = meta["binary"]
+        self.sublinear_tf = meta["sublinear_tf"]
+        self.norm = meta["norm"]
+
+    def analyze(self, doc):
+        if self.lowercase:
+            doc = doc.lower()
+        tokens = self.token_regex.findall(doc)
+        min_n, max_n = self.ngram_range
+        grams = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), min(max_n, len(tokens)) + 1):
+            for i in range(len(tokens) - n + 1):
+                grams.append(" ".join(tokens[i:i + n]))
+        return grams
+
+    def _lookup(self, counts):
+        """Map {n-gram: count} to (feature columns, counts); unknown n-grams are dropped."""
+        if self.hashing:
+            return self._hash(counts)
+        vocab = self.artifact.vocab
+        width = vocab.dtype.itemsize
+        keys = []
+        tf = []
+        for gram, count in counts.items():
+            key = gram.encode("utf-8")
+            # Longer keys would be truncated to the vocab width and could match falsely
+            if len(key) <= width:
+                keys.append(key)
+                tf.append(count)
+        if not keys or not len(vocab):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        keys = np.array(keys, dtype=vocab.dtype)
+        pos = np.searchsorted(vocab, keys)
+        pos[pos >= len(vocab)] = 0
+        found = vocab[pos] == keys
+        columns = np.asarray(self.artifact.vocab_index[pos[found]], dtype=np.int64)
+        return columns, np.array(tf, dtype=np.float64)[found]
+
+    def _hash(self, counts):
+        """Hashing-mode lookup; colliding n-grams are summed like FeatureHasher does."""
+        columns = {}
+        for gram, count in counts.items():
+            index, sign = feature_index(gram, self.n_features)
+            if self.alternate_sign:
+                count *= sign
+            columns[index] = columns.get(index, 0) + count
+        return (np.fromiter(columns.keys(), dtype=np.int64, count=len(columns)),
+                np.fromiter(columns.values(), dtype=np.float64, count=len(columns)))
+
+    def transform(self, docs):
+        indptr = [0]
+        indices = []
+        values = []
+        for doc in docs:
+            columns, tf = self._lookup(Counter(self.analyze(doc)))
+            indices.append(columns)
+            values.append(tf)
+            indptr.append(indptr[-1] + len(columns))
+
+        n_docs = len(indptr) - 1
+        indices = np.concatenate(indices) if indices else np.empty(0, dtype=np.int64)
+        data = np.concatenate(values) if values else np.empty(0, dtype=np.float64)
+        X = sp.csr_matrix((data, indices, np.array(indptr)), shape=(n_docs, self.n_features))
+        return self._weight(X)
+
+    def _weight(self, X):
+        if self.binary:
+            X.data.fill(1.0)
+        if self.sublinear_tf:
+            np.log(X.data, X.data)
+            X.data += 1.0
+        X.data *= self.artifact.idf[X.indices]
+        if self.norm not in ("l1", "l2"):
+            return X
+        rows = np.repeat(np.arange(X.shape[0]), np.diff(X.indptr))
+        if self.norm == "l2":
+            norms = np.sqrt(np.bincount(rows, weights=X.data ** 2, minlength=X.shape[0]))
+        else:
+            norms = np.bincount(rows, weights=np.abs(X.data), minlength=X.shape[0])
+        norms[norms == 0.0] = 1.0
+        X.data /= norms[rows]
+        return X
+
+
+class ArtifactModel:
+    """LogisticRegression.predict_proba equivalent backed by a ModelArtifact."""
+
+    def __init__(self, artifact):
+        self.artifact = artifact
+        self.classes_ = np.array(artifact.meta["classes"])
+        self.probability = artifact.meta["probability"]
+
+    def decision_function(self, X):
+        scores = X @ self.artifact.coef.T + self.artifact.intercept
+        return np.asarray(scores)
+
+    def predict_proba(self, X):
+        scores = self.decision_function(X)
+        if self.probability == "logistic":
+            pos = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+            return np.column_stack([1.0 - pos, pos])
+        if self.probability == "ovr":
+            probs = 1.0 / (1.0 + np.exp(-scores))
+            return probs / probs.sum(axis=1, keepdims=True)
+        scores = scores - scores.max(axis=1, keepdims=True)
+        np.exp(scores, out=scores)
+        return scores / scores.sum(axis=1, keepdims=True)
+
+
+if __name__ == "__main__":
+    import joblib
+
+    from ml.train_model import get_model_path, get_vectorizer_path
+
+    out = export_artifact(joblib.load(get_vectorizer_path()), joblib.load(get_model_path()))
+    print(f"Exported model artifact to: {out}")
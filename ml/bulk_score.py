@@ -0,0 +1,60 @@
+"""
+Offline bulk scoring of a CSV of messages with the active model.
+
+Reads the input in chunks (column: text), preprocesses each chunk on a
+process pool with preprocess_parallel (row order is kept), scores it with one
+vectorized call and appends predicted_label, label and confidence columns to
+the output CSV. Memory use is bounded by the chunk size.
+
+Run:  python -m ml.bulk_score messages.csv scored.csv [--chunksize 50000] [--workers N]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from ml.preprocess import preprocess_parallel
+from ml.registry import ModelRegistry
+
+LABEL_NAMES = {0: "Safe", 1: "Spam", 2: "Scam"}
+
+
+def bulk_score(input_path, output_path, chunksize=50000, workers=None, models_root="models"):
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Input not found at {input_path}")
+    predictor = ModelRegistry(root=models_root).current()
+    print(f"Scoring with model {predictor.version}")
+
+    rows = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for i, chunk in enumerate(pd.read_csv(input_path, chunksize=chunksize)):
+            if "text" not in chunk.columns:
+                raise ValueError("CSV must contain a 'text' column")
+            clean = preprocess_parallel(chunk["text"].astype(str), workers=workers, executor=pool)
+            results = predictor.predict_preprocessed(clean)
+            chunk["predicted_label"] = [r["predicted_label"] for r in results]
+            chunk["label"] = [LABEL_NAMES.get(r["predicted_label"], "Unknown") for r in results]
+            chunk["confidence"] = [round(r["confidence"], 4) for r in results]
+            chunk.to_csv(output_path, mode="w" if i == 0 else "a", header=(i == 0), index=False)
+            rows += len(chunk)
+            print(f"Scored {rows} rows")
+
+    elapsed = time.perf_counter() - start
+    print(f"\nScored {rows} rows in {elapsed:.1f}s -> {output_path}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a CSV of messages with the active model")
+    parser.add_argument("input", help="CSV with a 'text' column")
+    parser.add_argument("output", help="where to write the scored CSV")
+    parser.add_argument("--chunksize", type=int, default=50000, help="rows per chunk")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="preprocessing processes (default: all cores)")
+    parser.add_argument("--models", default="models", help="models root (default: models)")
+    args = parser.parse_args()
+    bulk_score(args.input, args.output, chunksize=args.chunksize, workers=args.workers,
+               models_root=args.models)
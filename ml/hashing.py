@@ -0,0 +1,66 @@
+"""
+Feature hashing without scikit-learn.
+
+feature_index(term, n_features) returns the column that sklearn's
+HashingVectorizer / FeatureHasher assigns to a term (signed 32-bit
+MurmurHash3 x86 with seed 0, then abs() modulo n_features), so a model trained
+with HashingVectorizer can be served from a memory-mapped artifact.
+"""
+from functools import lru_cache
+
+_C1 = 0xcc9e2d51
+_C2 = 0x1b873593
+_MASK = 0xffffffff
+
+
+def _rotl32(x, r):
+    return ((x << r) | (x >> (32 - r))) & _MASK
+
+
+def murmurhash3_32(data: bytes, seed: int = 0) -> int:
+    """Signed MurmurHash3 x86_32 of data (same values as sklearn.utils.murmurhash3_32)."""
+    length = len(data)
+    h = seed & _MASK
+    n_blocks = length // 4
+
+    for i in range(0, n_blocks * 4, 4):
+        k = int.from_bytes(data[i:i + 4], "little")
+        k = (k * _C1) & _MASK
+        k = _rotl32(k, 15)
+        k = (k * _C2) & _MASK
+        h ^= k
+        h = _rotl32(h, 13)
+        h = (h * 5 + 0xe6546b64) & _MASK
+
+    tail = data[n_blocks * 4:]
+    k = 0
+    if len(tail) >= 3:
+        k ^= tail[2] << 16
+    if len(tail) >= 2:
+        k ^= tail[1] << 8
+    if len(tail) >= 1:
+        k ^= tail[0]
+        k = (k * _C1) & _MASK
+        k = _rotl32(k, 15)
+        k = (k * _C2) & _MASK
+        h ^= k
+
+    h ^= length
+    h ^= h >> 16
+    h = (h * 0x85ebca6b) & _MASK
+    h ^= h >> 13
+    h = (h * 0xc2b2ae35) & _MASK
+    h ^= h >> 16
+
+    return h - (1 << 32) if h & 0x80000000 else h
+
+
+@lru_cache(maxsize=65536)
+def feature_index(term: str, n_features: int):
+    """Return (column, sign) for term, as HashingVectorizer computes them."""
+    h = murmurhash3_32(term.encode("utf-8"))
+    if h == -2147483648:
+        index = (2147483647 - (n_features - 1)) % n_features
+    else:
+        index = abs(h) % n_features
+    return index, (1 if h >= 0 else -1)
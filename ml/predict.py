@@ -8,43 +8,145 @@ Provides:
     "confidence": float,
     "probabilities": [float]
   }
+- predict_batch(texts) which vectorizes all texts into one sparse matrix and
+  returns a list of the same dicts, in input order
+- predict_preprocessed(clean_texts) for texts already passed through
+  preprocess_text (e.g. by preprocess_parallel in bulk scoring)
+
+Model sources, in order of preference:
+- scorer_path: compiled NumPy scorer directory (see ml/scorer.py), fastest per
+  message; memory-mapped like the artifact
+- artifact_dir: memory-mappable artifact (see ml/artifact.py)
+- model_path / vectorizer_path: joblib pickles
+The first two never import joblib or scikit-learn.
+
+predictor.version is a short content hash of the loaded model files. When a
+cache (utils/cache.py TTLCache) is passed, predictions are memoized under a
+hash of the preprocess_text output plus that version, so a retrained model
+never serves stale predictions.
+
+BatchingPredictor wraps a ScamPredictor for threaded servers: concurrent
+predict() calls are coalesced for up to max_wait seconds (or max_batch_size
+texts) and scored with one predict_batch call.
 
 If model files are missing, predict will raise FileNotFoundError with clear message.
 """
+import hashlib
 import os
-import joblib
 import numpy as np
 
-from ml.preprocess import preprocess_text
+from ml.artifact import ArtifactModel, ArtifactVectorizer, artifact_exists, load_artifact
+from ml.preprocess import preprocess_batch, preprocess_text
+from ml.scorer import CompiledScorer, scorer_exists
+from utils.cache import content_key
+from utils.micro_batcher import MicroBatcher
+
+def _files_digest(paths):
+    h = hashlib.sha256()
+    for path in paths:
+        if os.path.isdir(path):
+            path_list = [os.path.join(path, n) for n in sorted(os.listdir(path))]
+            h.update(_files_digest(path_list).encode())
+            continue
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()[:12]
 
 class ScamPredictor:
-    def __init__(self, model_path="models/scam_model.pkl", vectorizer_path="models/vectorizer.pkl"):
+    def __init__(self, model_path="models/scam_model.pkl", vectorizer_path="models/vectorizer.pkl",
+                 artifact_dir=None, scorer_path=None, cache=None):
         self.model_path = model_path
         self.vectorizer_path = vectorizer_path
+        self.artifact_dir = artifact_dir
+        self.scorer_path = scorer_path
         self.model = None
         self.vectorizer = None
+        self.scorer = None
+        self.cache = cache
+        self.version = None
         self._load()
 
+    def _loaded(self):
+        return self.scorer is not None or (self.model is not None and self.vectorizer is not None)
+
     def _load(self):
+        if scorer_exists(self.scorer_path):
+            self.scorer = CompiledScorer(self.scorer_path)
+            self.version = _files_digest([self.scorer_path])
+            return
+        if artifact_exists(self.artifact_dir):
+            artifact = load_artifact(self.artifact_dir)
+            self.vectorizer = ArtifactVectorizer(artifact)
+            self.model = ArtifactModel(artifact)
+            names = sorted(os.listdir(self.artifact_dir))
+            self.version = _files_digest([os.path.join(self.artifact_dir, n) for n in names])
+            return
         if not os.path.exists(self.model_path) or not os.path.exists(self.vectorizer_path):
             # Do not crash silently; provide helpful message
             raise FileNotFoundError(
                 "Model or vectorizer not found. Please run training: python -m ml.train_model\n"
                 f"Expected model: {self.model_path}\nExpected vectorizer: {self.vectorizer_path}"
             )
+        import joblib
         self.vectorizer = joblib.load(self.vectorizer_path)
         self.model = joblib.load(self.model_path)
+        self.version = _files_digest([self.vectorizer_path, self.model_path])
 
     def predict(self, text: str) -> dict:
-        if self.model is None or self.vectorizer is None:
+        return self.predict_preprocessed([preprocess_text(text)])[0]
+
+    def predict_batch(self, texts) -> list:
+        return self.predict_preprocessed(preprocess_batch(texts))
+
+    def predict_preprocessed(self, clean) -> list:
+        if not self._loaded():
             self._load()
-        clean = preprocess_text(text)
-        X = self.vectorizer.transform([clean])
-        probs = self.model.predict_proba(X)[0]
-        pred_label = int(np.argmax(probs))
-        confidence = float(probs[pred_label])
-        return {
-            "predicted_label": pred_label,
-            "confidence": confidence,
-            "probabilities": probs.tolist()
-        }
\ No newline at end of file
+        clean = list(clean)
+        if not clean:
+            return []
+        if self.cache is None:
+            return self._predict_clean(clean)
+
+        keys = [content_key("predict", self.version, c) for c in clean]
+        results = [self.cache.get(k) for k in keys]
+        missing = [i for i, r in enumerate(results) if r is None]
+        if missing:
+            for i, result in zip(missing, self._predict_clean([clean[i] for i in missing])):
+                results[i] = result
+                self.cache.put(keys[i], result)
+        return results
+
+    def _predict_clean(self, clean):
+        if self.scorer is not None:
+            probs = self.scorer.predict_proba(clean)
+        else:
+            X = self.vectorizer.transform(clean)
+            probs = self.model.predict_proba(X)
+        labels = np.argmax(probs, axis=1)
+        results = []
+        for row, label in zip(probs, labels):
+            pred_label = int(label)
+            results.append({
+                "predicted_label": pred_label,
+                "confidence": float(row[pred_label]),
+                "probabilities": row.tolist()
+            })
+        return results
+
+class BatchingPredictor:
+    def __init__(self, predictor, max_batch_size=64, max_wait=0.002):
+        self.predictor = predictor
+        self.batcher = MicroBatcher(predictor.predict_batch, max_batch_size=max_batch_size,
+                                    max_wait=max_wait, name="predict-batcher")
+
+    @property
+    def version(self):
+        return self.predictor.version
+
+    def predict(self, text: str) -> dict:
+        return self.batcher.call(text)
+
+    def predict_batch(self, texts) -> list:
+        # Already a batch; no point queueing it behind other requests
+        return self.predictor.predict_batch(texts)
@@ -0,0 +1,256 @@
+"""
+Versioned model registry with atomic hot reload.
+
+Layout under the models root (default: models/):
+  versions/<name>/   one trained model per directory: scorer/, artifact/,
+                     scam_model.pkl, vectorizer.pkl (whatever was exported)
+  CURRENT            name of the version to serve
+
+A repository without versions/ keeps working: the files directly under the
+models root are served as version "default".
+
+ModelRegistry loads a version into a new ScamPredictor *before* taking the
+swap lock, then replaces the serving reference in one assignment, so a request
+always runs on a fully loaded model. The previously active predictors are
+kept (up to keep_history) for instant rollback. The registry itself has the
+predictor interface (predict / predict_batch / version), each call using the
+model that was active when it started.
+
+Publish a trained model: python -m ml.registry publish [--activate]
+"""
+import argparse
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from ml.predict import ScamPredictor
+
+DEFAULT_VERSION = "default"
+CURRENT_FILENAME = "CURRENT"
+MODEL_FILES = ("scorer", "artifact", "scam_model.pkl", "vectorizer.pkl")
+
+
+class ModelRegistry:
+    def __init__(self, root="models", cache=None, keep_history=3):
+        self.root = root
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._active_name = None
+        self._active = None
+        self._history = deque(maxlen=keep_history)  # (name, predictor), most recent last
+        self._watcher = None
+        self._stop = threading.Event()
+        self.last_error = None
+
+    # ---- layout ----
+
+    @property
+    def versions_dir(self):
+        return os.path.join(self.root, "versions")
+
+    def version_dir(self, name):
+        if name == DEFAULT_VERSION:
+            return self.root
+        if not name or os.sep in name or name.startswith("."):
+            raise ValueError(f"Invalid model version name: {name!r}")
+        return os.path.join(self.versions_dir, name)
+
+    def list_versions(self):
+        if not os.path.isdir(self.versions_dir):
+            return []
+        return sorted(
+            n for n in os.listdir(self.versions_dir)
+            if not n.startswith(".") and os.path.isdir(os.path.join(self.versions_dir, n))
+        )
+
+    def read_current(self):
+        """Version named by the CURRENT file, else the newest version, else "default"."""
+        path = os.path.join(self.root, CURRENT_FILENAME)
+        if os.path.exists(path):
+            with open(path) as f:
+                name = f.read().strip()
+            if name:
+                return name
+        versions = self.list_versions()
+        return versions[-1] if versions else DEFAULT_VERSION
+
+    def _write_current(self, name):
+        path = os.path.join(self.root, CURRENT_FILENAME)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(name + "\n")
+        os.replace(tmp_path, path)
+
+    # ---- loading and swapping ----
+
+    def load(self, name):
+        directory = self.version_dir(name)
+        if not os.path.isdir(directory):
+            raise FileNotFoundError(f"Model version not found: {name}")
+        return ScamPredictor(
+            model_path=os.path.join(directory, "scam_model.pkl"),
+            vectorizer_path=os.path.join(directory, "vectorizer.pkl"),
+            artifact_dir=os.path.join(directory, "artifact"),
+            scorer_path=os.path.join(directory, "scorer"),
+            cache=self.cache
+        )
+
+    def activate(self, name, persist=True):
+        """Load version name and make it the serving model. Raises if loading fails."""
+        predictor = self.load(name)
+        # Quick sanity check before any request can see the new model
+        predictor.predict("model registry warm-up")
+        with self._lock:
+            if self._active is not None:
+                self._history.append((self._active_name, self._active))
+            self._active_name, self._active = name, predictor
+        if persist:
+            self._write_current(name)
+        return predictor
+
+    def activate_in_background(self, name, persist=True):
+        """Load and swap on a background thread; errors are kept in last_error."""
+        def run():
+            try:
+                self.activate(name, persist=persist)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = f"{name}: {e}"
+        thread = threading.Thread(target=run, name=f"model-load-{name}", daemon=True)
+        thread.start()
+        return thread
+
+    def rollback(self):
+        """Swap back to the previously active model (kept loaded in memory)."""
+        with self._lock:
+            if not self._history:
+                raise RuntimeError("No previous model version to roll back to")
+            name, predictor = self._history.pop()
+            self._active_name, self._active = name, predictor
+        self._write_current(name)
+        return name
+
+    def current(self):
+        predictor = self._active
+        if predictor is None:
+            with self._lock:
+                if self._active is None:
+                    self._active_name = self.read_current()
+                    self._active = self.load(self._active_name)
+                predictor = self._active
+        return predictor
+
+    @property
+    def active_version(self):
+        self.current()
+        return self._active_name
+
+    def status(self):
+        return {
+            "active": self.active_version,
+            "model_hash": self.current().version,
+            "current_file": self.read_current(),
+            "versions": self.list_versions(),
+            "rollback_to": [name for name, _ in reversed(self._history)],
+            "watching": self._watcher is not None and self._watcher.is_alive(),
+            "last_error": self.last_error,
+        }
+
+    # ---- predictor interface ----
+
+    @property
+    def version(self):
+        return self.current().version
+
+    def predict(self, text):
+        return self.current().predict(text)
+
+    def predict_batch(self, texts):
+        return self.current().predict_batch(texts)
+
+    # ---- watching CURRENT ----
+
+    def start_watcher(self, interval=5.0):
+        """Poll the CURRENT file and hot-swap when it names a different version."""
+        if self._watcher is not None and self._watcher.is_alive():
+            return self._watcher
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    name = self.read_current()
+                    if name != self._active_name:
+                        self.activate(name, persist=False)
+                        self.last_error = None
+                except Exception as e:
+                    self.last_error = f"watcher: {e}"
+
+        self._stop.clear()
+        self._watcher = threading.Thread(target=run, name="model-watcher", daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+    def stop_watcher(self):
+        self._stop.set()
+
+
+def publish(source_dir="models", root="models", name=None, activate=False):
+    """
+    Copy the model files exported into source_dir into a new version directory.
+
+    The copy is made under a temporary name and renamed into place, so a
+    watcher never sees a partially written version.
+    """
+    if name is None:
+        name = datetime.now().strftime("%Y%m%d-%H%M%S")
+    registry = ModelRegistry(root)
+    target = registry.version_dir(name)
+    if os.path.exists(target):
+        raise FileExistsError(f"Model version already exists: {name}")
+    staging = os.path.join(registry.versions_dir, f".staging-{name}-{os.getpid()}-{int(time.time())}")
+    os.makedirs(staging)
+    copied = 0
+    for filename in MODEL_FILES:
+        src = os.path.join(source_dir, filename)
+        if os.path.isdir(src):
+            shutil.copytree(src, os.path.join(staging, filename))
+            copied += 1
+        elif os.path.isfile(src):
+            shutil.copy2(src, os.path.join(staging, filename))
+            copied += 1
+    if not copied:
+        shutil.rmtree(staging)
+        raise FileNotFoundError(f"No model files found in {source_dir}")
+    os.replace(staging, target)
+    if activate:
+        registry._write_current(name)
+    return name
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage versioned models")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_publish = sub.add_parser("publish", help="copy the freshly trained model into models/versions/")
+    p_publish.add_argument("--name", help="version name (default: timestamp)")
+    p_publish.add_argument("--activate", action="store_true", help="also point CURRENT at it")
+    p_activate = sub.add_parser("activate", help="point CURRENT at an existing version")
+    p_activate.add_argument("name")
+    sub.add_parser("list", help="list versions")
+    args = parser.parse_args()
+
+    if args.command == "publish":
+        version = publish(name=args.name, activate=args.activate)
+        print(f"Published model version: {version}")
+    elif args.command == "activate":
+        registry = ModelRegistry()
+        registry.load(args.name)
+        registry._write_current(args.name)
+        print(f"CURRENT -> {args.name}")
+    else:
+        registry = ModelRegistry()
+        current = registry.read_current()
+        for version in registry.list_versions() or [DEFAULT_VERSION]:
+            print(("* " if version == current else "  ") + version)
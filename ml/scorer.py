@@ -0,0 +1,187 @@
+"""
+Compiled linear scorer: TF-IDF + logistic regression inference in plain NumPy.
+
+export_compiled_scorer() turns a model artifact (ml/artifact.py) into a
+models/scorer/ directory holding everything needed to score text:
+  meta.json      tokenizer / tf-idf settings and class labels
+  terms.npy      n-gram strings, one per weight row (vocabulary models only)
+  weights.npy    n-gram -> per-class weight table, idf already folded in:
+                 weights[j, k] = idf[j] * coef[k, j]
+  idf.npy        idf per row, needed for the l2 norm of the tf-idf vector
+  intercept.npy  per-class intercepts
+
+CompiledScorer opens the arrays with np.load(mmap_mode="r"), so, as with the
+artifact, the weight table is paged in on demand and shared by every worker
+on the machine. The n-gram -> row dict it builds from terms.npy is the one
+per-process copy: a dict lookup per n-gram is what makes the scorer faster
+than the artifact's sorted-vocabulary search. A document is scored as
+  tokenize -> count n-grams -> dict / hash lookup of weight rows
+  -> sparse dot product -> l2 normalise -> softmax (or sigmoid)
+without building sparse matrices; scoring needs only NumPy (ml/artifact.py,
+and with it scipy, is imported only to export). Probabilities equal the
+sklearn ones up to floating-point rounding (~1e-16).
+
+Export from the current artifact: python -m ml.scorer
+"""
+import json
+import os
+import re
+import shutil
+from collections import Counter
+
+import numpy as np
+
+from ml.hashing import feature_index
+
+META_FILENAME = "meta.json"
+
+
+def get_scorer_path():
+    return os.path.join("models", "scorer")
+
+
+def scorer_exists(scorer_path):
+    """Whether scorer_path is a scorer directory."""
+    return bool(scorer_path) and os.path.exists(os.path.join(scorer_path, META_FILENAME))
+
+
+def export_compiled_scorer(artifact_dir=None, scorer_path=None):
+    """Compile a model artifact into a self-contained scorer directory."""
+    from ml.artifact import load_artifact
+
+    if scorer_path is None:
+        scorer_path = get_scorer_path()
+    artifact = load_artifact(artifact_dir)
+    idf = np.asarray(artifact.idf, dtype=np.float64)
+    weights = np.ascontiguousarray(idf[:, None] * np.asarray(artifact.coef, dtype=np.float64).T)
+
+    arrays = {
+        "weights": weights,
+        "idf": idf,
+        "intercept": np.asarray(artifact.intercept, dtype=np.float64),
+    }
+    if not artifact.hashing:
+        # Row j of weights belongs to the term whose vocab_index is j
+        terms = np.empty(artifact.meta["n_features"], dtype=artifact.vocab.dtype)
+        terms[np.asarray(artifact.vocab_index)] = artifact.vocab
+        arrays["terms"] = terms
+
+    # Write into a staging directory and rename it into place, so a reader
+    # never sees a partial scorer
+    staging = f"{scorer_path}.tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for name, array in arrays.items():
+        np.save(os.path.join(staging, f"{name}.npy"), array)
+    with open(os.path.join(staging, META_FILENAME), "w") as f:
+        json.dump(artifact.meta, f)
+    previous = None
+    if os.path.exists(scorer_path):
+        previous = f"{scorer_path}.old-{os.getpid()}"
+        os.replace(scorer_path, previous)
+    os.replace(staging, scorer_path)
+    if previous is not None:
+        shutil.rmtree(previous)
+    return scorer_path
+
+
+class CompiledScorer:
+    def __init__(self, scorer_path=None):
+        if scorer_path is None:
+            scorer_path = get_scorer_path()
+        if not scorer_exists(scorer_path):
+            raise FileNotFoundError(f"Compiled scorer not found at {scorer_path}")
+        self.scorer_path = scorer_path
+        with open(os.path.join(scorer_path, META_FILENAME)) as f:
+            self.meta = json.load(f)
+        load = lambda name: np.load(os.path.join(scorer_path, f"{name}.npy"), mmap_mode="r", allow_pickle=False)
+        self.weights = load("weights")
+        self.idf = load("idf")
+        self.intercept = np.array(load("intercept"))  # a few floats
+        terms = load("terms") if os.path.exists(os.path.join(scorer_path, "terms.npy")) else None
+
+        meta = self.meta
+        self.classes_ = np.array(meta["classes"])
+        self.n_features = meta["n_features"]
+        self.hashing = meta["featurizer"] == "hashing"
+        self.alternate_sign = meta.get("alternate_sign", False)
+        self.token_regex = re.compile(meta["token_pattern"])
+        self.lowercase = meta["lowercase"]
+        self.min_n, self.max_n = meta["ngram_range"]
+        self.binary = meta["binary"]
+        self.sublinear_tf = meta["sublinear_tf"]
+        self.norm = meta["norm"]
+        self.probability = meta["probability"]
+        # n-gram -> weight row lookup table
+        self.rows = {} if terms is None else {t.decode("utf-8"): j for j, t in enumerate(terms)}
+
+    def _grams(self, doc):
+        if self.lowercase:
+            doc = doc.lower()
+        tokens = self.token_regex.findall(doc)
+        grams = list(tokens) if self.min_n == 1 else []
+        for n in range(max(self.min_n, 2), min(self.max_n, len(tokens)) + 1):
+            for i in range(len(tokens) - n + 1):
+                grams.append(" ".join(tokens[i:i + n]))
+        return grams
+
+    def _features(self, doc):
+        """Return (weight rows, term frequencies) of doc's known n-grams."""
+        counts = Counter(self._grams(doc))
+        if not self.hashing:
+            rows = self.rows
+            hits = [(rows[g], c) for g, c in counts.items() if g in rows]
+        else:
+            merged = {}
+            for g, c in counts.items():
+                j, sign = feature_index(g, self.n_features)
+                merged[j] = merged.get(j, 0) + (c * sign if self.alternate_sign else c)
+            hits = list(merged.items())
+        if not hits:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64)
+        index, tf = zip(*hits)
+        return np.array(index, dtype=np.intp), np.array(tf, dtype=np.float64)
+
+    def decision_function_one(self, doc):
+        index, tf = self._features(doc)
+        if not len(index):
+            return self.intercept.copy()
+        if self.binary:
+            tf.fill(1.0)
+        if self.sublinear_tf:
+            tf = np.log(tf) + 1.0
+        if self.norm == "l2":
+            norm = np.sqrt(np.dot(tf * self.idf[index], tf * self.idf[index]))
+        elif self.norm == "l1":
+            norm = np.abs(tf * self.idf[index]).sum()
+        else:
+            norm = 1.0
+        if norm == 0.0:
+            norm = 1.0
+        return (tf / norm) @ self.weights[index] + self.intercept
+
+    def _proba(self, scores):
+        if self.probability == "logistic":
+            pos = 1.0 / (1.0 + np.exp(-scores[..., 0]))
+            return np.stack([1.0 - pos, pos], axis=-1)
+        if self.probability == "ovr":
+            probs = 1.0 / (1.0 + np.exp(-scores))
+            return probs / probs.sum(axis=-1, keepdims=True)
+        scores = np.exp(scores - scores.max(axis=-1, keepdims=True))
+        return scores / scores.sum(axis=-1, keepdims=True)
+
+    def predict_proba_one(self, doc):
+        return self._proba(self.decision_function_one(doc))
+
+    def predict_proba(self, docs):
+        docs = list(docs)
+        if not docs:
+            return np.empty((0, len(self.classes_)))
+        return self._proba(np.vstack([self.decision_function_one(d) for d in docs]))
+
+
+if __name__ == "__main__":
+    from ml.artifact import get_artifact_dir
+
+    out = export_compiled_scorer(get_artifact_dir(), get_scorer_path())
+    print(f"Exported compiled scorer to: {out}")
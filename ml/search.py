@@ -0,0 +1,175 @@
+"""
+Parallel cross-validated hyperparameter search for the TF-IDF + Logistic
+Regression model.
+
+Candidates use the production vectorizer and classifier settings
+(ml/train_model.py) and vary only the n-gram range, vocabulary size and C.
+
+Every (vectorizer settings, fold) pair is one task in a process pool using all
+cores. A task fits the TF-IDF vectorizer on the fold once and then trains and
+scores every regularisation value C on that same matrix, so features are never
+recomputed per candidate. Fold matrices are also memoized on disk with
+joblib.Memory (models/.search_cache/), so re-running with more C values or a
+changed grid only featurizes the new vectorizer settings.
+
+For each candidate the report records mean/std accuracy and macro F1 across
+folds, single-message inference latency (vectorize + predict_proba, median
+and p99 over held-out messages) and the pickled model size.
+
+Run:  python -m ml.search [--folds 5] [--workers N]
+Writes models/search_report.csv and models/search_report.json
+"""
+import argparse
+import itertools
+import json
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from joblib import Memory
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import StratifiedKFold
+
+from ml.preprocess import preprocess_parallel
+from ml.train_model import build_vectorizer, load_dataset
+
+VECTORIZER_GRID = {
+    "ngram_range": [(1, 1), (1, 2), (1, 3)],
+    "max_features": [2000, 5000, 20000],
+}
+C_GRID = [0.1, 1.0, 10.0]
+LATENCY_SAMPLE = 200
+
+
+def get_report_path(ext):
+    return os.path.join("models", f"search_report.{ext}")
+
+
+def get_cache_dir():
+    return os.path.join("models", ".search_cache")
+
+
+def vectorizer_candidates(grid=None):
+    grid = grid or VECTORIZER_GRID
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def build_search_vectorizer(params):
+    """The production vectorizer (train_model.build_vectorizer) with the searched settings."""
+    return build_vectorizer("tfidf").set_params(
+        ngram_range=tuple(params["ngram_range"]),
+        max_features=params["max_features"],
+    )
+
+
+def featurize_fold(train_texts, test_texts, params):
+    vectorizer = build_search_vectorizer(params)
+    X_train = vectorizer.fit_transform(train_texts)
+    X_test = vectorizer.transform(test_texts)
+    return vectorizer, X_train, X_test
+
+
+def _evaluate_fold(task):
+    """Featurize one fold for one vectorizer setting, then score every C on it."""
+    params, fold, train_texts, y_train, test_texts, y_test, c_grid, cache_dir, measure = task
+    featurize = Memory(cache_dir, verbose=0).cache(featurize_fold) if cache_dir else featurize_fold
+    vectorizer, X_train, X_test = featurize(train_texts, test_texts, params)
+
+    rows = []
+    for C in c_grid:
+        clf = LogisticRegression(solver="saga", max_iter=2000, random_state=42, C=C,
+                                 class_weight="balanced")
+        clf.fit(X_train, y_train)
+        preds = clf.predict(X_test)
+        row = {
+            "params": params,
+            "C": C,
+            "fold": fold,
+            "accuracy": accuracy_score(y_test, preds),
+            "f1_macro": f1_score(y_test, preds, average="macro"),
+            "n_features": len(vectorizer.vocabulary_),
+        }
+        if measure:
+            # One message at a time, as the API serves them
+            latencies = []
+            for text in test_texts[:LATENCY_SAMPLE]:
+                start = time.perf_counter()
+                clf.predict_proba(vectorizer.transform([text]))
+                latencies.append(time.perf_counter() - start)
+            row["latency_ms_p50"] = float(np.percentile(latencies, 50) * 1000)
+            row["latency_ms_p99"] = float(np.percentile(latencies, 99) * 1000)
+            row["model_size_bytes"] = len(pickle.dumps((vectorizer, clf)))
+        rows.append(row)
+    return rows
+
+
+def search(folds=5, workers=None, vectorizer_grid=None, c_grid=None, use_cache=True):
+    print("Loading dataset...")
+    df = load_dataset()
+    texts = np.array(preprocess_parallel(df["text"].astype(str), workers=workers), dtype=object)
+    y = df["label"].astype(int).to_numpy()
+
+    # Stratified folds need at least `folds` samples of every class
+    folds = max(2, min(folds, int(np.bincount(y).min())))
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=42)
+    splits = list(splitter.split(texts, y))
+    candidates = vectorizer_candidates(vectorizer_grid)
+    c_grid = c_grid or C_GRID
+    cache_dir = get_cache_dir() if use_cache else None
+
+    tasks = []
+    for params, (fold, (train_idx, test_idx)) in itertools.product(candidates, enumerate(splits)):
+        tasks.append((params, fold, texts[train_idx].tolist(), y[train_idx],
+                      texts[test_idx].tolist(), y[test_idx], c_grid, cache_dir, fold == 0))
+
+    print(f"Evaluating {len(candidates) * len(c_grid)} candidates x {folds} folds "
+          f"({len(tasks)} featurization tasks) on {workers or os.cpu_count()} workers...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        fold_rows = [row for rows in pool.map(_evaluate_fold, tasks) for row in rows]
+
+    report = []
+    for params in candidates:
+        for C in c_grid:
+            rows = [r for r in fold_rows if r["params"] == params and r["C"] == C]
+            timed = [r for r in rows if "latency_ms_p50" in r][0]
+            accuracies = [r["accuracy"] for r in rows]
+            report.append({
+                "ngram_range": "-".join(str(n) for n in params["ngram_range"]),
+                "max_features": params["max_features"],
+                "C": C,
+                "accuracy_mean": float(np.mean(accuracies)),
+                "accuracy_std": float(np.std(accuracies)),
+                "f1_macro_mean": float(np.mean([r["f1_macro"] for r in rows])),
+                "n_features": int(np.mean([r["n_features"] for r in rows])),
+                "latency_ms_p50": timed["latency_ms_p50"],
+                "latency_ms_p99": timed["latency_ms_p99"],
+                "model_size_bytes": timed["model_size_bytes"],
+            })
+    report.sort(key=lambda r: (-r["accuracy_mean"], r["latency_ms_p50"]))
+
+    os.makedirs("models", exist_ok=True)
+    pd.DataFrame(report).to_csv(get_report_path("csv"), index=False)
+    with open(get_report_path("json"), "w") as f:
+        json.dump({"folds": folds, "candidates": report}, f, indent=2)
+
+    print("\nTop candidates (accuracy / p50 latency / size):")
+    for r in report[:10]:
+        print(f"  ngrams={r['ngram_range']} max_features={r['max_features']} C={r['C']}: "
+              f"{r['accuracy_mean']:.4f} +/- {r['accuracy_std']:.4f}, "
+              f"{r['latency_ms_p50']:.3f} ms, {r['model_size_bytes'] / 1024:.1f} KiB")
+    print(f"\nSaved report to: {get_report_path('csv')} and {get_report_path('json')}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross-validated hyperparameter search")
+    parser.add_argument("--folds", type=int, default=5, help="number of CV folds")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--no-cache", action="store_true", help="do not memoize fold matrices on disk")
+    args = parser.parse_args()
+    search(folds=args.folds, workers=args.workers, use_cache=not args.no_cache)
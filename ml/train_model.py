@@ -103,17 +103,30 @@ Train TF-IDF + Logistic Regression model from data/scam_dataset.csv
 CSV must have columns: text,label
 Labels: 0 = Safe, 1 = Spam, 2 = Scam
 Saves:   models/vectorizer.pkl and models/scam_model.pkl
+         models/artifact/ (memory-mappable copy, see ml/artifact.py)
+         models/scorer/ (compiled NumPy scorer, see ml/scorer.py)
 Run:  python -m ml.train_model
+      python -m ml.train_model --vectorizer hashing [--n-features 262144]
+      python -m ml.train_model --publish [--activate]   (also copy into models/versions/)
+
+The hashing vectorizer keeps no vocabulary: n-grams are hashed into a fixed
+number of columns and re-weighted by an idf vector learned on the training
+set, so predictor memory does not grow with the number of n-grams.
 """
+import argparse
 import os
 import joblib
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer, TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, accuracy_score
 
-from ml.preprocess import preprocess_text
+from ml.artifact import export_artifact, get_artifact_dir
+from ml.preprocess import preprocess_parallel
+from ml.registry import publish
+from ml.scorer import export_compiled_scorer, get_scorer_path
 
 def get_model_path():
     return os.path.join("models", "scam_model.pkl")
@@ -134,12 +147,37 @@ def load_dataset(path=None):
         raise ValueError("CSV must contain 'text' and 'label' columns")
     return df
 
-def train():
+VECTORIZER_TYPES = ("tfidf", "hashing")
+DEFAULT_HASHING_FEATURES = 2 ** 18
+
+def build_vectorizer(vectorizer_type="tfidf", n_features=DEFAULT_HASHING_FEATURES):
+    if vectorizer_type == "tfidf":
+        return TfidfVectorizer(
+            ngram_range=(1, 3),
+            max_features=5000,
+            min_df=2,
+            max_df=0.8,
+            sublinear_tf=True
+        )
+    if vectorizer_type == "hashing":
+        return Pipeline([
+            ("hashing", HashingVectorizer(
+                ngram_range=(1, 3),
+                n_features=n_features,
+                alternate_sign=False,
+                norm=None
+            )),
+            ("tfidf", TfidfTransformer(sublinear_tf=True)),
+        ])
+    raise ValueError(f"Unknown vectorizer type: {vectorizer_type} (expected one of {VECTORIZER_TYPES})")
+
+def train(vectorizer_type="tfidf", n_features=DEFAULT_HASHING_FEATURES, publish_version=False, activate=False,
+          workers=None):
     print("Loading dataset...")
     df = load_dataset()
     
     print("Preprocessing text...")
-    df["text_clean"] = df["text"].astype(str).apply(preprocess_text)
+    df["text_clean"] = preprocess_parallel(df["text"].astype(str), workers=workers)
     X = df["text_clean"]. tolist()
     y = df["label"].astype(int).tolist()
 
@@ -164,14 +202,8 @@ def train():
         X, y, test_size=test_size, random_state=42, stratify=stratify_arg
     )
 
-    print("Vectorizing text with TF-IDF...")
-    vectorizer = TfidfVectorizer(
-        ngram_range=(1, 3),
-        max_features=5000,
-        min_df=2,
-        max_df=0.8,
-        sublinear_tf=True
-    )
+    print(f"Vectorizing text with {vectorizer_type} vectorizer...")
+    vectorizer = build_vectorizer(vectorizer_type, n_features)
     X_train_tfidf = vectorizer.fit_transform(X_train)
     X_test_tfidf = vectorizer.transform(X_test)
 
@@ -208,8 +240,31 @@ def train():
     
     joblib.dump(clf, model_path)
     print(f"Saved model to:  {model_path}")
+
+    artifact_dir = export_artifact(vectorizer, clf, get_artifact_dir())
+    print(f"Saved memory-mappable artifact to:  {artifact_dir}")
+
+    scorer_path = export_compiled_scorer(artifact_dir, get_scorer_path())
+    print(f"Saved compiled scorer to:  {scorer_path}")
+
+    if publish_version:
+        version = publish(source_dir="models", root="models", activate=activate)
+        print(f"Published model version:  {version}" + (" (activated)" if activate else ""))
     
     print("\nTraining complete!")
 
 if __name__ == "__main__":  
-    train()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the scam detection model")
+    parser.add_argument("--vectorizer", choices=VECTORIZER_TYPES, default="tfidf",
+                        help="tfidf (vocabulary based, default) or hashing (no vocabulary)")
+    parser.add_argument("--n-features", type=int, default=DEFAULT_HASHING_FEATURES,
+                        help="number of hashed feature columns (hashing vectorizer only)")
+    parser.add_argument("--publish", action="store_true",
+                        help="copy the trained model into models/versions/<timestamp>/")
+    parser.add_argument("--activate", action="store_true",
+                        help="with --publish: point models/CURRENT at the new version")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="preprocessing processes (default: all cores)")
+    args = parser.parse_args()
+    train(vectorizer_type=args.vectorizer, n_features=args.n_features,
+          publish_version=args.publish, activate=args.activate, workers=args.workers)
\ No newline at end of file
@@ -0,0 +1,206 @@
+"""
+Out-of-core incremental training for datasets larger than memory.
+
+Reads the CSV (columns: text,label) in chunks, featurizes each chunk with a
+stateless HashingVectorizer (no vocabulary, no idf: nothing to fit up front)
+and updates an SGDClassifier(loss="log_loss") with partial_fit, so memory use
+is bounded by the chunk size instead of the dataset size.
+
+Every --checkpoint-every chunks the model and the number of rows consumed are
+written to a checkpoint. --resume continues from it, training only on rows
+appended to the dataset since, e.g. after new labelled data arrives.
+
+Every HOLDOUT_EVERY-th row is kept aside (up to MAX_HOLDOUT_ROWS) to report
+accuracy at the end instead of being trained on.
+
+Saves the same outputs as ml.train_model: models/vectorizer.pkl,
+models/scam_model.pkl, models/artifact/ and models/scorer/.
+Run:  python -m ml.train_streaming [--chunksize 50000] [--resume]
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import accuracy_score
+
+from ml.artifact import export_artifact, get_artifact_dir
+from ml.preprocess import preprocess_parallel
+from ml.registry import publish
+from ml.scorer import export_compiled_scorer, get_scorer_path
+from ml.train_model import (DEFAULT_HASHING_FEATURES, get_data_path, get_model_path,
+                            get_vectorizer_path)
+
+CLASSES = np.array([0, 1, 2])
+HOLDOUT_EVERY = 10
+MAX_HOLDOUT_ROWS = 20000
+
+
+def get_checkpoint_path():
+    return os.path.join("models", "streaming_checkpoint.pkl")
+
+
+def build_streaming_vectorizer(n_features=DEFAULT_HASHING_FEATURES):
+    return HashingVectorizer(
+        ngram_range=(1, 3),
+        n_features=n_features,
+        alternate_sign=False,
+        norm="l2"
+    )
+
+
+def build_streaming_model():
+    return SGDClassifier(loss="log_loss", alpha=1e-5, random_state=42)
+
+
+def save_checkpoint(path, state):
+    # Write then rename so an interrupted run never leaves a corrupt checkpoint
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    joblib.dump(state, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Checkpoint not found at {path}")
+    return joblib.load(path)
+
+
+def iter_chunks(path, chunksize, skip_rows=0):
+    """Yield (first_row_number, DataFrame) chunks, skipping the first skip_rows data rows."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Dataset not found at {path}")
+    row = 0
+    # Rows are skipped after parsing (not with skiprows=) because quoted
+    # texts may span several physical lines
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        if "text" not in chunk.columns or "label" not in chunk.columns:
+            raise ValueError("CSV must contain 'text' and 'label' columns")
+        if row + len(chunk) <= skip_rows:
+            row += len(chunk)
+            continue
+        if row < skip_rows:
+            chunk = chunk.iloc[skip_rows - row:]
+            row = skip_rows
+        yield row, chunk
+        row += len(chunk)
+
+
+def train_streaming(data_path=None, chunksize=50000, n_features=DEFAULT_HASHING_FEATURES,
+                    checkpoint_path=None, checkpoint_every=1, resume=False,
+                    publish_version=False, activate=False, workers=None):
+    if data_path is None:
+        data_path = get_data_path()
+    if checkpoint_path is None:
+        checkpoint_path = get_checkpoint_path()
+
+    if resume:
+        state = load_checkpoint(checkpoint_path)
+        if state["n_features"] != n_features:
+            print(f"Using n_features={state['n_features']} from checkpoint")
+            n_features = state["n_features"]
+        clf = state["model"]
+        rows_consumed = state["rows_consumed"]
+        print(f"Resuming from checkpoint: {rows_consumed} rows already trained on")
+    else:
+        clf = build_streaming_model()
+        rows_consumed = 0
+
+    vectorizer = build_streaming_vectorizer(n_features)
+    holdout_X, holdout_y = [], []
+    chunks_done = 0
+    rows_trained = 0
+
+    # One preprocessing pool for the whole run instead of one per chunk
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for first_row, chunk in iter_chunks(data_path, chunksize, skip_rows=rows_consumed):
+            texts = preprocess_parallel(chunk["text"].astype(str), workers=workers, executor=pool)
+            labels = chunk["label"].astype(int).to_numpy()
+            row_numbers = np.arange(first_row, first_row + len(chunk))
+
+            holdout_idx = np.flatnonzero(row_numbers % HOLDOUT_EVERY == 0)
+            holdout_idx = holdout_idx[:max(0, MAX_HOLDOUT_ROWS - len(holdout_y))]
+            is_holdout = np.zeros(len(chunk), dtype=bool)
+            is_holdout[holdout_idx] = True
+            for i in holdout_idx:
+                holdout_X.append(texts[i])
+                holdout_y.append(labels[i])
+
+            train_idx = np.flatnonzero(~is_holdout)
+            if len(train_idx):
+                X = vectorizer.transform([texts[i] for i in train_idx])
+                clf.partial_fit(X, labels[train_idx], classes=CLASSES)
+                rows_trained += len(train_idx)
+
+            rows_consumed = first_row + len(chunk)
+            chunks_done += 1
+            print(f"Trained on rows up to {rows_consumed}")
+
+            if chunks_done % checkpoint_every == 0 and hasattr(clf, "coef_"):
+                save_checkpoint(checkpoint_path, {
+                    "model": clf,
+                    "rows_consumed": rows_consumed,
+                    "n_features": n_features,
+                    "data_path": data_path,
+                })
+
+    if not hasattr(clf, "coef_"):
+        raise ValueError("No training rows found")
+
+    save_checkpoint(checkpoint_path, {
+        "model": clf,
+        "rows_consumed": rows_consumed,
+        "n_features": n_features,
+        "data_path": data_path,
+    })
+    print(f"\nRows trained on in this run: {rows_trained} (total consumed: {rows_consumed})")
+
+    if holdout_y:
+        preds = clf.predict(vectorizer.transform(holdout_X))
+        print(f"Holdout Accuracy ({len(holdout_y)} rows): {accuracy_score(holdout_y, preds):.4f}")
+
+    print("\nSaving artifacts...")
+    os.makedirs("models", exist_ok=True)
+    joblib.dump(vectorizer, get_vectorizer_path())
+    print(f"Saved vectorizer to:  {get_vectorizer_path()}")
+    joblib.dump(clf, get_model_path())
+    print(f"Saved model to:  {get_model_path()}")
+    artifact_dir = export_artifact(vectorizer, clf, get_artifact_dir())
+    print(f"Saved memory-mappable artifact to:  {artifact_dir}")
+    scorer_path = export_compiled_scorer(artifact_dir, get_scorer_path())
+    print(f"Saved compiled scorer to:  {scorer_path}")
+
+    if publish_version:
+        version = publish(source_dir="models", root="models", activate=activate)
+        print(f"Published model version:  {version}" + (" (activated)" if activate else ""))
+
+    print("\nTraining complete!")
+    return clf
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the scam model incrementally from CSV chunks")
+    parser.add_argument("--data", default=None, help="CSV path (default: data/scam_dataset.csv)")
+    parser.add_argument("--chunksize", type=int, default=50000, help="rows per chunk")
+    parser.add_argument("--n-features", type=int, default=DEFAULT_HASHING_FEATURES,
+                        help="number of hashed feature columns")
+    parser.add_argument("--checkpoint", default=None, help="checkpoint path")
+    parser.add_argument("--checkpoint-every", type=int, default=1, help="chunks between checkpoints")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue from the checkpoint with rows appended since")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="preprocessing processes (default: all cores)")
+    parser.add_argument("--publish", action="store_true",
+                        help="copy the trained model into models/versions/<timestamp>/")
+    parser.add_argument("--activate", action="store_true",
+                        help="with --publish: point models/CURRENT at the new version")
+    args = parser.parse_args()
+    train_streaming(data_path=args.data, chunksize=args.chunksize, n_features=args.n_features,
+                    checkpoint_path=args.checkpoint, checkpoint_every=args.checkpoint_every,
+                    resume=args.resume, publish_version=args.publish, activate=args.activate,
+                    workers=args.workers)
@@ -15,7 +15,7 @@ def test_scam_detection():
     print("🔍 Testing Scam Detection Module...")
     
     try:
-        from detection_modules.scam_detector import detect_scam
+        from detection_modules.scam_detector import detect_scam, detect_scam_batch
         
         # Test cases
         test_cases = [
@@ -58,6 +58,51 @@ def test_scam_detection():
             if result.get('detected_keywords'):
                 print(f"✅ Keywords: {', '.join(result['detected_keywords'][:5])}")
         
+        contents = [test['content'] for test in test_cases] + ["", "ÉTÉ BREAKING!! recieve $500"]
+        if detect_scam_batch(contents) != [detect_scam(content) for content in contents]:
+            print("❌ detect_scam_batch differs from detect_scam")
+            return False
+        print("\n✅ Batch scoring matches detect_scam")
+        
+        for content in contents:
+            full = detect_scam(content)
+            fast = detect_scam(content, explain=False)
+            if fast != {key: full[key] for key in ('is_scam', 'scam_score', 'risk_level', 'message')}:
+                print("❌ Fast mode differs from detect_scam")
+                return False
+        if detect_scam_batch(contents, explain=False) != [detect_scam(content, explain=False) for content in contents]:
+            print("❌ Fast batch scoring differs from fast detect_scam")
+            return False
+        for content in contents:
+            full = detect_scam(content)
+            early = detect_scam(content, explain=False, stop_at=70)
+            if (early['risk_level'] == 'CRITICAL') != (full['risk_level'] == 'CRITICAL') \
+                    or early['is_scam'] != full['is_scam'] or early['scam_score'] > full['scam_score']:
+                print("❌ Fast mode with stop_at=70 misclassified a message")
+                return False
+        if detect_scam_batch(contents, explain=False, stop_at=70) != \
+                [detect_scam(content, explain=False, stop_at=70) for content in contents]:
+            print("❌ Batch scoring with stop_at differs from detect_scam")
+            return False
+        
+        # Once the keyword hits reach stop_at, the spelling and capitalization checks are skipped
+        import detection_modules.scam_detector as scam_detector
+        critical = "URGENT winner! Claim your free prize now, verify your bank account password and social security"
+        calls = []
+        original = (scam_detector.analyze_spelling_quality, scam_detector._caps_ratio)
+        scam_detector.analyze_spelling_quality = lambda *args: calls.append("spelling") or 0
+        scam_detector._caps_ratio = lambda *args: calls.append("caps") or 0
+        try:
+            early = detect_scam(critical, explain=False, stop_at=70)
+            early_batch = detect_scam_batch([critical], explain=False, stop_at=70)
+            detect_scam(critical, explain=False)
+        finally:
+            scam_detector.analyze_spelling_quality, scam_detector._caps_ratio = original
+        if early['risk_level'] != 'CRITICAL' or early_batch != [early] or calls != ["spelling", "caps"]:
+            print(f"❌ stop_at did not skip the later checks: {early}, calls {calls}")
+            return False
+        print("✅ Fast mode matches detect_scam; stop_at skips the later checks")
+        
         print("\n✅ Scam Detection Module: WORKING")
         return True
         
@@ -71,7 +116,7 @@ def test_fake_news_detection():
     print("\n🔍 Testing Fake News Detection Module...")
     
     try:
-        from detection_modules.fake_news_detector import detect_fake_news
+        from detection_modules.fake_news_detector import detect_fake_news, detect_fake_news_stream
         
         # Test cases
         test_cases = [
@@ -116,6 +161,21 @@ def test_fake_news_detection():
             if result.get('detected_indicators'):
                 print(f"✅ Indicators: {', '.join(result['detected_indicators'][:5])}")
         
+        # Streaming mode: same result whatever the chunk boundaries
+        for test in test_cases:
+            content = test['content'] * 20
+            pieces = [content[i:i + 37] for i in range(0, len(content), 37)]
+            if detect_fake_news_stream(pieces, chunk_size=200) != detect_fake_news(content.strip()):
+                print(f"❌ Streaming analysis differs for {test['name']}")
+                return False
+        # Chunks far smaller than the overlap window, hits spanning many chunks
+        content = "doctors hate this. " + "x " * 40
+        for chunk_size in (4, 8):
+            if detect_fake_news_stream([content], chunk_size=chunk_size) != detect_fake_news(content.strip()):
+                print(f"❌ Streaming analysis differs with chunk_size={chunk_size}")
+                return False
+        print("\n✅ Streaming analysis matches full-text analysis")
+        
         print("\n✅ Fake News Detection Module: WORKING")
         return True
         
@@ -124,6 +184,911 @@ def test_fake_news_detection():
         return False
 
 
+def test_batch_prediction():
+    """Test that predict_batch matches predict message by message"""
+    print("\n🔍 Testing Batch Prediction...")
+
+    try:
+        from ml.predict import ScamPredictor
+
+        predictor = ScamPredictor()
+        messages = [
+            "URGENT! Your bank account is suspended. Verify now at http://example.com",
+            "Limited time offer! Click here to buy now",
+            "Hi John, see you at the meeting tomorrow",
+            "Hi John, see you at the meeting tomorrow",
+        ]
+
+        batch = predictor.predict_batch(messages)
+        single = [predictor.predict(m) for m in messages]
+
+        if len(batch) != len(messages):
+            print(f"❌ Expected {len(messages)} results, got {len(batch)}")
+            return False
+
+        for b, s in zip(batch, single):
+            if b["predicted_label"] != s["predicted_label"] or abs(b["confidence"] - s["confidence"]) > 1e-9:
+                print(f"❌ Batch result {b} differs from single result {s}")
+                return False
+
+        print(f"✅ {len(batch)} batch predictions match single predictions")
+        print("✅ Batch Prediction: WORKING")
+        return True
+
+    except Exception as e:
+        print(f"❌ Batch Prediction Error: {e}")
+        return False
+
+
+def test_compiled_scorer():
+    """Test that the compiled scorer matches scikit-learn and is memory-mapped"""
+    print("\n🔍 Testing Compiled Scorer...")
+
+    try:
+        import joblib
+        import numpy as np
+        from ml.preprocess import preprocess_batch
+        from ml.scorer import CompiledScorer
+
+        messages = [
+            "URGENT! Your bank account is suspended. Verify now at http://example.com",
+            "Congratulations, you won a free prize! Claim your reward today",
+            "Hi John, see you at the meeting tomorrow",
+            "",
+        ]
+        clean = preprocess_batch(messages)
+        vectorizer = joblib.load("models/vectorizer.pkl")
+        model = joblib.load("models/scam_model.pkl")
+        expected = model.predict_proba(vectorizer.transform(clean))
+
+        scorer = CompiledScorer("models/scorer")
+        if not isinstance(scorer.weights, np.memmap):
+            print("❌ Scorer weights are not memory-mapped")
+            return False
+        if not np.allclose(scorer.predict_proba(clean), expected, rtol=0, atol=1e-9):
+            print("❌ Compiled scorer differs from sklearn predict_proba")
+            return False
+
+        print(f"✅ {len(messages)} scorer probabilities match sklearn predict_proba")
+        print("✅ Compiled Scorer: WORKING")
+        return True
+
+    except Exception as e:
+        print(f"❌ Compiled Scorer Error: {e}")
+        return False
+
+def test_model_registry():
+    """Test model activation, rollback, rejected versions and the CURRENT watcher"""
+    print("\n🔍 Testing Model Registry...")
+
+    try:
+        import tempfile
+        import time
+        from ml.registry import ModelRegistry, publish
+
+        with tempfile.TemporaryDirectory() as root:
+            for name in ("v1", "v2"):
+                publish("models", root, name=name)
+            broken = os.path.join(root, "versions", "broken")
+            os.makedirs(broken)
+            os.makedirs(os.path.join(broken, "scorer"))
+            for filename in ("scorer/meta.json", "scam_model.pkl", "vectorizer.pkl"):
+                with open(os.path.join(broken, filename), "w") as f:
+                    f.write("not a model")
+
+            registry = ModelRegistry(root)
+            first = registry.activate("v1")
+            second = registry.activate("v2")
+            if registry.current() is not second or registry.active_version != "v2" or registry.read_current() != "v2":
+                print("❌ Activated version is not the one served")
+                return False
+
+            for bad in ("broken", "missing"):
+                try:
+                    registry.activate(bad)
+                    print(f"❌ Version {bad!r} was activated")
+                    return False
+                except (ValueError, OSError):
+                    pass
+            if registry.current() is not second or registry.read_current() != "v2":
+                print("❌ A failed activation replaced the served model")
+                return False
+
+            if registry.rollback() != "v1" or registry.current() is not first or registry.read_current() != "v1":
+                print("❌ Rollback did not restore the previous model")
+                return False
+
+            # Another worker points CURRENT at v2; the watcher swaps it in
+            registry._write_current("v2")
+            registry.start_watcher(interval=0.02)
+            try:
+                deadline = time.monotonic() + 5
+                while registry.active_version != "v2" and time.monotonic() < deadline:
+                    time.sleep(0.02)
+            finally:
+                registry.stop_watcher()
+            if registry.active_version != "v2":
+                print(f"❌ Watcher did not pick up CURRENT: {registry.status()}")
+                return False
+
+        print("✅ Activate, rollback and watcher swap the served model; bad versions are rejected")
+        print("✅ Model Registry: WORKING")
+        return True
+
+    except Exception as e:
+        print(f"❌ Model Registry Error: {e}")
+        return False
+
+def test_ttl_cache():
+    """Test TTLCache expiry, LRU eviction and hit/miss counters"""
+    print("\n🔍 Testing TTL Cache...")
+
+    try:
+        from utils.cache import TTLCache
+
+        now = [0.0]
+        cache = TTLCache(max_size=2, ttl=10, clock=lambda: now[0])
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")          # "a" is now the most recently used
+        cache.put("c", 3)       # evicts "b"
+        if cache.get("b") is not None or cache.get("a") != 1 or cache.get("c") != 3:
+            print("❌ LRU eviction removed the wrong entry")
+            return False
+
+        cache.put("short", 4, ttl=1)  # evicts "a"
+        now[0] = 5
+        if cache.get("short") is not None or cache.get("c") != 3:
+            print("❌ Per-entry TTL not applied")
+            return False
+        now[0] = 20
+        if cache.get("c") is not None or len(cache):
+            print("❌ Entry outlived the default TTL")
+            return False
+
+        stats = cache.stats()
+        expected = {"hits": 4, "misses": 3, "evictions": 2, "expirations": 2, "size": 0}
+        if {key: stats[key] for key in expected} != expected or stats["hit_rate"] != round(4 / 7, 4):
+            print(f"❌ Unexpected counters: {stats}")
+            return False
+
+        disabled = TTLCache(max_size=0)
+        disabled.put("a", 1)
+        if disabled.get("a") is not None:
+            print("❌ A size 0 cache stored an entry")
+            return False
+
+        print(f"✅ Counters: {stats}")
+        print("✅ TTL Cache: WORKING")
+        return True
+
+    except Exception as e:
+        print(f"❌ TTL Cache Error: {e}")
+        return False
+
+def test_micro_batcher():
+    """Test that MicroBatcher hands each caller its own result and shares batch errors"""
+    print("\n🔍 Testing Micro Batcher...")
+
+    try:
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+        from utils.micro_batcher import MicroBatcher
+
+        batches = []
+
+        def double(items):
+            batches.append(list(items))
+            if "boom" in items:
+                raise ValueError("bad batch")
+            return [item * 2 for item in items]
+
+        def run_callers(batcher, items):
+            outcomes = [None] * len(items)
+            start = threading.Barrier(len(items))
+
+            def call(i):
+                start.wait()
+                try:
+                    outcomes[i] = batcher.call(items[i], timeout=5)
+                except Exception as e:
+                    outcomes[i] = e
+            threads = [threading.Thread(target=call, args=(i,)) for i in range(len(items))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return outcomes
+
+        for executor in (None, ThreadPoolExecutor(max_workers=2)):
+            batches.clear()
+            # A long window: the batch closes when all 16 items are queued
+            batcher = MicroBatcher(double, max_batch_size=16, max_wait=1.0, executor=executor)
+            items = list(range(16))
+            if run_callers(batcher, items) != [i * 2 for i in items] or len(batches) != 1:
+                print(f"❌ Callers got the wrong results or were not batched: {batches}")
+                return False
+
+            failing = ["a", "boom", "c"]
+            batcher = MicroBatcher(double, max_batch_size=3, max_wait=1.0, executor=executor)
+            outcomes = run_callers(batcher, failing)
+            if not all(isinstance(outcome, ValueError) for outcome in outcomes):
+                print(f"❌ batch_fn error not passed to every caller: {outcomes}")
+                return False
+            if batcher.call("ok", timeout=5) != "okok" or batcher.stats()["batches"] != 1:
+                print("❌ Batcher stopped working after a failed batch")
+                return False
+
+            # A future cancelled while queued is left out of its batch
+            batches.clear()
+            batcher = MicroBatcher(double, max_batch_size=2, max_wait=1.0, executor=executor)
+            cancelled = batcher.submit("x")
+            cancelled.cancel()
+            if batcher.call("y", timeout=5) != "yy" or batches != [["y"]]:
+                print(f"❌ Cancelled item was not dropped from its batch: {batches}")
+                return False
+
+            if executor is not None:
+                executor.shutdown()
+                # The executor refuses the batch: the caller gets the error instead of waiting forever
+                try:
+                    batcher.call("late", timeout=5)
+                    print("❌ Batch submitted to a shut down executor did not fail")
+                    return False
+                except RuntimeError:
+                    pass
+
+        print("✅ 16 callers got their own results from one batch; a failed batch reached all 3 callers")
+        print("✅ Micro Batcher: WORKING")
+        return True
+
+    except Exception as e:
+        print(f"❌ Micro Batcher Error: {e}")
+        return False
+
+def test_preprocessing():
+    """Test that the fused and batch normalizers match the step-by-step one"""
+    print("\n🔍 Testing Text Preprocessing...")
+
+    try:
+        from concurrent.futures import ProcessPoolExecutor
+        from ml.preprocess import preprocess_batch, preprocess_parallel, preprocess_text, preprocess_text_multipass
+
+        texts = [
+            "URGENT!!! Visit HTTP://Bad.example.com/login?id=1 NOW",
+            "Check www.example.org, or https://x.y/z\tthen reply",
+            "Caf\u00e9 \u2014 50% off!!  \u212a\u017f  \u0130stanbul",
+            "",
+            "   ",
+            "record\x1eseparator",
+            None,
+            42,
+        ]
+        expected = [preprocess_text_multipass(t) for t in texts]
+        fused = [preprocess_text(t) for t in texts]
+        batch = preprocess_batch(texts)
+        batch_no_sep = preprocess_batch(texts[:5])
+
+        if fused != expected or batch != expected or batch_no_sep != expected[:5]:
+            print(f"❌ Expected {expected}, got fused={fused} batch={batch}")
+            return False
+
+        # Worker processes: many small chunks, results still in input order
+        many = [f"Msg {i}: WIN ${i} at HTTP://x{i}.example.com NOW" for i in range(500)] + texts
+        in_order = preprocess_batch(many)
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            pooled = preprocess_parallel(many, workers=2, executor=pool, min_parallel=0)
+        if preprocess_parallel(many, workers=2, min_parallel=0) != in_order or pooled != in_order:
+            print("❌ preprocess_parallel differs from preprocess_batch")
+            return False
+
+        print(f"✅ {len(texts)} texts normalized identically by all variants")
+        print(f"✅ {len(many)} texts preprocessed in parallel, in input order")
+        print("✅ Text Preprocessing: WORKING")
+        return True
+
+    except Exception as e:
+        print(f"❌ Text Preprocessing Error: {e}")
+        return False
+
+
+def test_keyword_engine():
+    """Test that one scan finds exactly the keywords `in` (or whole-word n-grams) / patterns re.search would"""
+    print("\n🔍 Testing Keyword Engine...")
+
+    try:
+        import re
+        from utils.aho_corasick import tokenize
+        from utils.keywords import scan_keywords
+        from utils.rule_pack import RulePack, get_rule_pack
+
+        pack = get_rule_pack()
+        KEYWORD_LISTS, PATTERN_LISTS = pack.keyword_lists, pack.pattern_lists
+
+        def in_tokens(keyword, text):
+            phrase, tokens = tokenize(keyword), tokenize(text)
+            return any(tokens[i:i + len(phrase)] == phrase for i in range(len(tokens)))
+
+        def in_prefix(keyword, text):
+            phrase, tokens = tokenize(keyword), tokenize(text)
+            n = len(phrase)
+            return any(tokens[i:i + n - 1] == phrase[:-1] and tokens[i + n - 1].startswith(phrase[-1])
+                       for i in range(len(tokens) - n + 1))
+
+        texts = [
+            "URGENT!!! Verify now: your bank account is suspended, act now",
+            "They don't want you to know the hidden truth, sheeple. Wake up!",
+            "Caf\u00e9 meeting at 10, all good \u2014 recieve the notes",
+            "BREAKING: 90% of doctors say click the link here, $500 via bit.ly",
+            "Please display the first small banking report, mind blowing",
+            "Reply urgently and immediately: unlimited offers, payment wired by bank transfers",
+            "",
+        ]
+        data = {"version": pack.version, "keyword_lists": KEYWORD_LISTS, "pattern_lists": PATTERN_LISTS,
+                "scam": pack.scam, "news": pack.news}
+        for mode, matches in (("substring", lambda kw, text: kw in text), ("tokens", in_tokens),
+                              ("prefix", in_prefix)):
+            mode_pack = RulePack(dict(data, keyword_match=mode), mode)
+            for text in texts:
+                hits = mode_pack.scan(text)
+                for list_id, keywords in KEYWORD_LISTS.items():
+                    expected = [kw for kw in keywords if matches(kw, text.lower())]
+                    if hits.keywords(list_id) != expected:
+                        print(f"❌ {mode} {list_id}: expected {expected}, got {hits.keywords(list_id)}")
+                        return False
+                for list_id, patterns in PATTERN_LISTS.items():
+                    expected = [p for p in patterns if re.search(p, text.lower())]
+                    if hits.patterns(list_id) != expected:
+                        print(f"❌ {mode} {list_id}: expected {expected}, got {hits.patterns(list_id)}")
+                        return False
+
+        if scan_keywords("Please display the report").any("fraud") != (pack.keyword_match == "substring"):
+            print("❌ 'pay' matched inside 'display' in tokens mode")
+            return False
+
+        # The shipped pack (prefix mode): inflections count like the baseline's substring
+        # match did, once per keyword; only matches inside a word are dropped
+        hits = scan_keywords("Reply urgently, act immediately. Verify accounts")
+        inside = scan_keywords("Really, call them first about the small print")
+        if hits.keywords("scam_urgency") != ["urgent", "immediately"] \
+                or hits.keywords("news_urgency") != ["urgent", "immediate"] \
+                or "verify account" not in hits.keywords("scam_high_risk") \
+                or "all" in inside.keywords("news_bias") or "irs" in inside.keywords("scam_high_risk"):
+            print(f"❌ Shipped pack changed the baseline keyword hits: {hits.items()} / {inside.items()}")
+            return False
+
+        print(f"✅ {len(KEYWORD_LISTS)} keyword and {len(PATTERN_LISTS)} pattern lists matched in all modes")
+        print("✅ Keyword Engine: WORKING")
+        return True
+
+    except Exception as e:
+        print(f"❌ Keyword Engine Error: {e}")
+        return False
+
+
+def test_rule_pack():
+    """Test rule pack compilation and atomic reload"""
+    print("\n🔍 Testing Rule Pack...")
+
+    try:
+        import json
+        import tempfile
+        from utils.rule_pack import RulePackManager, get_rule_pack_path, load_rule_pack
+        from detection_modules.scam_detector import detect_scam
+
+        with open(get_rule_pack_path()) as f:
+            data = json.load(f)
+        text = "Congratulations winner! Claim your lottery prize, act now"
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rule_pack.json")
+            with open(path, "w") as f:
+                json.dump(data, f)
+            manager = RulePackManager(path)
+            before = detect_scam(text, manager.current().scan(text))
+
+            compiled = load_rule_pack(path)
+            if compiled.digest != manager.current().digest or detect_scam(text, compiled.scan(text)) != before:
+                print("❌ Compiling the same rule pack twice gave different results")
+                return False
+
+            data["version"] = "test"
+            data["scam"]["high_risk_keyword"]["points"] = 1
+            with open(path, "w") as f:
+                json.dump(data, f)
+            manager.reload()
+            after = detect_scam(text, manager.current().scan(text))
+            if manager.current().version != "test" or after["scam_score"] >= before["scam_score"]:
+                print("❌ Reloaded rule pack was not applied")
+                return False
+
+            data["news"]["bias"].reverse()
+            with open(path, "w") as f:
+                json.dump(data, f)
+            try:
+                manager.reload()
+                print("❌ Invalid rule pack was accepted")
+                return False
+            except ValueError:
+                pass
+            if manager.current().version != "test":
+                print("❌ Invalid rule pack replaced the active one")
+                return False
+
+        print(f"✅ Rule pack {data['name']}: reload {before['scam_score']} -> {after['scam_score']}, invalid pack rejected")
+        print("✅ Rule Pack: WORKING")
+        return True
+
+    except Exception as e:
+        print(f"❌ Rule Pack Error: {e}")
+        return False
+
+
+def test_pipeline_stages():
+    """Test that independent stages overlap and the pipeline reports stage timings"""
+    print("\n🔍 Testing Pipeline Stages...")
+
+    try:
+        import asyncio
+        import time
+        from ml.predict import ScamPredictor
+        import utils.pipeline as pipeline
+        from utils.cache import TTLCache
+        from utils.pipeline import analyze_message, analyze_message_async, analyze_messages
+        from utils.stages import Stage, run_stages, run_stages_async
+
+        def slow(value):
+            time.sleep(0.2)
+            return value
+
+        start = time.perf_counter()
+        results, timings = run_stages([
+            Stage("a", lambda: slow(1)),
+            Stage("b", lambda: slow(2)),
+            Stage("c", lambda a, b: a + b, after=("a", "b"), inline=True),
+        ])
+        elapsed = time.perf_counter() - start
+        if results["c"] != 3 or elapsed > 0.35:
+            print(f"❌ Expected c=3 in ~0.2s, got {results['c']} in {elapsed:.2f}s")
+            return False
+
+        # Async graph: two awaited stages and a pool stage overlap
+        async def slow_async(value):
+            await asyncio.sleep(0.2)
+            return value
+
+        start = time.perf_counter()
+        results, _ = asyncio.run(run_stages_async([
+            Stage("a", lambda: slow_async(1), inline=True),
+            Stage("b", lambda: slow_async(2), inline=True),
+            Stage("c", lambda: slow(3)),
+            Stage("d", lambda a, b, c: a + b + c, after=("a", "b", "c"), inline=True),
+        ]))
+        async_elapsed = time.perf_counter() - start
+        if results["d"] != 6 or async_elapsed > 0.35:
+            print(f"❌ Expected d=6 in ~0.2s, got {results['d']} in {async_elapsed:.2f}s")
+            return False
+
+        predictor = ScamPredictor()
+        message = "URGENT! Your bank account is suspended. Verify now at http://example.com"
+        result = analyze_message(message, predictor, rules=True, timings=True)
+        expected_stages = {"url_extraction", "keyword_scan", "translation", "safe_browsing",
+                           "prediction", "rule_engine", "risk_score", "total"}
+        if set(result["timings_ms"]) != expected_stages:
+            print(f"❌ Unexpected stage timings: {result['timings_ms']}")
+            return False
+        if not result["rule_analysis"]["is_scam"]:
+            print(f"❌ Rule engine missed the scam: {result['rule_analysis']}")
+            return False
+        async_result = asyncio.run(analyze_message_async(message, predictor, rules=True, timings=True))
+        if set(async_result["timings_ms"]) != expected_stages or \
+                dict(async_result, timings_ms=None) != dict(result, timings_ms=None):
+            print(f"❌ analyze_message_async differs from analyze_message: {async_result}")
+            return False
+        # Summary: the verdict of the full analysis; the score may stop early at CRITICAL
+        verdict = {key: result["rule_analysis"][key] for key in ("is_scam", "risk_level", "message")}
+        summaries = [analyze_message(message, predictor, rules="summary")["rule_analysis"],
+                     analyze_messages([message], predictor, rules="summary")[0]["rule_analysis"]]
+        if summaries[0] != summaries[1] or dict(summaries[0], scam_score=None) != dict(verdict, scam_score=None) \
+                or summaries[0]["scam_score"] > result["rule_analysis"]["scam_score"]:
+            print(f"❌ rules='summary' differs from the full rule analysis: {summaries}")
+            return False
+
+        # A batch translates its non-English messages concurrently, in order
+        import google_ai.translate as translate
+
+        def slow_translate(text, detected):
+            time.sleep(0.2)
+            return detected, f"translated {text}", True
+        texts = [f"message {i}" for i in range(10)]
+        original = (translate.detect_language, translate._translate)
+        translate.detect_language = lambda text: "en" if text.endswith("0") else "fr"
+        translate._translate = slow_translate
+        try:
+            start = time.perf_counter()
+            translated = translate.detect_and_translate_batch(texts)
+            translate_elapsed = time.perf_counter() - start
+        finally:
+            translate.detect_language, translate._translate = original
+        expected = [("en", texts[0], False)] + [("fr", f"translated {t}", True) for t in texts[1:]]
+        if translated != expected or translate_elapsed > 0.9:
+            print(f"❌ Batch translation not concurrent or out of order ({translate_elapsed:.2f}s): {translated}")
+            return False
+
+        # A failed URL check is not cached, so the message is checked again next time
+        cache = TTLCache()
+        failed = {"checked": False, "api_key_present": True, "matches": {}, "error": "Read timed out"}
+        original = (pipeline.check_urls_safe_browsing, pipeline.check_urls_safe_browsing_batch)
+        pipeline.check_urls_safe_browsing = lambda urls: failed
+        pipeline.check_urls_safe_browsing_batch = lambda url_lists: [failed for _ in url_lists]
+        try:
+            analyze_message(message, predictor, cache=cache)
+            analyze_messages([message], predictor, cache=cache)
+        finally:
+            pipeline.check_urls_safe_browsing, pipeline.check_urls_safe_browsing_batch = original
+        if len(cache):
+            print("❌ Result with a failed URL check was cached")
+            return False
+        analyze_message(message, predictor, cache=cache)
+        if len(cache) != 1:
+            print("❌ Result with a completed URL check was not cached")
+            return False
+
+        print(f"✅ Two 0.2s stages ran in {elapsed:.2f}s ({async_elapsed:.2f}s with two awaited)")
+        print(f"✅ Stage timings: {result['timings_ms']}")
+        print("✅ Pipeline Stages: WORKING")
+        return True
+
+    except Exception as e:
+        print(f"❌ Pipeline Stages Error: {e}")
+        return False
+
+
+def test_url_verdict_cache():
+    """Test that Safe Browsing verdicts are cached, expire and persist on disk"""
+    print("\n🔍 Testing URL Verdict Cache...")
+
+    try:
+        import tempfile
+        import google_ai.safe_browsing as safe_browsing
+        from google_ai.verdict_cache import UrlVerdictCache
+
+        now = [1000.0]
+        unsafe = {"unsafe": True, "threat_types": ["SOCIAL_ENGINEERING"]}
+        safe = {"unsafe": False, "threat_types": []}
+        sent = []
+
+        def find_threat_matches(urls, api_key):
+            sent.append(list(urls))
+            return ({u: unsafe if "evil" in u else safe for u in urls},
+                    {u: 300 for u in urls if "evil" in u})
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "verdicts.sqlite3")
+            cache = UrlVerdictCache(path, negative_ttl=60, clock=lambda: now[0])
+            original = (safe_browsing._find_threat_matches, safe_browsing._verdict_cache)
+            safe_browsing._find_threat_matches, safe_browsing._verdict_cache = find_threat_matches, cache
+            try:
+                first = safe_browsing._lookup(["http://evil.test/", "http://ok.test/"], "key")
+                again = safe_browsing._lookup(["http://ok.test/", "http://new.test/"], "key")
+                now[0] += 120  # the safe verdicts expired, the unsafe one has not
+                later = safe_browsing._lookup(["http://evil.test/", "http://ok.test/"], "key")
+            finally:
+                safe_browsing._find_threat_matches, safe_browsing._verdict_cache = original
+
+            if sent != [["http://evil.test/", "http://ok.test/"], ["http://new.test/"], ["http://ok.test/"]]:
+                print(f"❌ Unexpected upstream requests: {sent}")
+                return False
+            if first["http://evil.test/"] != unsafe or again["http://ok.test/"] != safe or later != first:
+                print("❌ Cached verdicts differ from the API's")
+                return False
+
+            reopened = UrlVerdictCache(path, negative_ttl=60, clock=lambda: now[0])
+            if reopened.get_many(["http://evil.test/", "http://new.test/"]) != {"http://evil.test/": unsafe}:
+                print("❌ Verdicts were not read back from disk")
+                return False
+
+        print(f"✅ {len(sent)} upstream requests for 3 lookups")
+        print("✅ URL Verdict Cache: WORKING")
+        return True
+
+    except Exception as e:
+        print(f"❌ URL Verdict Cache Error: {e}")
+        return False
+
+
+def test_url_lookup_coalescing():
+    """Test that concurrent Safe Browsing lookups share de-duplicated upstream calls"""
+    print("\n🔍 Testing URL Lookup Coalescing...")
+
+    try:
+        import asyncio
+        import threading
+        import time
+        import google_ai.safe_browsing as safe_browsing
+        from google_ai.verdict_cache import UrlVerdictCache
+
+        sent = []
+
+        def find_threat_matches(urls, api_key):
+            sent.append(list(urls))
+            time.sleep(0.05)
+            return {u: {"unsafe": "evil" in u, "threat_types": []} for u in urls}, {}
+
+        url_lists = [[f"http://site{i % 4}.test/", f"http://evil{i % 2}.test/"] for i in range(20)]
+        results = [None] * len(url_lists)
+        start = threading.Barrier(len(url_lists))
+
+        def lookup(i):
+            start.wait()
+            results[i] = safe_browsing._lookup(url_lists[i], "coalescing-test-key")
+
+        original = (safe_browsing._find_threat_matches, safe_browsing._verdict_cache)
+        original_timeout = safe_browsing.lookup_timeout
+        original_key = os.environ.get("SAFE_BROWSING_API_KEY")
+        safe_browsing._find_threat_matches = find_threat_matches
+        safe_browsing._verdict_cache = UrlVerdictCache(None)
+        try:
+            threads = [threading.Thread(target=lookup, args=(i,)) for i in range(len(url_lists))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            concurrent_calls = len(sent)
+
+            sent.clear()
+            many = [f"http://bulk{i}.test/" for i in range(1200)]
+            bulk = safe_browsing._lookup(many + many[:10], "coalescing-test-key")
+
+            # A stuck upstream call: callers give up after lookup_timeout() with an error result
+            release = threading.Event()
+
+            def stuck_threat_matches(urls, api_key):
+                release.wait(5)
+                return find_threat_matches(urls, api_key)
+            safe_browsing._find_threat_matches = stuck_threat_matches
+            safe_browsing.lookup_timeout = lambda: 0.2
+            os.environ["SAFE_BROWSING_API_KEY"] = "coalescing-test-key"
+            timed_out = [safe_browsing.check_urls_safe_browsing(["http://stuck.test/"]),
+                         asyncio.run(safe_browsing.check_urls_safe_browsing_async(["http://stuck-async.test/"]))]
+            release.set()
+        finally:
+            safe_browsing._find_threat_matches, safe_browsing._verdict_cache = original
+            safe_browsing.lookup_timeout = original_timeout
+            if original_key is None:
+                os.environ.pop("SAFE_BROWSING_API_KEY", None)
+            else:
+                os.environ["SAFE_BROWSING_API_KEY"] = original_key
+
+        for urls, result in zip(url_lists, results):
+            if list(result) != urls or [v["unsafe"] for v in result.values()] != [False, True]:
+                print(f"❌ Caller got the wrong verdicts: {urls} -> {result}")
+                return False
+        if concurrent_calls >= len(url_lists):
+            print(f"❌ {len(url_lists)} concurrent lookups were not coalesced ({concurrent_calls} calls)")
+            return False
+        if len(bulk) != 1200 or max(len(urls) for urls in sent) > 500 \
+                or sum(len(urls) for urls in sent) != 1200:
+            print(f"❌ Expected 1200 unique URLs in calls of at most 500: {[len(urls) for urls in sent]}")
+            return False
+        client = safe_browsing.get_http_client()
+        budget = (client.retries + 1) * safe_browsing.UPSTREAM_TIMEOUT + client.retries * safe_browsing.MAX_RETRY_DELAY
+        if original_timeout() < budget:
+            print(f"❌ Lookup timeout {original_timeout()}s is shorter than the upstream retry budget {budget}s")
+            return False
+        if any(result["checked"] or "timed out" not in result.get("error", "") for result in timed_out):
+            print(f"❌ A stuck lookup did not time out with an error result: {timed_out}")
+            return False
+
+        print(f"✅ {len(url_lists)} concurrent lookups made {concurrent_calls} upstream calls")
+        print("✅ A stuck upstream call times out with an unchecked result")
+        print("✅ URL Lookup Coalescing: WORKING")
+        return True
+
+    except Exception as e:
+        print(f"❌ URL Lookup Coalescing Error: {e}")
+        return False
+
+def test_safe_browsing_db():
+    """Test the local threat list database against a stand-in Update API server"""
+    print("\n🔍 Testing Local Safe Browsing Database...")
+
+    try:
+        import base64
+        import hashlib
+        import json
+        import tempfile
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from google_ai.safe_browsing_db import LocalThreatDatabase, url_hashes
+
+        def sha(expression):
+            return hashlib.sha256(expression.encode()).digest()
+
+        b64 = lambda data: base64.b64encode(data).decode()
+        evil, other = sha("evil.test/login"), sha("other.test/")
+        listed = {"SOCIAL_ENGINEERING": {evil[:4], sha("decoy.test/")[:4]}}
+        requests_seen = []
+
+        class StandIn(BaseHTTPRequestHandler):
+            """threatListUpdates:fetch and fullHashes:find over the prefixes in `listed`"""
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                method = self.path.split("?")[0].rsplit("/", 1)[-1]
+                requests_seen.append((method, body))
+                if method == "threatListUpdates:fetch":
+                    responses = []
+                    for request in body["listUpdateRequests"]:
+                        prefixes = sorted(listed.get(request["threatType"], ()))
+                        responses.append({
+                            "threatType": request["threatType"], "platformType": "ANY_PLATFORM",
+                            "threatEntryType": "URL", "responseType": "FULL_UPDATE",
+                            "additions": [{"compressionType": "RAW",
+                                           "rawHashes": {"prefixSize": 4, "rawHashes": b64(b"".join(prefixes))}}],
+                            "newClientState": b64(b"v%d" % len(requests_seen)),
+                            "checksum": {"sha256": b64(hashlib.sha256(b"".join(prefixes)).digest())},
+                        })
+                    reply = {"listUpdateResponses": responses, "minimumWaitDuration": "600s"}
+                else:
+                    wanted = {base64.b64decode(e["hash"]) for e in body["threatInfo"]["threatEntries"]}
+                    reply = {"matches": [{"threatType": "SOCIAL_ENGINEERING", "threat": {"hash": b64(h)},
+                                          "cacheDuration": "300s"}
+                                         for h in (evil, other) if h[:4] in wanted],
+                             "negativeCacheDuration": "300s"}
+                data = json.dumps(reply).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        api_root = f"http://127.0.0.1:{server.server_port}/v4"
+        urls = ["http://EVIL.test/login#top", "http://decoy.test/", "http://good.test/"]
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "threat_lists.pkl")
+                db = LocalThreatDatabase("key", path=path, api_root=api_root,
+                                         threat_types=["SOCIAL_ENGINEERING", "MALWARE"], clock=lambda: 1000.0)
+                db.update()
+                matches, ttls = db.find_threat_matches(urls)
+                db.find_threat_matches(urls)  # answered from the full hash cache
+                full_hash_requests = [b for m, b in requests_seen if m == "fullHashes:find"]
+                if not db.ready or matches[urls[0]]["threat_types"] != ["SOCIAL_ENGINEERING"] \
+                        or matches[urls[1]]["unsafe"] or matches[urls[2]]["unsafe"] or ttls != {urls[0]: 300}:
+                    print(f"❌ Unexpected matches: {matches} {ttls}")
+                    return False
+                if len(full_hash_requests) != 1 or len(full_hash_requests[0]["threatInfo"]["threatEntries"]) != 2:
+                    print(f"❌ Expected one full hash request for the 2 listed prefixes: {full_hash_requests}")
+                    return False
+                if evil not in url_hashes(urls[0]):
+                    print("❌ URL was not canonicalized to its listed expression")
+                    return False
+
+                # A partial update removing the prefix; a restart resumes from disk
+                listed["SOCIAL_ENGINEERING"].discard(evil[:4])
+                db.update()
+                reopened = LocalThreatDatabase("key", path=path, api_root=api_root,
+                                               threat_types=["SOCIAL_ENGINEERING", "MALWARE"])
+                if not reopened.ready or reopened.find_threat_matches(urls[:1])[0][urls[0]]["unsafe"]:
+                    print("❌ Removed prefix still matches after reload")
+                    return False
+        finally:
+            server.shutdown()
+
+        print(f"✅ {len(requests_seen)} stand-in requests, 1 full hash confirmation for {len(urls)} URLs")
+        print("✅ Local Safe Browsing Database: WORKING")
+        return True
+
+    except Exception as e:
+        print(f"❌ Local Safe Browsing Database Error: {e}")
+        return False
+
+
+def test_http_client():
+    """Test connection reuse, retries and the circuit breaker of the outbound HTTP client"""
+    print("\n🔍 Testing Pooled HTTP Client...")
+
+    try:
+        import asyncio
+        import email.utils
+        import threading
+        import time
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from utils.http_client import CircuitOpenError, HttpClient
+
+        failures = [0]  # 503 answers still to give
+
+        class Flaky(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+
+            def do_GET(self):
+                status = 200
+                if failures[0]:
+                    failures[0] -= 1
+                    status = 503
+                self.send_response(status)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"ok")
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Flaky)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host = f"127.0.0.1:{server.server_port}"
+        now = [0.0]
+        client = HttpClient(retries=2, failure_threshold=3, reset_timeout=30,
+                            clock=lambda: now[0], sleep=lambda seconds: None)
+        try:
+            for _ in range(10):
+                client.get(f"http://{host}/", timeout=5)
+            stats = client.stats()["hosts"][host]
+            if stats["new_connections"] != 1 or stats["reused_connections"] != 9:
+                print(f"❌ Connections were not reused: {stats}")
+                return False
+
+            failures[0] = 2
+            if client.get(f"http://{host}/", timeout=5).status_code != 200:
+                print("❌ Request was not retried past two 503 answers")
+                return False
+
+            failures[0] = 3
+            if client.get(f"http://{host}/", timeout=5).status_code != 503:
+                print("❌ Last answer was not returned once retries ran out")
+                return False
+            try:
+                client.get(f"http://{host}/", timeout=5)
+                print("❌ Circuit did not open after 3 failed attempts")
+                return False
+            except CircuitOpenError:
+                pass
+
+            now[0] = 31.0  # trial call after the reset timeout closes the circuit
+            if client.get(f"http://{host}/", timeout=5).status_code != 200 \
+                    or client.stats()["hosts"][host]["circuit"] != "closed":
+                print("❌ Circuit did not close after a successful trial call")
+                return False
+
+            async def concurrent_gets():
+                return await asyncio.gather(*(client.get_async(f"http://{host}/", timeout=5) for _ in range(5)))
+
+            failures[0] = 1  # one of them is retried
+            if [r.status_code for r in asyncio.run(concurrent_gets())] != [200] * 5:
+                print("❌ Async requests failed")
+                return False
+        finally:
+            server.shutdown()
+
+        # Retry-After: seconds, an HTTP date (naive dates are GMT), or junk
+        class Answer:
+            def __init__(self, retry_after):
+                self.headers = {"Retry-After": retry_after}
+        soon = email.utils.formatdate(time.time() + 1.5, usegmt=True)
+        delays = [client._retry_delay(0, Answer(value))
+                  for value in ("1", soon, soon.replace(" GMT", ""), "soon", "Mon, 99 Foo")]
+        if delays[0] != 1 or not all(0.4 < d < 1.6 for d in delays[1:3]) \
+                or not all(d <= client.backoff for d in delays[3:]):
+            print(f"❌ Retry-After was not honoured safely: {delays}")
+            return False
+
+        stats = client.stats()["hosts"][host]
+        print(f"✅ {stats['requests']} requests, {stats['retries']} retries, "
+              f"{stats['new_connections']} new connections, {stats['rejected']} rejected by the breaker")
+        print("✅ Pooled HTTP Client: WORKING")
+        return True
+
+    except Exception as e:
+        print(f"❌ Pooled HTTP Client Error: {e}")
+        return False
+
+
 def test_flask_integration():
     """Test Flask app integration"""
     print("\n🔍 Testing Flask Integration...")
@@ -152,6 +1117,29 @@ def test_flask_integration():
                 print("✅ News endpoint requires authentication (correct)")
             else:
                 print(f"⚠️ Unexpected news endpoint response: {news_response.status_code}")
+
+            # Async API view
+            api_response = client.post('/api/detect-scam',
+                                       json={'message': 'URGENT! Verify your bank account now'})
+            if api_response.status_code != 200 or "timings_ms" not in api_response.get_json():
+                print(f"❌ Async scam API failed: {api_response.status_code} {api_response.get_data(as_text=True)}")
+                return False
+            print("✅ Async scam API answered")
+
+            # Batch API: request and per-message validation (shared with Cloud Functions)
+            batch_response = client.post('/api/detect-scam/batch',
+                                         json={'messages': ['URGENT! Verify your bank account now', '  ', 'hi', 7]})
+            errors = [r.get("error") for r in batch_response.get_json()["results"]]
+            if batch_response.status_code != 200 or \
+                    errors != [None, "Message cannot be empty", "Message too short", "Message cannot be empty"]:
+                print(f"❌ Batch API validation failed: {batch_response.status_code} {errors}")
+                return False
+            bad_response = client.post('/api/detect-scam/batch', json={'messages': []})
+            if bad_response.status_code != 400 or \
+                    bad_response.get_json() != {"error": "'messages' must be a non-empty list"}:
+                print(f"❌ Empty batch was not rejected: {bad_response.get_data(as_text=True)}")
+                return False
+            print("✅ Batch API validated its messages")
         
         print("✅ Flask Integration: WORKING")
         return True
@@ -171,6 +1159,19 @@ def main():
     # Test individual modules
     results.append(test_scam_detection())
     results.append(test_fake_news_detection())
+    results.append(test_batch_prediction())
+    results.append(test_compiled_scorer())
+    results.append(test_model_registry())
+    results.append(test_ttl_cache())
+    results.append(test_micro_batcher())
+    results.append(test_preprocessing())
+    results.append(test_keyword_engine())
+    results.append(test_rule_pack())
+    results.append(test_pipeline_stages())
+    results.append(test_url_verdict_cache())
+    results.append(test_url_lookup_coalescing())
+    results.append(test_safe_browsing_db())
+    results.append(test_http_client())
     results.append(test_flask_integration())
     
     # Summary
@@ -0,0 +1,329 @@
+"""
+Aho-Corasick multi-keyword matcher.
+
+    automaton = KeywordAutomaton({"urgency": ["urgent", "act now"], "money": ["free money"]})
+    hits = automaton.scan("act now for free money")
+    hits.keywords("money")        # ['free money'] (in list order)
+    hits.count("urgency")         # 1
+
+All keywords of all lists are compiled once into a single automaton, so one
+linear pass over the text finds every keyword of every list, however many
+lists and keywords there are. A hit means `keyword in text`, the substring
+test the detectors used before. Matching is case-sensitive; lowercase the
+text first for case-insensitive lists.
+
+The automaton runs over the UTF-8 bytes of the text with a dense 256-entry
+transition row per state (a DFA: failure links are resolved at build time), so
+the scan is one list index per byte.
+
+Regex pattern lists (pattern_lists=...) are matched with re.search semantics.
+Patterns that are plain literals once unescaped (e.g. r"bit\.ly",
+r"breaking:") are added to the automaton and cost nothing extra; the rest are
+compiled once and searched only when their list is asked for. (Combining them
+into one alternation with named groups was measured several times slower than
+separate searches under CPython's re, which skips its literal-prefix scan for
+such patterns.)
+
+Keyword lists match as substrings by default (keyword_match="substring"), so
+"pay" is found in "display". With keyword_match="tokens" a keyword only
+matches whole words: the text is split into tokens once (TOKEN_REGEX, words
+with inner apostrophes) and each keyword's token sequence is looked up by its
+first token, so a scan costs O(tokens) rather than a pass per byte.
+"mind-blowing" then matches "mind-blowing" and "mind blowing", but not
+"mind-blowingly". keyword_match="prefix" is the same, except that the last word
+of a keyword may go on: "urgent" matches "urgently" and "pay" matches
+"payment", but "pay" still does not match "display". Pattern lists keep
+re.search semantics in every mode.
+
+KeywordAutomaton.stream() scans text that arrives in pieces: the automaton
+state carries over from one piece to the next, so keywords spanning two
+pieces are found. Regex patterns are searched in each piece plus the text
+before it (all of it, or its last REGEX_OVERLAP characters from a whitespace
+on), so a regex match is found across pieces if it is shorter than that. In
+tokens and prefix modes, pieces must be cut between tokens (e.g. at
+whitespace).
+"""
+import re
+from collections import deque
+
+_REGEX_META = set(".^$*+?{}[]|()")
+REGEX_OVERLAP = 1024
+_OVERLAP_START = re.compile(r"\s")
+TOKEN_REGEX = re.compile(r"\w+(?:'\w+)*")
+_PARTIAL_TOKEN = re.compile(r"[\w']*\Z")
+KEYWORD_MATCH_MODES = ("substring", "tokens", "prefix")
+_TOKEN_MODES = ("tokens", "prefix")
+
+
+def _encode(text):
+    return text.encode("utf-8", "surrogatepass")
+
+
+def tokenize(text):
+    return TOKEN_REGEX.findall(text)
+
+
+def regex_literal(pattern):
+    """The string a regex pattern matches if it is a plain literal, else None."""
+    chars = []
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\":
+            if i + 1 == len(pattern) or pattern[i + 1].isalnum():
+                return None  # \d, \b, ... or a trailing backslash
+            chars.append(pattern[i + 1])
+            i += 2
+            continue
+        if ch in _REGEX_META:
+            return None
+        chars.append(ch)
+        i += 1
+    return "".join(chars) or None
+
+
+class KeywordHits:
+    """Result of KeywordAutomaton.scan: which keywords/patterns of which lists occur."""
+
+    def __init__(self, automaton, found, text):
+        self._automaton = automaton
+        self._found = found  # set of automaton pattern ids
+        self._text = text
+        self._regex_results = {}
+        self.rules = None  # the RulePack that scanned (utils/rule_pack.py), if any
+
+    def _hit(self, pid, regex):
+        if regex is None:
+            return pid in self._found
+        hit = self._regex_results.get(regex)
+        if hit is None:
+            hit = self._regex_results[regex] = regex.search(self._text) is not None
+        return hit
+
+    def keywords(self, list_id):
+        """Keywords (or patterns) of list_id found in the text, in the order of the list."""
+        return [label for label, pid, regex in self._automaton._list_entries[list_id]
+                if self._hit(pid, regex)]
+
+    patterns = keywords
+
+    def count(self, list_id):
+        return len(self.keywords(list_id))
+
+    def any(self, list_id):
+        return any(self._hit(pid, regex) for _, pid, regex in self._automaton._list_entries[list_id])
+
+    def items(self):
+        """Every (list_id, keyword) hit."""
+        return [(list_id, kw) for list_id in self._automaton.list_ids for kw in self.keywords(list_id)]
+
+
+class KeywordAutomaton:
+    def __init__(self, keyword_lists, pattern_lists=None, keyword_match="substring"):
+        if keyword_match not in KEYWORD_MATCH_MODES:
+            raise ValueError(f"keyword_match must be one of {KEYWORD_MATCH_MODES}, not {keyword_match!r}")
+        pattern_lists = pattern_lists or {}
+        self.keyword_match = keyword_match
+        self.list_ids = list(keyword_lists) + list(pattern_lists)
+        self.patterns = []  # (kind, literal) per pattern id; kind is "substring", "tokens" or "prefix"
+        pattern_ids = {}
+        self._list_entries = {}  # list_id -> [(label, automaton pattern id, compiled regex)]
+
+        def add(kind, literal):
+            key = (kind, literal)
+            if key not in pattern_ids:
+                pattern_ids[key] = len(self.patterns)
+                self.patterns.append(key)
+            return pattern_ids[key]
+
+        for list_id, keywords in keyword_lists.items():
+            if not all(keywords):
+                raise ValueError(f"Empty keyword in list {list_id!r}")
+            if keyword_match in _TOKEN_MODES:
+                for kw in keywords:
+                    if not tokenize(kw):
+                        raise ValueError(f"Keyword {kw!r} in list {list_id!r} has no word to match")
+            self._list_entries[list_id] = [(kw, add(keyword_match, kw), None) for kw in keywords]
+        for list_id, patterns in pattern_lists.items():
+            entries = []
+            for pattern in patterns:
+                literal = regex_literal(pattern)
+                if literal is not None:
+                    entries.append((pattern, add("substring", literal), None))
+                else:
+                    entries.append((pattern, None, re.compile(pattern)))
+            self._list_entries[list_id] = entries
+
+        substrings = [(pid, literal) for pid, (kind, literal) in enumerate(self.patterns) if kind == "substring"]
+        # Tokens and prefix modes: first token -> [(token tuple, pattern id,
+        # whether the last token is a prefix)]; one-word prefix keywords are
+        # looked up by each prefix of each token. The few substring literals
+        # (from pattern lists) are found with `in`
+        self._phrases = {}
+        self._prefixes = {}
+        for pid, (kind, literal) in enumerate(self.patterns):
+            if kind in _TOKEN_MODES:
+                phrase = tuple(tokenize(literal))
+                if kind == "prefix" and len(phrase) == 1:
+                    self._prefixes.setdefault(phrase[0], []).append(pid)
+                else:
+                    self._phrases.setdefault(phrase[0], []).append((phrase, pid, kind == "prefix"))
+        self._prefix_lengths = sorted({len(prefix) for prefix in self._prefixes})
+        self._max_phrase = max((len(phrase) for entries in self._phrases.values() for phrase, _, _ in entries),
+                               default=0)
+        self._substring_literals = substrings if keyword_match in _TOKEN_MODES else []
+        trie_patterns = [] if keyword_match in _TOKEN_MODES else substrings
+        self._table, self._outputs = self._build([(pid, _encode(literal)) for pid, literal in trie_patterns])
+
+    @staticmethod
+    def _build(patterns):
+        # Trie over (pattern id, bytes)
+        goto = [{}]
+        outputs = [[]]
+        for pid, pattern in patterns:
+            state = 0
+            for byte in pattern:
+                nxt = goto[state].get(byte)
+                if nxt is None:
+                    goto.append({})
+                    outputs.append([])
+                    nxt = len(goto) - 1
+                    goto[state][byte] = nxt
+                state = nxt
+            outputs[state].append(pid)
+
+        # Failure links in BFS order, folding each state's fallback transitions
+        # and outputs into it
+        table = [[0] * 256 for _ in goto]
+        for byte, state in goto[0].items():
+            table[0][byte] = state
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            row = table[state]
+            row[:] = table[fail[state]]
+            for byte, nxt in goto[state].items():
+                row[byte] = nxt
+                fail[nxt] = table[fail[state]][byte]
+                queue.append(nxt)
+            outputs[state] = outputs[state] + outputs[fail[state]]
+        return table, [tuple(o) if o else None for o in outputs]
+
+    def stream(self):
+        return KeywordStream(self)
+
+    def _match_tokens(self, tokens, found):
+        phrases = self._phrases
+        token_set = set(tokens)
+        positions = None
+        for token in phrases.keys() & token_set:
+            for phrase, pid, prefix in phrases[token]:
+                if pid in found:
+                    continue
+                if len(phrase) == 1:
+                    found.add(pid)
+                    continue
+                if not token_set.issuperset(phrase[:-1] if prefix else phrase):
+                    continue
+                if positions is None:
+                    positions = {}
+                    for i, t in enumerate(tokens):
+                        if t in phrases:
+                            positions.setdefault(t, []).append(i)
+                n = len(phrase)
+                if prefix:
+                    head, last = phrase[:-1], phrase[-1]
+                    if any(i + n <= len(tokens) and tuple(tokens[i:i + n - 1]) == head
+                           and tokens[i + n - 1].startswith(last) for i in positions[token]):
+                        found.add(pid)
+                elif any(tuple(tokens[i:i + n]) == phrase for i in positions[token]):
+                    found.add(pid)
+        if self._prefixes:
+            prefixes = self._prefixes
+            for token in token_set:
+                for length in self._prefix_lengths:
+                    if length > len(token):
+                        break
+                    pids = prefixes.get(token[:length])
+                    if pids:
+                        found.update(pids)
+
+    def scan(self, text):
+        if self.keyword_match in _TOKEN_MODES:
+            found = {pid for pid, literal in self._substring_literals if literal in text}
+            self._match_tokens(tokenize(text), found)
+            return KeywordHits(self, found, text)
+
+        table = self._table
+        outputs = self._outputs
+        state = 0
+        found = set()
+        for byte in _encode(text):
+            state = table[state][byte]
+            if outputs[state] is not None:
+                found.update(outputs[state])
+        return KeywordHits(self, found, text)
+
+
+class KeywordStream:
+    """KeywordAutomaton.scan over text fed in pieces; hits() once all pieces are fed."""
+
+    def __init__(self, automaton):
+        self._automaton = automaton
+        self._state = 0
+        self._found = set()
+        self._regexes = {regex for entries in automaton._list_entries.values()
+                         for _, _, regex in entries if regex is not None}
+        self._regex_results = {}
+        self._tail = ""
+        self._tokens = []
+        self._partial = ""
+
+    def feed(self, text):
+        automaton = self._automaton
+        found = self._found
+        window = self._tail + text
+        if automaton.keyword_match in _TOKEN_MODES:
+            # A token may go on in the next piece: hold back the trailing
+            # word characters (up to REGEX_OVERLAP). Phrases may start in the
+            # previous piece: keep its last tokens
+            text = self._partial + text
+            partial = _PARTIAL_TOKEN.search(text, max(0, len(text) - REGEX_OVERLAP))
+            self._partial = text[partial.start():]
+            tokens = self._tokens + tokenize(text[:partial.start()])
+            automaton._match_tokens(tokens, found)
+            self._tokens = tokens[-(automaton._max_phrase - 1):] if automaton._max_phrase > 1 else []
+            found.update(pid for pid, literal in automaton._substring_literals if literal in window)
+        else:
+            table = automaton._table
+            outputs = automaton._outputs
+            state = self._state
+            for byte in _encode(text):
+                state = table[state][byte]
+                if outputs[state] is not None:
+                    found.update(outputs[state])
+            self._state = state
+
+        if self._regexes or automaton._substring_literals:
+            for regex in list(self._regexes):
+                if regex.search(window):
+                    self._regex_results[regex] = True
+                    self._regexes.discard(regex)
+            if len(window) <= REGEX_OVERLAP:
+                self._tail = window
+            else:
+                # Trim an over-long window back to a whitespace, so the
+                # carried-over text does not start mid-word
+                tail = window[-REGEX_OVERLAP:]
+                space = _OVERLAP_START.search(tail)
+                self._tail = tail[space.start():] if space else ""
+
+    def hits(self):
+        found = set(self._found)
+        if self._partial:
+            self._automaton._match_tokens(self._tokens + tokenize(self._partial), found)
+        hits = KeywordHits(self._automaton, found, "")
+        hits._regex_results.update(self._regex_results)
+        hits._regex_results.update((regex, False) for regex in self._regexes)
+        return hits
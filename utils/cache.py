@@ -0,0 +1,98 @@
+"""
+Thread-safe in-memory LRU cache with a time-to-live, plus content-addressed keys.
+
+    cache = TTLCache(max_size=10000, ttl=3600)
+    key = content_key("model-version", "normalized text")
+    result = cache.get(key)
+    if result is None:
+        result = expensive(...)
+        cache.put(key, result)
+
+Cached values are shared between callers and must be treated as read-only.
+stats() returns hit / miss / eviction counters for monitoring.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def content_key(*parts) -> str:
+    """SHA-256 over the given parts; used so keys stay small for long messages."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode("utf-8", "surrogatepass"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class TTLCache:
+    def __init__(self, max_size=10000, ttl=3600, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._data = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= self.clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, ttl=None):
+        """Store value; ttl overrides the cache default for this entry (None = default)."""
+        if self.max_size <= 0:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = self.clock() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def cache_from_env(prefix, default_size=10000, default_ttl=3600):
+    """Build a TTLCache sized by <prefix>_SIZE / <prefix>_TTL environment variables."""
+    return TTLCache(
+        max_size=int(os.environ.get(f"{prefix}_SIZE", default_size)),
+        ttl=float(os.environ.get(f"{prefix}_TTL", default_ttl)),
+    )
@@ -0,0 +1,353 @@
+"""
+Shared HTTP client for outbound API calls (Safe Browsing, translation).
+
+    resp = get_http_client().post(url, json=body, timeout=10)
+
+One requests.Session for the process: connections are pooled per host and
+kept alive between calls (HTTP_POOL_SIZE per host, default 32), so a call
+only pays for TCP and TLS setup when the pool has no idle connection.
+
+A call that fails with a connection error, a timeout or a 429/5xx answer is
+retried up to HTTP_RETRIES times (default 2) after a random delay of up to
+HTTP_BACKOFF * 2^attempt seconds (default 0.2; "full jitter"), or the
+server's Retry-After if that is longer, at most MAX_RETRY_DELAY. The last
+answer is returned as is, so callers still see the status with
+raise_for_status().
+
+Each host (and port) has a circuit breaker: after HTTP_BREAKER_THRESHOLD
+failed attempts in a row (default 5, retries included), calls fail fast
+with CircuitOpenError for HTTP_BREAKER_RESET seconds (default 30); then one
+trial call is let through and its outcome closes or reopens the circuit.
+CircuitOpenError is a requests.ConnectionError, so callers' existing error
+handling applies.
+
+await request_async()/get_async()/post_async() make the same calls from a
+coroutine. They run on one event loop in a background thread, over a shared
+httpx.AsyncClient (HTTP_POOL_SIZE kept-alive connections), so hundreds of
+calls can be in flight without a thread each; retries, breakers and stats
+are shared with the blocking calls. The responses are httpx.Response objects,
+which have the same status_code, headers, json() and raise_for_status().
+
+stats() returns per-host request, retry, failure and new-connection counts,
+connection setup time and circuit state.
+"""
+import asyncio
+import email.utils
+import os
+import random
+import threading
+import time
+from datetime import timezone
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_RETRY_DELAY = 2.0
+
+
+def _host_key(host, port):
+    return host if port in (None, 80, 443) else f"{host}:{port}"
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised instead of calling a host whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go out now (in half-open state, only one trial call)."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open":
+                if self.clock() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = "half_open"
+                self._trial = False
+            if self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = self.clock()
+            self._trial = False
+
+
+class _HostStats:
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+        self.connections = 0
+        self.connect_seconds = 0.0
+        self.max_connect_seconds = 0.0
+
+
+class _PoolingAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections report their setup (TCP + TLS) time to the client."""
+
+    def __init__(self, client, **kwargs):
+        self._client = client
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        record = self._client._record_connect
+
+        class TimedHTTPConnection(HTTPConnection):
+            def connect(self):
+                start = time.perf_counter()
+                try:
+                    super().connect()
+                finally:
+                    record(_host_key(self.host, self.port), time.perf_counter() - start)
+
+        class TimedHTTPSConnection(HTTPSConnection):
+            def connect(self):
+                start = time.perf_counter()
+                try:
+                    super().connect()
+                finally:
+                    record(_host_key(self.host, self.port), time.perf_counter() - start)
+
+        class TimedHTTPConnectionPool(HTTPConnectionPool):
+            ConnectionCls = TimedHTTPConnection
+
+        class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+            ConnectionCls = TimedHTTPSConnection
+
+        self.poolmanager.pool_classes_by_scheme = {"http": TimedHTTPConnectionPool,
+                                                   "https": TimedHTTPSConnectionPool}
+
+
+class HttpClient:
+    def __init__(self, pool_size=32, retries=2, backoff=0.2, failure_threshold=5, reset_timeout=30.0,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.sleep = sleep
+        self.session = requests.Session()
+        adapter = _PoolingAdapter(self, pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._breakers = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self._async_session = None
+
+    def _host(self, host):
+        with self._lock:
+            if host not in self._stats:
+                self._stats[host] = _HostStats()
+                self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout, self.clock)
+            return self._stats[host], self._breakers[host]
+
+    def _record_connect(self, host, seconds):
+        stats, _ = self._host(host)
+        with self._lock:
+            stats.connections += 1
+            stats.connect_seconds += seconds
+            stats.max_connect_seconds = max(stats.max_connect_seconds, seconds)
+
+    def _retry_delay(self, attempt, response):
+        delay = random.uniform(0, self.backoff * 2 ** attempt)
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                seconds = float(retry_after)
+            except ValueError:
+                try:
+                    when = email.utils.parsedate_to_datetime(retry_after)
+                except (ValueError, TypeError):
+                    when = None  # unparseable: keep the jittered delay
+                if when is not None and when.tzinfo is None:
+                    when = when.replace(tzinfo=timezone.utc)  # HTTP dates are in GMT
+                seconds = when.timestamp() - time.time() if when else 0
+            delay = max(delay, seconds)
+        return min(delay, MAX_RETRY_DELAY)
+
+    def _admit(self, url):
+        """(host, stats, breaker) for a call to url; CircuitOpenError if its circuit is open."""
+        parts = urlsplit(url)
+        host = _host_key(parts.hostname or "", parts.port)
+        stats, breaker = self._host(host)
+        if not breaker.allow():
+            with self._lock:
+                stats.rejected += 1
+            raise CircuitOpenError(f"Circuit open for {host} after repeated failures")
+        return host, stats, breaker
+
+    def _attempt(self, stats, attempt):
+        with self._lock:
+            stats.requests += 1
+            if attempt:
+                stats.retries += 1
+
+    def _failed(self, stats, breaker, attempt):
+        """Record a failed attempt; whether to give up (out of retries, or the circuit opened)."""
+        breaker.record_failure()
+        with self._lock:
+            stats.failures += 1
+        return attempt == self.retries or not breaker.allow()
+
+    def request(self, method, url, **kwargs):
+        _, stats, breaker = self._admit(url)
+        attempt = 0
+        while True:
+            self._attempt(stats, attempt)
+            response = error = None
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    breaker.record_success()
+                    return response
+
+            if self._failed(stats, breaker, attempt):
+                if error is not None:
+                    raise error
+                return response
+            if response is not None:
+                response.close()
+            self.sleep(self._retry_delay(attempt, response))
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def _io_loop(self):
+        """The background event loop for async calls, started on first use."""
+        with self._lock:
+            if self._loop is None:
+                import httpx
+
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="http-io", daemon=True).start()
+                limits = httpx.Limits(max_connections=None, max_keepalive_connections=self.pool_size)
+                self._async_session = httpx.AsyncClient(limits=limits)
+                self._loop = loop
+            return self._loop
+
+    async def request_async(self, method, url, **kwargs):
+        loop = self._io_loop()
+        future = asyncio.run_coroutine_threadsafe(self._request_async(method, url, **kwargs), loop)
+        return await asyncio.wrap_future(future)
+
+    async def _request_async(self, method, url, **kwargs):
+        import httpx
+
+        host, stats, breaker = self._admit(url)
+        tls_done = "connection.start_tls.complete" if url.startswith("https:") else "connection.connect_tcp.complete"
+        connect_started = []
+
+        async def trace(event, info):
+            # httpcore connection events: time TCP (+ TLS) setup like the blocking adapter
+            if event == "connection.connect_tcp.started":
+                connect_started.append(time.perf_counter())
+            elif connect_started and (event == tls_done or event.endswith(".failed")):
+                self._record_connect(host, time.perf_counter() - connect_started.pop())
+
+        attempt = 0
+        while True:
+            self._attempt(stats, attempt)
+            response = error = None
+            try:
+                response = await self._async_session.request(method, url, extensions={"trace": trace}, **kwargs)
+            except httpx.TransportError as e:
+                error = e
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    breaker.record_success()
+                    return response
+
+            if self._failed(stats, breaker, attempt):
+                if error is not None:
+                    raise error
+                return response
+            await asyncio.sleep(self._retry_delay(attempt, response))
+            attempt += 1
+
+    async def get_async(self, url, **kwargs):
+        return await self.request_async("GET", url, **kwargs)
+
+    async def post_async(self, url, **kwargs):
+        return await self.request_async("POST", url, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            hosts = {}
+            for host, s in self._stats.items():
+                breaker = self._breakers[host]
+                hosts[host] = {
+                    "requests": s.requests,
+                    "retries": s.retries,
+                    "failures": s.failures,
+                    "rejected": s.rejected,
+                    "new_connections": s.connections,
+                    "reused_connections": max(s.requests - s.connections, 0),
+                    "avg_connect_ms": round(s.connect_seconds / s.connections * 1000, 3) if s.connections else 0.0,
+                    "max_connect_ms": round(s.max_connect_seconds * 1000, 3),
+                    "circuit": breaker.state,
+                }
+        return {"pool_size": self.pool_size, "retries": self.retries, "hosts": hosts}
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def http_client_from_env():
+    """HttpClient configured by HTTP_POOL_SIZE, HTTP_RETRIES, HTTP_BACKOFF, HTTP_BREAKER_THRESHOLD/_RESET."""
+    return HttpClient(
+        pool_size=int(os.environ.get("HTTP_POOL_SIZE", 32)),
+        retries=int(os.environ.get("HTTP_RETRIES", 2)),
+        backoff=float(os.environ.get("HTTP_BACKOFF", 0.2)),
+        failure_threshold=int(os.environ.get("HTTP_BREAKER_THRESHOLD", 5)),
+        reset_timeout=float(os.environ.get("HTTP_BREAKER_RESET", 30)),
+    )
+
+
+def get_http_client():
+    """The process-wide client, created on first use (after a pre-fork server forks)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = http_client_from_env()
+    return _client
@@ -0,0 +1,43 @@
+"""
+IDs of the keyword lists and regex pattern lists used by the scam detector,
+the fake news detector and the risk score. The lists themselves live in the
+active rule pack (rules/rule_pack.json, see utils/rule_pack.py), compiled into
+one Aho-Corasick automaton (literal patterns included; utils/aho_corasick.py).
+Keywords match whole words or anywhere in the text, as the pack's
+keyword_match says.
+
+    hits = scan_keywords(text)               # one pass over text.lower()
+    hits.keywords(SCAM_HIGH_RISK)            # hits of one list, in list order
+    hits.count(NEWS_BIAS)
+    hits.patterns(NEWS_CLICKBAIT)            # patterns that re.search would find
+    hits.any(SCAM_PERSONAL_INFO)
+
+detect_scam, detect_fake_news and compute_risk_score_and_reasons accept the
+hits of an earlier scan (keyword_hits=...), so a caller running several of
+them on the same text scans it once; hits.rules is the rule pack that
+produced them, whose weights and thresholds the detectors then apply.
+"""
+from utils.rule_pack import get_rule_pack
+
+# List IDs
+SCAM_HIGH_RISK = "scam_high_risk"
+SCAM_MEDIUM_RISK = "scam_medium_risk"
+SCAM_URGENCY = "scam_urgency"
+COMMON_MISSPELLINGS = "common_misspellings"
+NEWS_SENSATIONAL = "news_sensational"
+NEWS_SCAM = "news_scam"
+NEWS_BIAS = "news_bias"
+NEWS_EMOTIONAL = "news_emotional"
+NEWS_VAGUE_SOURCES = "news_vague_sources"
+NEWS_URGENCY = "news_urgency"
+FRAUD = "fraud"
+SCAM_SUSPICIOUS_PATTERNS = "scam_suspicious_patterns"
+SCAM_PERSONAL_INFO = "scam_personal_info"
+NEWS_CLICKBAIT = "news_clickbait"
+NEWS_SOURCE_ATTRIBUTION = "news_source_attribution"
+NEWS_EXTRAORDINARY_CLAIMS = "news_extraordinary_claims"
+
+
+def scan_keywords(text):
+    """Find every keyword and literal pattern of every list in text (case-insensitive) in one pass."""
+    return get_rule_pack().scan(text)
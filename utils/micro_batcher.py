@@ -0,0 +1,106 @@
+"""
+Request coalescing: collect calls from many threads and run them as one batch.
+
+    batcher = MicroBatcher(predictor.predict_batch, max_batch_size=64, max_wait=0.002)
+    result = batcher.call(text)          # blocks until the batch containing text ran
+
+A background thread takes the first queued item, keeps collecting for at most
+max_wait seconds or until max_batch_size items are queued, calls
+batch_fn(items) once and hands result i back to the caller of item i. If
+batch_fn raises, every caller in that batch gets the exception.
+For an I/O-bound batch_fn (e.g. an upstream API call), pass an executor: each
+batch then runs in it, and the next batch is collected meanwhile; if the
+executor refuses the batch (e.g. it was shut down), its callers get that error.
+Items whose future was cancelled before their batch ran are left out of it.
+The thread is started lazily on first use, so importing a module that builds a
+batcher is safe before a pre-fork server forks its workers.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    def __init__(self, batch_fn, max_batch_size=64, max_wait=0.002, name="micro-batcher", executor=None):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.name = name
+        self.executor = executor
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, item) -> Future:
+        future = Future()
+        self._ensure_started()
+        self._queue.put((item, future))
+        return future
+
+    def call(self, item, timeout=None):
+        return self.submit(item).result(timeout=timeout)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = [(item, future) for item, future in self._collect() if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            if self.executor is None:
+                self._run_batch(batch)
+                continue
+            try:
+                self.executor.submit(self._run_batch, batch)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+    def _run_batch(self, batch):
+        items = [item for item, _ in batch]
+        futures = [future for _, future in batch]
+        try:
+            results = self.batch_fn(items)
+            if len(results) != len(items):
+                raise RuntimeError(f"batch_fn returned {len(results)} results for {len(items)} items")
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        with self._lock:
+            self.batches += 1
+            self.items += len(items)
+        for future, result in zip(futures, results):
+            future.set_result(result)
@@ -0,0 +1,285 @@
+"""
+Message analysis pipeline shared by the web UI, the REST API and Cloud Functions.
+
+analyze_message(message, predictor) runs, for one message:
+  URL extraction -> Safe Browsing URL check ----------------------.
+  language detection/translation -> ML prediction ----------------+-> risk score and reasons
+  keyword scan (-> detect_scam rule engine, with rules=True) -----'
+as a graph of stages (utils/stages.py): the Safe Browsing lookup runs in the
+shared stage pool while the calling thread translates and predicts, so the
+two network calls overlap instead of adding up. With timings=True the
+result also has "timings_ms": the run time of each stage and the total
+(or of the cache lookup, on a cache hit).
+
+await analyze_message_async(...) is the same for async views: translation
+and the Safe Browsing check are awaited concurrently on the event loop
+(google_ai async versions) and only prediction uses a pool thread, so a
+request waiting on a slow upstream holds no thread.
+
+analyze_messages(messages, predictor) runs the same stages over a list of
+messages, but translates the non-English ones concurrently, predicts all of
+them with a single predict_batch call and checks the union of their URLs with
+as few Safe Browsing requests as possible.
+Identical messages within one batch are only analysed once.
+
+Both accept an optional cache (utils/cache.py TTLCache). Results are stored
+under a hash of the message plus predictor.version and the digest of the
+active rule pack (utils/rule_pack.py), so repeated messages skip
+translation, prediction, Safe Browsing and risk scoring entirely. Results
+built on a degraded stage (a Safe Browsing error, or no translation service
+answer) are not cached, so they are retried once the upstream recovers. The key uses
+the message itself rather than its preprocessed form because URLs and the
+original wording feed the URL check and the keyword reasons.
+
+Both return the result dict used by the API:
+{
+  "verdict": "Safe" | "Spam" | "Scam",
+  "risk_score": int,
+  "confidence": float,
+  "reasons": [...],
+  "detected_language": str,
+  "message": str,
+  "translated_text": str or None,
+  "translation_available": bool,
+  "rule_analysis": {...}          # rules=True: the detect_scam result
+}
+rules="summary" runs the rule engine in detect_scam's fast mode for triage:
+rule_analysis then only has is_scam, scam_score, risk_level and message, and
+the checks stop once the score reaches the top risk level (CRITICAL), so
+scam_score is a lower bound there.
+"""
+import time
+
+from google_ai.translate import (detect_and_translate, detect_and_translate_async, detect_and_translate_batch,
+                                 is_fallback_translation)
+from google_ai.safe_browsing import (check_urls_safe_browsing, check_urls_safe_browsing_async,
+                                     check_urls_safe_browsing_batch)
+from utils.url_extractor import extract_urls
+from utils.risk_score import compute_risk_score_and_reasons
+from utils.cache import content_key
+from utils.rule_pack import get_rule_pack
+from utils.stages import Stage, run_stages, run_stages_async
+from detection_modules.scam_detector import detect_scam, detect_scam_batch
+
+LABEL_MAP = {0: "Safe", 1: "Spam", 2: "Scam"}
+RULES_SUMMARY = "summary"
+MIN_MESSAGE_LENGTH = 5
+
+
+def analyze_message(message, predictor, cache=None, rules=False, timings=False):
+    start = time.perf_counter()
+    result = _cached_result(message, predictor, cache, rules, timings, start)
+    if result is not None:
+        return result
+    results, stage_timings = run_stages(_message_stages(message, predictor, rules))
+    degraded = _degraded(results["translation"], results["safe_browsing"])
+    return _store_result(results["risk_score"], stage_timings, message, predictor, cache, rules, timings, degraded)
+
+
+async def analyze_message_async(message, predictor, cache=None, rules=False, timings=False):
+    start = time.perf_counter()
+    result = _cached_result(message, predictor, cache, rules, timings, start)
+    if result is not None:
+        return result
+    results, stage_timings = await run_stages_async(_message_stages(message, predictor, rules, asynchronous=True))
+    degraded = _degraded(results["translation"], results["safe_browsing"])
+    return _store_result(results["risk_score"], stage_timings, message, predictor, cache, rules, timings, degraded)
+
+
+def _cached_result(message, predictor, cache, rules, timings, start):
+    if cache is None:
+        return None
+    result = cache.get(_cache_key(message, predictor, rules))
+    if result is not None and timings:
+        elapsed = round((time.perf_counter() - start) * 1000, 3)
+        result = dict(result, timings_ms={"cache": elapsed, "total": elapsed})
+    return result
+
+
+def _store_result(result, stage_timings, message, predictor, cache, rules, timings, degraded=False):
+    if cache is not None and not degraded:
+        cache.put(_cache_key(message, predictor, rules), result)
+    if timings:
+        result = dict(result, timings_ms={name: round(ms, 3) for name, ms in stage_timings.items()})
+    return result
+
+
+def analyze_messages(messages, predictor, cache=None, rules=False):
+    if cache is None:
+        return _analyze_messages(messages, predictor, rules)[0]
+
+    results_by_message = {}
+    for message in dict.fromkeys(messages):
+        result = cache.get(_cache_key(message, predictor, rules))
+        if result is not None:
+            results_by_message[message] = result
+
+    missing = [m for m in dict.fromkeys(messages) if m not in results_by_message]
+    if missing:
+        results, degraded = _analyze_messages(missing, predictor, rules)
+        for message, result in zip(missing, results):
+            results_by_message[message] = result
+            if message not in degraded:
+                cache.put(_cache_key(message, predictor, rules), result)
+
+    return [results_by_message[m] for m in messages]
+
+
+def rules_option(value):
+    """The rules= argument for a request's "rules" field: True, "summary" or False."""
+    return value if value is True or value == RULES_SUMMARY else False
+
+
+def validate_batch_request(data, max_messages):
+    """
+    Check a batch request body ({"messages": [...]}) for /api/detect-scam/batch.
+
+    Returns (error, messages): error is why the whole request is rejected
+    (None if it is not); messages has each message stripped, or an
+    {"error": ...} entry for an invalid one, which is reported in its place
+    instead of failing the batch.
+    """
+    if not data or "messages" not in data:
+        return "Missing 'messages' in request body", None
+    messages = data["messages"]
+    if not isinstance(messages, list) or not messages:
+        return "'messages' must be a non-empty list", None
+    if len(messages) > max_messages:
+        return f"Too many messages (max {max_messages})", None
+
+    checked = []
+    for raw in messages:
+        message = raw.strip() if isinstance(raw, str) else ""
+        if not message:
+            checked.append({"error": "Message cannot be empty"})
+        elif len(message) < MIN_MESSAGE_LENGTH:
+            checked.append({"error": "Message too short"})
+        else:
+            checked.append(message)
+    return None, checked
+
+
+def _cache_key(message, predictor, rules=False):
+    parts = ["analysis", getattr(predictor, "version", None), get_rule_pack().digest]
+    if rules:
+        parts.append("rules" if rules is True else f"rules:{rules}")
+    return content_key(*parts, message)
+
+
+def _degraded(translation, url_check):
+    """Whether the translation or URL check fell back because an upstream call failed."""
+    _, translated_text, translation_performed = translation
+    return "error" in url_check or (translation_performed and is_fallback_translation(translated_text))
+
+
+def _message_stages(message, predictor, rules=False, asynchronous=False):
+    def risk_score(translation, prediction, safe_browsing, keyword_scan, rule_engine=None):
+        detected_language, translated_text, translation_performed = translation
+        result = build_result(message, detected_language, translated_text, translation_performed,
+                              prediction, safe_browsing, keyword_scan)
+        if rule_engine is not None:
+            result["rule_analysis"] = rule_engine
+        return result
+
+    if asynchronous:
+        # Coroutines: started inline and awaited on the event loop
+        translation = Stage("translation", lambda: detect_and_translate_async(message), inline=True)
+        safe_browsing = Stage("safe_browsing", lambda url_extraction: check_urls_safe_browsing_async(url_extraction),
+                              after=("url_extraction",), inline=True)
+    else:
+        translation = Stage("translation", lambda: detect_and_translate(message))
+        safe_browsing = Stage("safe_browsing", lambda url_extraction: check_urls_safe_browsing(url_extraction),
+                              after=("url_extraction",))
+
+    stages = [
+        Stage("url_extraction", lambda: extract_urls(message), inline=True),
+        Stage("keyword_scan", lambda: get_rule_pack().scan(message), inline=True),
+        translation,
+        safe_browsing,
+        Stage("prediction", lambda translation: predictor.predict(translation[1]), after=("translation",)),
+    ]
+    risk_inputs = ("translation", "prediction", "safe_browsing", "keyword_scan")
+    if rules:
+        stages.append(Stage("rule_engine", lambda keyword_scan: _rule_engine(message, keyword_scan, rules),
+                            after=("keyword_scan",), inline=True))
+        risk_inputs += ("rule_engine",)
+    stages.append(Stage("risk_score", risk_score, after=risk_inputs, inline=True))
+    return stages
+
+
+def _rule_engine(message, keyword_scan, rules):
+    if rules is True:
+        return detect_scam(message, keyword_scan)
+    return detect_scam(message, keyword_scan, explain=False, stop_at=_summary_stop_at(keyword_scan.rules))
+
+
+def _summary_stop_at(pack=None):
+    """The score from which rules="summary" stops checking: the top risk level's."""
+    pack = pack or get_rule_pack()
+    return max(level["min_score"] for level in pack.scam["risk_levels"])
+
+
+def _analyze_messages(messages, predictor, rules=False):
+    """(results in input order, set of messages whose result is degraded)"""
+    unique_messages = list(dict.fromkeys(messages))
+
+    stages = [
+        Stage("url_extraction", lambda: [extract_urls(m) for m in unique_messages], inline=True),
+        Stage("translation", lambda: detect_and_translate_batch(unique_messages)),
+        Stage("safe_browsing", lambda url_extraction: check_urls_safe_browsing_batch(url_extraction),
+              after=("url_extraction",)),
+        Stage("prediction", lambda translation: predictor.predict_batch([t for _, t, _ in translation]),
+              after=("translation",)),
+    ]
+    if rules:
+        stop_at = None if rules is True else _summary_stop_at()
+        stages.append(Stage("rule_engine",
+                            lambda: detect_scam_batch(unique_messages, explain=rules is True, stop_at=stop_at),
+                            inline=True))
+    results, _ = run_stages(stages)
+    rule_results = results.get("rule_engine") or [None] * len(unique_messages)
+
+    results_by_message = {}
+    degraded = set()
+    for message, translation, prediction_result, url_check, rule_analysis in zip(
+            unique_messages, results["translation"], results["prediction"], results["safe_browsing"],
+            rule_results):
+        detected_language, translated_text, translation_performed = translation
+        result = build_result(
+            message, detected_language, translated_text, translation_performed,
+            prediction_result, url_check)
+        if rule_analysis is not None:
+            result["rule_analysis"] = rule_analysis
+        results_by_message[message] = result
+        if _degraded(translation, url_check):
+            degraded.add(message)
+
+    return [results_by_message[m] for m in messages], degraded
+
+
+def build_result(message, detected_language, translated_text, translation_performed,
+                 prediction_result, url_checks, keyword_hits=None):
+    # Calculate risk score
+    risk_score, reasons = compute_risk_score_and_reasons(
+        prediction_result=prediction_result,
+        urls_check=url_checks,
+        original_text=message,
+        keyword_hits=keyword_hits
+    )
+
+    # Map verdict
+    verdict = LABEL_MAP.get(prediction_result["predicted_label"], "Unknown")
+
+    # Get confidence
+    confidence = prediction_result.get("confidence", 0)
+
+    return {
+        "verdict": verdict,
+        "risk_score": int(risk_score),
+        "confidence": round(float(confidence), 4),
+        "reasons": reasons,
+        "detected_language": detected_language,
+        "message": message,
+        "translated_text": translated_text if (translation_performed and translated_text != message) else None,
+        "translation_available": translation_performed
+    }
@@ -1,8 +1,9 @@
 """
 Calculate risk score and reasons for classification
 """
+from utils.keywords import FRAUD, scan_keywords
 
-def compute_risk_score_and_reasons(prediction_result, urls_check, original_text):
+def compute_risk_score_and_reasons(prediction_result, urls_check, original_text, keyword_hits=None):
     """
     Compute overall risk score (0-100) and reasons based on verdict
     
@@ -58,14 +59,9 @@ def compute_risk_score_and_reasons(prediction_result, urls_check, original_text)
             reasons.append("No URLs found to check")
 
     # ====== FRAUD KEYWORDS CHECK ======
-    fraud_keywords = [
-        "urgent", "verify", "blocked", "pay", "click", "limited", "otp", "account", 
-        "immediately", "bank", "password", "wire", "transfer", "verify now", 
-        "update your", "suspended", "claim", "congratulations", "winner"
-    ]
-    
-    text_lower = original_text.lower()
-    found_keywords = [kw for kw in fraud_keywords if kw in text_lower]
+    if keyword_hits is None:
+        keyword_hits = scan_keywords(original_text)
+    found_keywords = keyword_hits.keywords(FRAUD)
     
     if found_keywords:
         risk_score += 20  # Add risk for fraud keywords
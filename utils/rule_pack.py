@@ -0,0 +1,241 @@
+"""
+Versioned rule packs for the scam and fake news detectors.
+
+A rule pack (default: rules/rule_pack.json, or RULE_PACK_PATH) holds the
+keyword lists, regex pattern lists, scoring weights and thresholds:
+
+  {"name": ..., "version": ...,
+   "keyword_match": "prefix" | "tokens" | "substring",  # word starts, whole words, or anywhere (default)
+   "keyword_lists": {list_id: [keyword, ...]},
+   "pattern_lists": {list_id: [regex, ...]},
+   "scam": {...}, "news": {...}}       # points, tiers and levels per detector
+
+load_rule_pack compiles a pack into a RulePack: the lists and settings frozen
+into tuples and read-only mappings, plus one KeywordAutomaton over all lists
+(utils/aho_corasick.py). Compiling the default pack takes ~9ms, so packs are
+not cached on disk: unpickling the automaton's table was measured slower than
+building it. Instead a reload whose file digest matches the active pack keeps
+the compiled pack as it is.
+
+RulePackManager serves the active pack. reload() compiles the new pack before
+swapping it in with one assignment, so an analysis always runs on a single,
+fully compiled pack: the detectors take the pack from the hits of their scan
+(hits.rules). start_watcher(interval) reloads when the file changes.
+
+    pack = get_rule_pack()
+    hits = pack.scan(text)
+    match_tier(pack.news["bias"], hits.count("news_bias"))
+"""
+import hashlib
+import json
+import os
+import threading
+from types import MappingProxyType
+
+from utils.aho_corasick import KEYWORD_MATCH_MODES, KeywordAutomaton
+
+DEFAULT_RULE_PACK_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                      "rules", "rule_pack.json")
+DETECTOR_SECTIONS = ("scam", "news")
+
+
+def get_rule_pack_path():
+    return os.environ.get("RULE_PACK_PATH") or DEFAULT_RULE_PACK_PATH
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def match_tier(tiers, count):
+    """First tier (ordered by descending min_count) that count reaches, else None."""
+    for tier in tiers:
+        if count >= tier["min_count"]:
+            return tier
+    return None
+
+
+def match_level(levels, score):
+    """First level (ordered by descending min_score) that score reaches; the last one otherwise."""
+    for level in levels:
+        if score >= level["min_score"]:
+            return level
+    return levels[-1]
+
+
+class RulePack:
+    def __init__(self, data, digest, path=None):
+        self.digest = digest
+        self.path = path
+        self.keyword_match = data.get("keyword_match", "substring")
+        self.automaton = KeywordAutomaton(data["keyword_lists"], data["pattern_lists"], self.keyword_match)
+        self.name = data.get("name", "")
+        self.version = str(data["version"])
+        self.keyword_lists = _freeze(data["keyword_lists"])
+        self.pattern_lists = _freeze(data["pattern_lists"])
+        self.scam = _freeze(data["scam"])
+        self.news = _freeze(data["news"])
+
+    def scan(self, text):
+        """Keyword/pattern hits of every list in text.lower(); hits.rules is this pack."""
+        hits = self.automaton.scan(text.lower())
+        hits.rules = self
+        return hits
+
+    def stream(self):
+        """scan() over text fed in pieces (see RulePackStream)."""
+        return RulePackStream(self)
+
+    def info(self):
+        return {"name": self.name, "version": self.version, "keyword_match": self.keyword_match,
+                "digest": self.digest, "path": self.path}
+
+
+class RulePackStream:
+    """
+    RulePack.scan over text that arrives in pieces: feed() each piece, then
+    hits(). Pieces are lowercased one at a time, which equals lowercasing the
+    whole text as long as they are cut next to whitespace (a final sigma
+    depends on its neighbours).
+    """
+
+    def __init__(self, pack):
+        self.pack = pack
+        self._stream = pack.automaton.stream()
+
+    def feed(self, text):
+        self._stream.feed(text.lower())
+
+    def hits(self):
+        hits = self._stream.hits()
+        hits.rules = self.pack
+        return hits
+
+
+def validate_rule_pack(data):
+    """Raise ValueError describing the first problem found in a parsed rule pack."""
+    if not isinstance(data, dict):
+        raise ValueError("rule pack must be a JSON object")
+    if "version" not in data:
+        raise ValueError("rule pack has no 'version'")
+    if data.get("keyword_match", "substring") not in KEYWORD_MATCH_MODES:
+        raise ValueError(f"'keyword_match' must be one of {KEYWORD_MATCH_MODES}")
+    for section in ("keyword_lists", "pattern_lists"):
+        lists = data.get(section)
+        if not isinstance(lists, dict):
+            raise ValueError(f"'{section}' must be an object of lists")
+        for list_id, items in lists.items():
+            if not isinstance(items, list) or not all(isinstance(i, str) and i for i in items):
+                raise ValueError(f"{section}.{list_id} must be a list of non-empty strings")
+    for section in DETECTOR_SECTIONS:
+        if not isinstance(data.get(section), dict):
+            raise ValueError(f"rule pack has no '{section}' settings")
+        for key, value in data[section].items():
+            if isinstance(value, list):
+                field = "min_count" if key not in ("risk_levels", "credibility_levels") else "min_score"
+                thresholds = [item.get(field) for item in value]
+                if not thresholds or thresholds != sorted(thresholds, reverse=True):
+                    raise ValueError(f"{section}.{key} must be ordered by descending {field}")
+
+
+def _pack_digest(raw):
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def load_rule_pack(path=None, reuse=None):
+    """Validate and compile the rule pack at path; returns reuse as is if the file is unchanged."""
+    path = path or get_rule_pack_path()
+    with open(path, "rb") as f:
+        raw = f.read()
+    digest = _pack_digest(raw)
+    if reuse is not None and reuse.digest == digest:
+        return reuse
+
+    data = json.loads(raw.decode("utf-8"))
+    try:
+        validate_rule_pack(data)
+        return RulePack(data, digest, path)
+    except Exception as e:
+        raise ValueError(f"Invalid rule pack {path}: {e}") from e
+
+
+class RulePackManager:
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._active = None
+        self._watcher = None
+        self._stop = threading.Event()
+        self._file_state = None
+        self.last_error = None
+
+    def _current_path(self):
+        return self.path or get_rule_pack_path()
+
+    def _stat(self, path):
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def current(self):
+        pack = self._active
+        if pack is None:
+            with self._lock:
+                if self._active is None:
+                    path = self._current_path()
+                    self._file_state = self._stat(path)
+                    self._active = load_rule_pack(path)
+                pack = self._active
+        return pack
+
+    def reload(self, path=None):
+        """Compile the pack at path (default: the configured one) and swap it in. Raises if invalid."""
+        if path is not None:
+            self.path = path
+        path = self._current_path()
+        file_state = self._stat(path)
+        pack = load_rule_pack(path, reuse=self._active)
+        with self._lock:
+            self._active = pack
+            self._file_state = file_state
+        return pack
+
+    def status(self):
+        return {
+            **self.current().info(),
+            "watching": self._watcher is not None and self._watcher.is_alive(),
+            "last_error": self.last_error,
+        }
+
+    def start_watcher(self, interval=5.0):
+        """Poll the pack file and reload it when it changes."""
+        if self._watcher is not None and self._watcher.is_alive():
+            return self._watcher
+        self.current()
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    if self._stat(self._current_path()) != self._file_state:
+                        self.reload()
+                    self.last_error = None
+                except Exception as e:
+                    self.last_error = f"watcher: {e}"
+
+        self._stop.clear()
+        self._watcher = threading.Thread(target=run, name="rule-pack-watcher", daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+    def stop_watcher(self):
+        self._stop.set()
+
+
+RULE_PACKS = RulePackManager()
+
+
+def get_rule_pack():
+    return RULE_PACKS.current()